@@ -0,0 +1,53 @@
+"""
+Atomic replacement of output files (ledger, compiled indexes, metrics).
+
+The new contents are written to a temp file in the target directory and
+renamed over the target only when complete, so a crash or a full disk
+never leaves a half-written file behind. ``tempfile.mkstemp`` creates the
+temp file as 0600; before the rename it gets the mode of the file it
+replaces (or the usual ``0666 & ~umask`` for a new file), so shared
+folders and other readers (e.g. node_exporter) keep working.
+
+Usage:
+    with atomic_path("export.xlsx", suffix=".xlsx") as temp_path:
+        wb.save(temp_path)
+"""
+import os
+import stat
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+# Read once at import: os.umask can only be queried by setting it, which
+# is not safe while other threads create files
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _target_mode(path: str) -> int:
+    """Permission bits the file at *path* should end up with."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+@contextmanager
+def atomic_path(path: str, suffix: str = ".tmp") -> Iterator[str]:
+    """
+    Yield a temp file path next to *path*; on success it replaces *path*.
+
+    On any error (including KeyboardInterrupt) the temp file is removed
+    and *path* is left untouched.
+    """
+    out_dir = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(suffix=suffix, dir=out_dir)
+    os.close(fd)
+    try:
+        yield temp_path
+        os.chmod(temp_path, _target_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
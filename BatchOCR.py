@@ -0,0 +1,341 @@
+"""
+Headless batch processing of receipt images (no GUI).
+
+Images are distributed to a pool of worker processes. Each worker holds
+one warm ``MyOCR`` instance (and therefore one ``easyocr.Reader``) for its
+whole lifetime, so the model is loaded once per process, not per image.
+
+Every finished receipt goes to a results journal next to the output
+workbook (see ResultsJournal) as soon as it is done; the workbook is
+written from the journal in one pass at the end. Re-running the same
+command skips the receipts already in the journal, so an interrupted
+batch continues where it stopped.
+
+Usage:
+    python BatchOCR.py slozka_s_uctenkami/ -j 4
+    python BatchOCR.py "scans/*.jpg" -o Vysledny_export.xlsx
+"""
+import argparse
+import glob
+import multiprocessing as mp
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from Exporters import FORMATS, export_entries, format_from_path, with_format_extension
+from ResultsJournal import ResultsJournal, default_journal_path
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# One OCR engine per worker process (set by _init_worker)
+_worker_ocr = None
+
+
+# ==========================================
+# INPUT COLLECTION
+# ==========================================
+
+def collect_images(inputs: Iterable[str]) -> List[str]:
+    """
+    Expand directories and glob patterns into a sorted list of image paths.
+
+    Duplicates are removed while preserving the first occurrence.
+    """
+    found: List[str] = []
+    for item in inputs:
+        if os.path.isdir(item):
+            names = sorted(os.listdir(item))
+            candidates = [os.path.join(item, n) for n in names]
+        else:
+            candidates = sorted(glob.glob(item))
+
+        for path in candidates:
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+                found.append(path)
+
+    seen = set()
+    unique: List[str] = []
+    for path in found:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+# ==========================================
+# OCR OF ONE IMAGE
+# ==========================================
+
+def process_image(ocr, path: str) -> Dict[str, Any]:
+    """
+    Run full-page OCR and field extraction for one image.
+
+    Mirrors the GUI flow: if a field box is found but its text is empty,
+    the text is read again from the box region.
+
+    Returns:
+        Dict with the same keys as ``FileSelectorApp.finalize_and_close``
+        produces, plus ``error`` (None on success).
+    """
+    result: Dict[str, Any] = {
+        "filepath": path,
+        "price_text": "",
+        "date_text": "",
+        "vendor_text": "",
+        "error": None,
+    }
+
+    if ocr.analyze_image(path) is None:
+        result["error"] = "OCR selhalo"
+        return result
+
+    getters = (
+        ("price", ocr.get_price_coords),
+        ("date", ocr.get_date),
+        ("vendor", ocr.get_vendor_coords),
+    )
+    missing = []
+    for key, getter in getters:
+        coords, text = getter()
+        if not text and coords:
+            missing.append((key, coords))
+        result[f"{key}_text"] = text or ""
+
+    # Boxes without text: answered from the full-page detections where
+    # possible, the rest recognized together in one batch
+    if missing:
+        texts = ocr.resolve_region_texts(path, [coords for _, coords in missing])
+        for (key, _), text in zip(missing, texts):
+            result[f"{key}_text"] = text or ""
+
+    return result
+
+
+def _init_worker(ocr_options: Dict[str, Any]) -> None:
+    """Pool initializer: load the OCR model once for this worker process."""
+    global _worker_ocr
+    from MyOCR import MyOCR
+    _worker_ocr = MyOCR(**ocr_options)
+
+
+def _run_job(path: str) -> Dict[str, Any]:
+    """Worker entry point: process one image and measure its duration."""
+    start = time.perf_counter()
+    try:
+        result = process_image(_worker_ocr, path)
+    except Exception as e:
+        result = {"filepath": path, "price_text": "", "date_text": "",
+                  "vendor_text": "", "error": str(e)}
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+# ==========================================
+# BATCH DRIVER
+# ==========================================
+
+def run_batch(paths: List[str], workers: int, torch_threads: int = 0,
+              use_cache: bool = True, device: str = "auto",
+              interop_threads: int = 0, precision: str = "default",
+              adaptive_resize: bool = False,
+              vendor_list: Optional[str] = None,
+              ico_registry: Optional[str] = None,
+              journal: Optional[ResultsJournal] = None,
+              rerun: bool = False) -> List[Dict[str, Any]]:
+    """
+    Process *paths* with *workers* processes and return results in input order.
+
+    Args:
+        paths: Image files to process.
+        workers: Number of worker processes (1 = run in this process).
+        torch_threads: Torch intra-op threads per worker (0 = cpu_count / workers).
+        use_cache: Reuse results from the persistent OCR cache.
+        device: Inference device ("auto", "cpu", "cuda").
+        interop_threads: Torch inter-op threads per worker (0 = torch default).
+        precision: Model precision ("default", "fp32", "int8"), see MyOCR.
+        adaptive_resize: Downsample large photos before OCR, see MyOCR.
+        vendor_list: Supplier list file searched after the built-in brands.
+        ico_registry: Compiled IČO registry (IcoRegistry.py) naming the vendor.
+        journal: Results journal; every finished image is appended to it
+            right away and images it already holds are not processed again
+            (their journaled result is returned, with ``journaled`` set).
+        rerun: Process every image even if it is in the journal.
+    """
+    if not paths:
+        return []
+
+    results: Dict[str, Dict[str, Any]] = {}
+    keys: Dict[str, str] = {}
+    if journal is not None:
+        for path in paths:
+            try:
+                keys[path] = journal.key_for(path)
+            except OSError:
+                continue  # reported by the worker
+            record = journal.get(keys[path])
+            if not rerun and keys[path] in journal:
+                results[path] = dict(record, filepath=path, seconds=0.0, journaled=True)
+        if results:
+            print(f"(+) Přeskakuji {len(results)} obrázků, které už jsou v deníku {journal.path}")
+    todo = [p for p in paths if p not in results]
+    if not todo:
+        return [results[p] for p in paths]
+
+    workers = max(1, min(workers, len(todo)))
+    # Without a limit every worker spawns one thread per core and they fight
+    # over the CPU, which kills scaling with the number of workers.
+    if torch_threads <= 0:
+        torch_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    ocr_options = {
+        "use_cache": use_cache,
+        "device": device,
+        "intra_threads": torch_threads,
+        "inter_threads": interop_threads,
+        "precision": precision,
+        "adaptive_resize": adaptive_resize,
+        "vendor_list": vendor_list,
+        "ico_registry": ico_registry,
+    }
+
+    done = 0
+
+    def report(res: Dict[str, Any]) -> None:
+        nonlocal done
+        done += 1
+        results[res["filepath"]] = res
+        key = keys.get(res["filepath"])
+        if journal is not None and key is not None:
+            journal.append(key, {k: res.get(k) for k in ("filepath", "price_text", "date_text",
+                                                         "vendor_text", "error", "seconds")})
+        status = "OK" if not res.get("error") else f"CHYBA: {res['error']}"
+        print(f"[{done}/{len(todo)}] {os.path.basename(res['filepath'])} "
+              f"({res['seconds']:.2f} s) {status}")
+
+    if workers == 1:
+        _init_worker(ocr_options)
+        for path in todo:
+            report(_run_job(path))
+    else:
+        if vendor_list:
+            # Compile the list once here; the workers then load the cached index
+            from MyOCR import load_vendor_index
+            try:
+                load_vendor_index(vendor_list)
+            except (OSError, ValueError):
+                pass  # every worker reports it and falls back to the built-in brands
+
+        # "spawn" — forking a process that may already hold torch/CUDA state is unsafe
+        ctx = mp.get_context("spawn")
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(ocr_options,)) as pool:
+            for res in pool.imap_unordered(_run_job, todo, chunksize=1):
+                report(res)
+
+    return [results[p] for p in paths]
+
+
+def save_results(results: List[Dict[str, Any]], template_file: str, output_file: str,
+                 fmt: Optional[str] = None) -> int:
+    """
+    Write successful results to *output_file*. Returns the number saved.
+
+    *fmt* is one of Exporters.FORMATS (default: from the file extension;
+    "xlsx" fills the Excel template).
+    """
+    entries = []
+    for item in results:
+        if item.get("error"):
+            continue
+        entries.append({
+            'vendor': item.get('vendor_text', ""),
+            'price': item.get('price_text', ""),
+            'date': item.get('date_text', ""),
+            'filename': os.path.basename(item['filepath']),
+        })
+    return export_entries(entries, output_file, fmt, template_file)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Dávkové OCR účtenek bez GUI.")
+    parser.add_argument("inputs", nargs="+", help="Složka s obrázky nebo glob (např. 'scans/*.jpg').")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Počet pracovních procesů (výchozí: počet jader).")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="Vlákna torch na jeden proces (0 = jádra / procesy).")
+    parser.add_argument("--interop-threads", type=int, default=0,
+                        help="Inter-op vlákna torch na jeden proces (0 = výchozí).")
+    parser.add_argument("--device", choices=("auto", "cpu", "cuda"), default="auto",
+                        help="Zařízení pro inferenci (výchozí: auto).")
+    parser.add_argument("--precision", choices=("default", "fp32", "int8"), default="default",
+                        help="Přesnost modelu na CPU (int8 = kvantovaný rozpoznávač).")
+    parser.add_argument("-t", "--template", default="template.xlsx", help="Excel šablona.")
+    parser.add_argument("-o", "--output", default="Vysledny_export.xlsx", help="Výstupní soubor.")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="Formát výstupu: xlsx (šablona), csv, jsonl, parquet (výchozí: podle přípony -o).")
+    parser.add_argument("--adaptive-resize", action="store_true",
+                        help="Zmenšit velké fotky podle odhadnuté velikosti textu (rychlejší OCR).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Nepoužívat mezipaměť OCR výsledků (vždy spustit model).")
+    parser.add_argument("--vendors", default=os.environ.get("ORR_VENDOR_LIST"),
+                        help="Seznam dodavatelů (jeden název na řádek), hledá se po známých značkách.")
+    parser.add_argument("--ico-registry", default=os.environ.get("ORR_ICO_REGISTRY"),
+                        help="Zkompilovaný registr IČO (IcoRegistry.py) pro název dodavatele.")
+    parser.add_argument("--journal", help="Deník výsledků (výchozí: <výstup>.journal.jsonl).")
+    parser.add_argument("--no-journal", action="store_true",
+                        help="Nevést deník (výsledky se uloží jen na konci, bez navázání po pádu).")
+    parser.add_argument("--rerun", action="store_true",
+                        help="Zpracovat znovu i obrázky, které už jsou v deníku.")
+    parser.add_argument("--no-excel", action="store_true", help="Pouze OCR, výstupní soubor nezapisovat.")
+    args = parser.parse_args(argv)
+    if args.format:
+        args.output = with_format_extension(args.output, args.format)
+    fmt = args.format or format_from_path(args.output)
+
+    paths = collect_images(args.inputs)
+    if not paths:
+        print("(!) Nenalezeny žádné obrázky.")
+        return 1
+
+    print(f"--- DÁVKOVÉ OCR: {len(paths)} obrázků, {args.workers} procesů ---")
+
+    journal = None
+    if not args.no_journal:
+        journal = ResultsJournal(args.journal or default_journal_path(args.output))
+
+    try:
+        start = time.perf_counter()
+        results = run_batch(paths, args.workers, args.threads,
+                            use_cache=not args.no_cache, device=args.device,
+                            interop_threads=args.interop_threads, precision=args.precision,
+                            adaptive_resize=args.adaptive_resize, vendor_list=args.vendors,
+                            ico_registry=args.ico_registry, journal=journal, rerun=args.rerun)
+        elapsed = time.perf_counter() - start
+
+        errors = sum(1 for r in results if r.get("error"))
+        processed = [r for r in results if not r.get("journaled")]
+        print(f"\n--- OCR HOTOVO ({len(results) - errors}/{len(results)}) ---")
+        if processed:
+            ocr_time = sum(r.get("seconds", 0.0) for r in processed)
+            print(f"Celkový čas: {elapsed:.1f} s (včetně načtení modelů)")
+            print(f"Propustnost: {len(processed) / elapsed:.2f} obrázků/s")
+            print(f"Průměr na obrázek (v procesu): {ocr_time / len(processed):.2f} s")
+
+        if not args.no_excel:
+            if journal is not None:
+                # Everything finished and not exported yet, including results
+                # of an earlier interrupted run
+                saved = journal.materialize(args.template, args.output, fmt=fmt)
+            else:
+                saved = save_results(results, args.template, args.output, fmt)
+            print(f"\n--- ULOŽENO ({fmt}, {saved} záznamů) ---")
+            print(f"Soubor: {os.path.abspath(args.output)}")
+    finally:
+        if journal is not None:
+            journal.close()
+
+    return 0 if errors == 0 else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,7 +2,67 @@ import openpyxl
 import os
 from datetime import datetime
 import re
-from openpyxl.cell.cell import Cell, MergedCell
+
+from AtomicFile import atomic_path
+
+# Receipts print "26. 7. 2022" as often as "26.7.2022"
+_DATE_RE = re.compile(r"(\d{1,2})\s*\.\s*(\d{1,2})\s*\.\s*(\d{2,4})")
+
+
+class _LedgerIndex:
+    """
+    Lookup tables for one loaded ledger worksheet.
+
+    Built once per loaded workbook and kept up to date while rows are
+    written, so neither the merged-cell lookup nor the free-row search
+    has to rescan the sheet for every entry.
+    """
+    FIRST_ROW = 79   # First data row of the "HOTOVOSTNÍ VÝDAJE" table
+    PRICE_COL = 3    # A row is free when its Price cell is empty
+
+    def __init__(self, ws):
+        self.ws = ws
+
+        # (row, col) -> (row, col) of the top-left master cell
+        self.merged_master = {}
+        for merged_range in ws.merged_cells.ranges:
+            master = (merged_range.min_row, merged_range.min_col)
+            for r in range(merged_range.min_row, merged_range.max_row + 1):
+                for c in range(merged_range.min_col, merged_range.max_col + 1):
+                    if (r, c) != master:
+                        self.merged_master[(r, c)] = master
+
+        self._next_row = self.FIRST_ROW
+
+    def writable_cell(self, row, col):
+        """
+        Return the writable cell at (row, col).
+
+        If the cell is part of a merged range, return its top-left master cell.
+        """
+        row, col = self.merged_master.get((row, col), (row, col))
+        return self.ws.cell(row=row, column=col)
+
+    def next_free_row(self):
+        """
+        Return the first row (from FIRST_ROW) whose Price cell is empty.
+
+        The search resumes where the previous one stopped, so filling N rows
+        costs O(N) in total instead of O(N^2).
+        """
+        row = self._next_row
+        max_row = self.ws.max_row
+        # Rows past max_row hold no cells at all — no need to probe them
+        while row <= max_row and self.writable_cell(row, self.PRICE_COL).value is not None:
+            row += 1
+        self._next_row = row
+        return row
+
+    def mark_written(self, row):
+        """Record that *row* was just filled, so it is not handed out again."""
+        if row >= self._next_row:
+            self._next_row = row + 1
+
 
 class ExcelHandler:
     def __init__(self, template_path):
@@ -24,116 +84,181 @@ class ExcelHandler:
         if not date_text: return None
         text = str(date_text).strip()
         text = text.replace(",", ".")  # Fix common OCR comma-vs-dot error
-        match = re.search(r"(\d{1,2})\.(\d{1,2})\.(\d{2,4})", text)
+        match = _DATE_RE.search(text)
         if match:
             d, m, y = match.groups()
             if len(y) == 2: y = "20" + y 
-            try:
-                return datetime.strptime(f"{d}.{m}.{y}", "%d.%m.%Y")
-            except ValueError: 
-                pass
+            # Same result as strptime("%d.%m.%Y"), which is the bottleneck
+            # of large exports; it only accepts 4-digit years
+            if len(y) == 4:
+                try:
+                    return datetime(int(y), int(m), int(d))
+                except ValueError: 
+                    pass
         return None
 
-    def _get_writable_cell(self, ws, row, col):
+    def normalize_entry(self, data_dict):
         """
-        Return the writable cell at (row, col).
+        Values of one entry as they go into the ledger columns.
+
+        Shared with the other export formats (see Exporters), so every
+        format gets the same price and date as the Excel ledger.
 
-        If the cell is a MergedCell, find the top-left master cell instead.
+        Returns:
+            Dict with 'vendor' (str or None), 'price' (float or None),
+            'date' (datetime, the original text if it cannot be parsed,
+            or None) and 'filename' (str or None).
         """
-        cell = ws.cell(row=row, column=col)
-        
-        # Normal cell — return directly
-        if isinstance(cell, Cell):
-            return cell
-        
-        # Merged cell — find the master
-        if isinstance(cell, MergedCell):
-            for merged_range in ws.merged_cells.ranges:
-                if cell.coordinate in merged_range:
-                    return ws.cell(row=merged_range.min_row, column=merged_range.min_col)
-        
-        return cell
+        vendor_val = data_dict.get('vendor') or data_dict.get('vendor_text')
+        price_val = data_dict.get('price') or data_dict.get('price_text')
+        date_val = data_dict.get('date') or data_dict.get('date_text')
+        date = None
+        if date_val:
+            date = self._parse_date(date_val) or str(date_val)
+        return {
+            'vendor': str(vendor_val) if vendor_val else None,
+            'price': self._clean_price(price_val) if price_val else None,
+            'date': date,
+            'filename': data_dict.get('filename') or None,
+        }
+
+    def _write_entry(self, index, row, data_dict):
+        """Write one invoice entry into *row* of the indexed worksheet."""
+        values = self.normalize_entry(data_dict)
+
+        # -- VENDOR (Column 2 / B) --
+        if values['vendor']:
+            cell = index.writable_cell(row, 2)
+            cell.value = values['vendor'] # type: ignore
+        else:
+            print("(!) VAROVÁNÍ: Klíč 'vendor' je prázdný!")
+
+        # -- PRICE (Column 3 / C) --
+        if values['price'] is not None:
+            cell = index.writable_cell(row, 3)
+            cell.value = values['price'] # type: ignore
+            cell.number_format = '#,##0.00 "Kč"'
+
+        # -- DATE (Column 5 / E) --
+        if values['date'] is not None:
+            cell = index.writable_cell(row, 5)
+            cell.value = values['date'] # type: ignore
+            if isinstance(values['date'], datetime):
+                cell.number_format = 'd.m.yyyy'
+
+        # -- FILENAME (Column 6 / F) --
+        if values['filename']:
+            cell = index.writable_cell(row, 6)
+            cell.value = values['filename'] # type: ignore
+
+    def _save_atomic(self, wb, output_path):
+        """
+        Save *wb* to a temp file next to *output_path*, then rename it over.
+
+        A crash or a full disk during saving never leaves a half-written
+        ledger behind — the old file stays intact until the rename. The
+        ledger keeps its permissions (see AtomicFile).
+        """
+        with atomic_path(output_path, suffix=".xlsx") as temp_path:
+            wb.save(temp_path)
+
+    def _row_holds(self, index, row, data_dict):
+        """True if *row* of the ledger still holds the file of *data_dict*."""
+        filename = self.normalize_entry(data_dict)['filename']
+        return filename is not None and index.writable_cell(row, 6).value == filename
+
+    def _clear_row(self, index, row):
+        """Empty the columns written by ``_write_entry`` in *row*."""
+        for col in (2, 3, 5, 6):
+            index.writable_cell(row, col).value = None
+
+    def add_invoice_entries(self, output_path, entries):
+        """
+        Append all *entries* to the ledger with a single load and a single save.
+
+        Args:
+            output_path: Output workbook (created from the template if missing).
+            entries: List of dicts with 'vendor', 'price', 'date', 'filename'
+                     (or the GUI '*_text' variants).
+        Returns:
+            Number of written entries (0 on failure).
+        """
+        rows = self.write_invoice_entries(output_path, entries)
+        return len(rows) if rows else 0
+
+    def write_invoice_entries(self, output_path, entries, rows=None):
+        """
+        Write *entries* to the ledger with a single load and a single save.
+
+        Args:
+            output_path: Output workbook (created from the template if missing).
+            entries: List of dicts as for ``add_invoice_entries``.
+            rows: Optional ledger row per entry to overwrite (a corrected
+                receipt), None to append. A row whose filename cell no
+                longer names the entry's file is not touched; the entry is
+                appended instead.
+        Returns:
+            The ledger row of every entry, or None on failure.
+        """
+        entries = list(entries)
+        if not entries:
+            return []
+        rows = list(rows) if rows is not None else [None] * len(entries)
 
-    def add_invoice_entry(self, output_path, data_dict):
         print("-" * 50)
-        print(f"DEBUG: Zpracovávám data pro Excel...")
-        
+        print(f"DEBUG: Zpracovávám data pro Excel ({len(entries)} záznamů)...")
+
         # 1. Load template or existing output file
         file_to_load = self.template_path
         if os.path.exists(output_path):
             file_to_load = output_path
         elif not os.path.exists(self.template_path):
             print(f"(!) CHYBA: Nenalezena šablona: {self.template_path}")
-            return False
+            return None
 
         try:
             wb = openpyxl.load_workbook(file_to_load)
-            
+
             # 2. Select worksheet
             sheet_name = "Příjmy a výdaje"
             ws = wb[sheet_name] if sheet_name in wb.sheetnames else wb.active
-            
+
             if ws is None:
                 print("(!) CHYBA: List nebyl nalezen.")
-                return False
-
-            # 3. Find the first empty row
-            # (check column 3 — Price)
-            row = 79
-            max_search = 5000
-            counter = 0
-            
-            while counter < max_search:
-                cell = self._get_writable_cell(ws, row, 3)
-                if cell.value is None:
-                    break
-                row += 1
-                counter += 1
-            
-            print(f"   (Zapisuji na řádek {row})")
-
-            # 4. Write data (using _get_writable_cell)
-
-            # -- VENDOR (Column 2 / B) --
-            vendor_val = data_dict.get('vendor') or data_dict.get('vendor_text')
-            if vendor_val:
-                cell = self._get_writable_cell(ws, row, 2)
-                cell.value = str(vendor_val) # type: ignore
-            else:
-                print("(!) VAROVÁNÍ: Klíč 'vendor' je prázdný!")
-
-            # -- PRICE (Column 3 / C) --
-            price_val = data_dict.get('price') or data_dict.get('price_text')
-            if price_val:
-                cell = self._get_writable_cell(ws, row, 3)
-                cell.value = self._clean_price(price_val) # type: ignore
-                cell.number_format = '#,##0.00 "Kč"'
-
-            # -- DATE (Column 5 / E) --
-            date_val = data_dict.get('date') or data_dict.get('date_text')
-            if date_val:
-                cell = self._get_writable_cell(ws, row, 5)
-                val_parsed = self._parse_date(date_val)
-                if val_parsed:
-                    cell.value = val_parsed # type: ignore
-                    cell.number_format = 'd.m.yyyy'
-                else:
-                    cell.value = str(date_val) # type: ignore
+                return None
 
-            # -- FILENAME (Column 6 / F) --
-            if data_dict.get('filename'):
-                cell = self._get_writable_cell(ws, row, 6)
-                cell.value = data_dict['filename'] # type: ignore
+            # 3. Overwrite the given rows, write the rest into the first
+            # empty row (check column 3 — Price)
+            index = _LedgerIndex(ws)
+            written = []
+            for data_dict, row in zip(entries, rows):
+                if row is not None and not self._row_holds(index, row, data_dict):
+                    print(f"(-) Řádek {row} už neodpovídá souboru {data_dict.get('filename')}, "
+                          f"záznam se připíše na konec")
+                    row = None
+                if row is None:
+                    row = index.next_free_row()
+                    print(f"   (Zapisuji na řádek {row})")
+                    self._write_entry(index, row, data_dict)
+                    index.mark_written(row)
+                else:
+                    print(f"   (Přepisuji řádek {row})")
+                    self._clear_row(index, row)
+                    self._write_entry(index, row, data_dict)
+                written.append(row)
 
-            # 5. Save workbook
-            wb.save(output_path)
+            # 4. Save workbook once for the whole batch
+            self._save_atomic(wb, output_path)
             print(f"OK: Uloženo do '{output_path}'")
-            return True
+            return written
 
         except PermissionError:
             print(f"(!) CHYBA: Soubor '{output_path}' je otevřený v Excelu! Zavřete jej.")
-            return False
+            return None
         except Exception as e:
             print(f"(!) CHYBA: {e}")
-            return False
+            return None
 
+    def add_invoice_entry(self, output_path, data_dict):
+        """Append a single entry. Returns True on success."""
+        return self.add_invoice_entries(output_path, [data_dict]) == 1
@@ -0,0 +1,263 @@
+"""
+Row exporters for the results: Excel ledger, CSV, JSON lines and Parquet.
+
+The Excel ledger is a formatted template that has to be loaded and saved
+as a whole. The other formats are meant for accounting imports and
+stream: rows are appended to the existing file without reading it back,
+in constant memory, so hundreds of thousands of receipts are no problem.
+All formats share ``ExcelHandler.normalize_entry``, so a price or a date
+comes out the same everywhere.
+
+Columns (CSV / JSONL / Parquet):
+    vendor, price (number, 2 decimals), date (YYYY-MM-DD, or the OCR
+    text if it is not a valid date), filename
+
+Parquet needs the optional ``pyarrow`` package. A Parquet file cannot be
+appended to, so when the target exists the rows go to a new numbered
+file next to it (``export.1.parquet``, ...); readers take them together
+as one dataset.
+
+Usage:
+    with open_exporter("export.csv") as out:
+        for entry in entries:
+            out.write(entry)
+"""
+import csv
+import json
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from ExcelHandler import ExcelHandler
+
+FORMATS = ("xlsx", "csv", "jsonl", "parquet")
+COLUMNS = ("vendor", "price", "date", "filename")
+
+_EXTENSIONS = {".xlsx": "xlsx", ".csv": "csv", ".jsonl": "jsonl", ".parquet": "parquet"}
+
+
+def format_from_path(path: str, default: str = "xlsx") -> str:
+    """Export format implied by the extension of *path*."""
+    return _EXTENSIONS.get(os.path.splitext(path)[1].lower(), default)
+
+
+def with_format_extension(path: str, fmt: str) -> str:
+    """*path* with the extension of *fmt* (unchanged if it already matches)."""
+    if format_from_path(path, "") == fmt:
+        return path
+    return os.path.splitext(path)[0] + "." + fmt
+
+
+class Exporter(ABC):
+    """
+    Base class: ``write`` one entry at a time, ``close`` when done.
+
+    Entries are dicts with 'vendor', 'price', 'date', 'filename' (or the
+    GUI '*_text' variants), as for ``ExcelHandler.add_invoice_entries``.
+
+    Attributes:
+        path (str): The output file.
+        written (int): Number of rows written so far.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.written = 0
+        self._normalizer = ExcelHandler(template_path="")
+
+    def row(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalized column values of *entry* (dates as ISO strings)."""
+        values = self._normalizer.normalize_entry(entry)
+        if isinstance(values["date"], datetime):
+            values["date"] = values["date"].date().isoformat()
+        if values["price"] is not None:
+            values["price"] = round(values["price"], 2)
+        return values
+
+    @abstractmethod
+    def write(self, entry: Dict[str, Any]) -> None:
+        """Add one entry to the output."""
+
+    def close(self) -> int:
+        """Finish the output; returns the number of written rows."""
+        return self.written
+
+    def abort(self) -> None:
+        """Undo the rows written so far (after an error) and close."""
+        self.written = 0
+
+    def __enter__(self) -> "Exporter":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        # A failed export leaves nothing behind: the caller reports 0 rows,
+        # so rows kept in the file would be written again next time
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class _AppendExporter(Exporter):
+    """A text file the rows are appended to; ``abort`` cuts it back to where it was."""
+
+    def __init__(self, path: str, encoding: str = "utf-8"):
+        super().__init__(path)
+        self._file = open(path, "a", encoding=encoding, newline="")
+        self._start = self._file.tell()
+
+    def close(self) -> int:
+        if not self._file.closed:
+            self._file.close()
+        return self.written
+
+    def abort(self) -> None:
+        if not self._file.closed:
+            self._file.flush()
+            self._file.truncate(self._start)
+            self._file.close()
+        self.written = 0
+
+
+class CsvExporter(_AppendExporter):
+    """
+    Semicolon-separated CSV (the Czech Excel default).
+
+    The header and the UTF-8 BOM (so that Excel detects the encoding) are
+    written only when the file is new or empty; appended rows go after
+    them, so a file started elsewhere without a BOM stays without one.
+    """
+
+    def __init__(self, path: str, delimiter: str = ";"):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        super().__init__(path, "utf-8-sig" if new_file else "utf-8")
+        self._writer = csv.writer(self._file, delimiter=delimiter)
+        if new_file:
+            self._writer.writerow(COLUMNS)
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        values = self.row(entry)
+        price = values["price"]
+        self._writer.writerow([
+            values["vendor"] or "",
+            f"{price:.2f}" if price is not None else "",
+            values["date"] or "",
+            values["filename"] or "",
+        ])
+        self.written += 1
+
+
+class JsonlExporter(_AppendExporter):
+    """One JSON object per line."""
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(self.row(entry), ensure_ascii=False) + "\n")
+        self.written += 1
+
+
+class ParquetExporter(Exporter):
+    """Parquet via pyarrow, written in row groups of *batch_rows* rows."""
+
+    def __init__(self, path: str, batch_rows: int = 10000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Export do Parquet vyžaduje balíček pyarrow (pip install pyarrow)") from None
+        stem, ext = os.path.splitext(path)
+        n = 0
+        while os.path.exists(path):
+            n += 1
+            path = f"{stem}.{n}{ext}"
+        super().__init__(path)
+        self._pa = pa
+        self._schema = pa.schema([("vendor", pa.string()), ("price", pa.float64()),
+                                  ("date", pa.string()), ("filename", pa.string())])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._batch_rows = batch_rows
+        self._pending: List[Dict[str, Any]] = []
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        self._pending.append(self.row(entry))
+        self.written += 1
+        if len(self._pending) >= self._batch_rows:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._pending:
+            self._writer.write_table(self._pa.Table.from_pylist(self._pending, schema=self._schema))
+            self._pending = []
+
+    def close(self) -> int:
+        if self._writer is not None:
+            self._flush()
+            self._writer.close()
+            self._writer = None
+        return self.written
+
+    def abort(self) -> None:
+        # The output is always a new file, so nothing of it is worth keeping
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        self.written = 0
+
+
+class ExcelExporter(Exporter):
+    """
+    The formatted ledger (template.xlsx). Rows are collected and written
+    with one load and one save on ``close``.
+    """
+
+    def __init__(self, path: str, template_path: str = "template.xlsx"):
+        super().__init__(path)
+        self._handler = ExcelHandler(template_path)
+        self._entries: List[Dict[str, Any]] = []
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        self._entries.append(entry)
+
+    def close(self) -> int:
+        if self._entries:
+            self.written = self._handler.add_invoice_entries(self.path, self._entries)
+            self._entries = []
+        return self.written
+
+
+def open_exporter(path: str, fmt: Optional[str] = None, template_path: str = "template.xlsx") -> Exporter:
+    """Exporter for *fmt* (default: from the extension of *path*)."""
+    fmt = fmt or format_from_path(path)
+    if fmt == "xlsx":
+        return ExcelExporter(path, template_path)
+    if fmt == "csv":
+        return CsvExporter(path)
+    if fmt == "jsonl":
+        return JsonlExporter(path)
+    if fmt == "parquet":
+        return ParquetExporter(path)
+    raise ValueError(f"Neznámý formát exportu: {fmt}")
+
+
+def export_entries(entries: Iterable[Dict[str, Any]], path: str, fmt: Optional[str] = None,
+                   template_path: str = "template.xlsx") -> int:
+    """
+    Write *entries* to *path*; returns the number of written rows.
+
+    Errors are reported and counted as 0 written rows, like
+    ``ExcelHandler.add_invoice_entries``; rows written before the error
+    are removed again (see ``Exporter.abort``), so the count is true.
+    """
+    try:
+        with open_exporter(path, fmt, template_path) as out:
+            for entry in entries:
+                out.write(entry)
+        written = out.written
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"(!) CHYBA: Export do {path} selhal: {e}")
+        return 0
+    if written and not isinstance(out, ExcelExporter):
+        print(f"OK: {written} záznamů připsáno do '{out.path}'")
+    return written
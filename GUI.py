@@ -1,50 +1,103 @@
+import time
+_STARTUP_T0 = time.perf_counter()
+
 import tkinter
 import customtkinter as ctk
 from tkinter import filedialog
 import os
 from PIL import Image, ImageOps, ImageTk 
-import cv2
 import tempfile
 import math
 import threading
-import numpy as np
-from typing import Any, List, Optional
+from typing import Any, Callable, List, Optional
+
+from Exporters import FORMATS as EXPORT_FORMATS
+from LRUCache import ByteLRU
+from Metrics import METRICS
+from OCRWorker import PRIORITY_BATCH, PRIORITY_INTERACTIVE, OCRWorker
+from SpatialIndex import GridIndex, box_area, polygon_bbox
+
+# Heavy dependencies (MyOCR -> easyocr/torch, cv2, numpy) are imported on
+# first use so the window can appear before the OCR model is loaded.
+
+# ORR_STARTUP_TIMING=1 prints time-to-first-window / time-to-first-result
+STARTUP_TIMING = os.environ.get("ORR_STARTUP_TIMING") == "1"
+
+# Memory budget for decoded full-resolution images (ORR_GUI_IMAGE_CACHE_MB).
+# Images are decoded when shown, not when selected, so the file list
+# itself costs almost nothing.
+GUI_IMAGE_CACHE_BYTES = int(os.environ.get("ORR_GUI_IMAGE_CACHE_MB", "512")) * 1024 * 1024
+
+# Display: a window drag fires dozens of <Configure> events, only the last
+# one is rendered; scaled bitmaps are kept per (image, size).
+RESIZE_DEBOUNCE_MS = 80
+DISPLAY_CACHE_BYTES = 64 * 1024 * 1024
 
-# --- IMPORT MyOCR ---
-try:
-    from MyOCR import MyOCR
-except ImportError:
-    print("WARNING: MyOCR.py file not found.")
-    MyOCR = None
+# How often the Tk thread picks up finished OCR results
+OCR_POLL_MS = 50
+
+FIELD_COLORS = {"price": "red", "date": "blue", "vendor": "green"}
+FIELD_LABELS = {"price": "Cena", "date": "Datum", "vendor": "Název (Prodejce)"}
+DETECTION_COLOR = "#9e9e9e"
+DETECTION_HOVER_COLOR = "yellow"
+HANDLE_SIZE = 6
 
 ctk.set_appearance_mode("System")
 ctk.set_default_color_theme("blue")
 
 
 class FileSelectorApp(ctk.CTk):
-    def __init__(self):
+    def __init__(self, journal=None):
         super().__init__()
 
 
         
         # --- DATA ---
+        # One entry per selected file: path, boxes, values — never the pixels
         self.images_data: List[dict] = []
+        self.image_cache = ByteLRU(GUI_IMAGE_CACHE_BYTES)
+        self._prefetch_thread = None
         self.current_index = -1
 
         self.original_image = None
         self._tk_image_ref = None
         self.scale_ratio = 1.0
+        self._display_cache = ByteLRU(DISPLAY_CACHE_BYTES)  # (path, image id, w, h) -> PhotoImage
+        self._bg_item = None         # canvas item of the image, reused between frames
+        self._rendered_size = None   # canvas size of the last render
+        self._resize_job = None
         
         # Active widgets for the current image (price, date, vendor entries)
         self.active_widgets = {}  # { "price": {...}, "date": {...}, "vendor": {...} }
+        # Canvas items of each box, updated in place while dragging:
+        # { "price": {"rect": id, "corners": {"NW": id, ...}, "xy": [x1, y1, x2, y2]} }
+        self.box_items = {}
+        # Overlay of all OCR detections of the current image (click to assign)
+        self._detection_items = {}     # detection index -> canvas item id
+        self._detection_index = None   # GridIndex over the detections, image pixels
+        self._detection_source = None  # detections the index was built from
+        self._hover_detection = None
         
         self.drag_data = {
             "x": 0, "y": 0, "item": None, "mode": None, "group_tag": None, "corner": None
         }
         
         self.final_output_data = None
-        self._thread_result_msg = ""
-        self._ocr_thread = None
+        self.final_output_format = "xlsx"
+        # ResultsJournal: finished receipts are written to it immediately
+        self.journal = journal
+        # OCR runs on a worker thread; results are applied here one image at a time
+        self._ocr_worker: Optional[OCRWorker] = None
+        self._ocr_poll_job = None
+        self._ocr_generation = 0  # bumped on a new file selection; older results are dropped
+        self._batch = None        # progress of "Spustit OCR Vše"
+
+        # OCR model is loaded in the background (see _start_model_loading)
+        self.ocr_engine = None
+        self._model_thread = None
+        self._model_error: Optional[str] = None
+        self._pending_ocr: List[Callable[[], None]] = []
+        self._startup_logged = set()
 
         # --- GUI SETUP ---
 
@@ -62,11 +115,6 @@ class FileSelectorApp(ctk.CTk):
             print(f"Ikona nebyla nalezena: {e}")
 
 
-        self.ocr_engine = None
-        if MyOCR:
-            try: self.ocr_engine = MyOCR()
-            except: pass
-
         # === LEFT PANEL ===
         self.control_frame = ctk.CTkFrame(self, width=250)
         self.control_frame.pack(side="left", fill="y", padx=10, pady=10)
@@ -148,8 +196,18 @@ class FileSelectorApp(ctk.CTk):
         ctk.CTkButton(self.frame_manual, text="+ Název (Prodejce)", fg_color="green", 
                       command=lambda: self.add_manual_box("vendor", "green")).pack(pady=5, padx=5, fill="x")
 
-        self.finish_all_btn = ctk.CTkButton(self.control_frame, text="Uložit vše do Excelu", command=self.finalize_and_close, fg_color="darkblue")
-        self.finish_all_btn.pack(side="bottom", pady=20)
+        # All OCR detections; clicking one assigns its text to a field without new OCR
+        self.show_detections = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.frame_manual, text="Všechny detekce", variable=self.show_detections,
+                        command=self._toggle_detections).pack(pady=5, padx=5, fill="x")
+
+        self.finish_all_btn = ctk.CTkButton(self.control_frame, text="Uložit vše", command=self.finalize_and_close, fg_color="darkblue")
+        self.finish_all_btn.pack(side="bottom", pady=(5, 20))
+
+        # Export format: xlsx fills the template, the others are plain tables for imports
+        self.export_format = ctk.StringVar(value="xlsx")
+        ctk.CTkOptionMenu(self.control_frame, values=list(EXPORT_FORMATS), variable=self.export_format,
+                          width=120).pack(side="bottom", pady=(10, 0))
 
         # === RIGHT PANEL (CANVAS) ===
         self.image_frame = ctk.CTkFrame(self)
@@ -166,61 +224,284 @@ class FileSelectorApp(ctk.CTk):
         self.canvas.bind("<ButtonRelease-1>", self.on_drag_stop)
         self.canvas.bind("<Motion>", self.on_mouse_move)
 
+        self.after_idle(lambda: self._log_startup("první okno"))
+        self._start_model_loading()
+
+    # --- OCR MODEL LOADING (BACKGROUND) ---
+
+    def _log_startup(self, event_name):
+        """Print the time since startup for *event_name* (once, timing mode only)."""
+        if not STARTUP_TIMING or event_name in self._startup_logged:
+            return
+        self._startup_logged.add(event_name)
+        print(f"[Startup] {event_name}: {time.perf_counter() - _STARTUP_T0:.3f} s")
+
+    def _start_model_loading(self):
+        """Load the OCR model on a background thread; the window stays responsive."""
+        self.status_label.configure(text="Načítám OCR model...")
+        self._model_thread = threading.Thread(target=self._load_model_worker, daemon=True)
+        self._model_thread.start()
+        self.monitor_model_loading()
+
+    def _load_model_worker(self):
+        # Runs off the Tk thread — must not touch any widget
+        try:
+            from MyOCR import MyOCR
+        except ImportError:
+            print("WARNING: MyOCR.py file not found.")
+            self._model_error = "MyOCR.py nebyl nalezen."
+            return
+        try:
+            self.ocr_engine = MyOCR()
+        except Exception as e:
+            print(f"(-) Chyba při načítání OCR modelu: {e}")
+            self._model_error = str(e)
+
+    def monitor_model_loading(self):
+        if self._model_thread and self._model_thread.is_alive():
+            self.after(100, self.monitor_model_loading)
+            return
+
+        if self.ocr_engine is None:
+            self.status_label.configure(text=f"OCR model nelze načíst: {self._model_error}")
+            self._pending_ocr = []
+            return
+
+        self._log_startup("OCR model načten")
+        self.status_label.configure(text="OCR model připraven.")
+
+        # Run OCR requests the user made while the model was loading
+        pending, self._pending_ocr = self._pending_ocr, []
+        for request in pending:
+            request()
+
+    def _ocr_ready_or_queue(self, request):
+        """
+        Return True if the OCR model is ready.
+
+        Otherwise queue *request* to run once loading finishes and return False.
+        """
+        if self.ocr_engine is not None:
+            return True
+        if self._model_thread and self._model_thread.is_alive():
+            self._pending_ocr.append(request)
+            self.status_label.configure(text="OCR čeká na načtení modelu...")
+        return False
+
+    def _latency_text(self):
+        """Status suffix with the last per-image OCR latency (only when ORR_METRICS=1)."""
+        metrics = getattr(self.ocr_engine, "metrics", None)
+        if metrics is None or not metrics.enabled:
+            return ""
+        last = metrics.last("image")
+        return f" ({last:.2f} s/snímek)" if last is not None else ""
+
     # --- CANVAS & TEXT ENTRY LOGIC ---
 
     def on_resize(self, event):
-        self.canvas.coords(self.text_id, self.canvas.winfo_width()/2, self.canvas.winfo_height()/2)
-        if self.original_image:
-            self._save_current_entries_text()
+        self.canvas.coords(self.text_id, event.width/2, event.height/2)
+        if self.original_image is None: return
+        # Render once the size settles, not on every intermediate event
+        if self._resize_job is not None:
+            self.after_cancel(self._resize_job)
+        self._resize_job = self.after(RESIZE_DEBOUNCE_MS, self._on_resize_settled)
+
+    def _on_resize_settled(self):
+        self._resize_job = None
+        if self.original_image is None: return
+        if self._rendered_size is None:
             self.show_image_on_canvas()
+            return
+        if (self.canvas.winfo_width(), self.canvas.winfo_height()) == self._rendered_size: return
+        # Same image, new scale: the entries (and any typed text) stay, only move
+        with METRICS.timer("gui_resize"):
+            if self._render_background() and self.current_index >= 0:
+                self._layout_detections()
+                self._layout_overlays()
 
     def show_image_on_canvas(self):
+        """Full redraw of the current image: bitmap, boxes and text entries."""
         if self.original_image is None: return
-        
-        # 1. Clear canvas and active widgets
-        self.active_widgets = {}
-        self.canvas.delete("all")
-
-        # 2. Calculate scale and show image
+        with METRICS.timer("gui_frame"):
+            self._clear_overlays()
+            self._rendered_size = None
+            if not self._render_background(): return
+
+            # Interactive boxes and text entries from current data
+            if self.current_index >= 0:
+                data = self.images_data[self.current_index]
+                if self.show_detections.get():
+                    self._draw_detections()
+                for key, color in FIELD_COLORS.items():
+                    if data["coords"].get(key):
+                        self.create_interactive_box(data["coords"][key], color, key)
+                        self.create_text_entry(key, data["coords"][key], data["final_values"].get(key), color)
+
+    def _render_background(self):
+        """Show the current image scaled to the canvas; returns False while the canvas is too small."""
         cw, ch = self.canvas.winfo_width(), self.canvas.winfo_height()
-        if cw < 10 or ch < 10: return
+        if cw < 10 or ch < 10: return False
         img_w, img_h = self.original_image.size
         self.scale_ratio = min(cw / img_w, ch / img_h)
-        new_w, new_h = int(img_w * self.scale_ratio), int(img_h * self.scale_ratio)
-        
-        resized_pil = self.original_image.resize((new_w, new_h), Image.Resampling.BILINEAR)
-        self._tk_image_ref = ImageTk.PhotoImage(resized_pil)
-        self.canvas.create_image(0, 0, image=self._tk_image_ref, anchor="nw")
+        new_w, new_h = max(1, int(img_w * self.scale_ratio)), max(1, int(img_h * self.scale_ratio))
 
-        # 3. Create interactive boxes and text entries from current data
-        if self.current_index >= 0:
-            data = self.images_data[self.current_index]
-            
-            # --- PRICE (RED) ---
-            if data["coords"].get("price"):
-                self.create_interactive_box(data["coords"]["price"], "red", "price")
-                val = data["final_values"].get("price")
-                self.create_text_entry("price", data["coords"]["price"], val, "red")
-
-            # --- DATE (BLUE) ---
-            if data["coords"].get("date"):
-                self.create_interactive_box(data["coords"]["date"], "blue", "date")
-                val = data["final_values"].get("date")
-                self.create_text_entry("date", data["coords"]["date"], val, "blue")
-
-            # --- VENDOR (GREEN) ---
-            if data["coords"].get("vendor"):
-                self.create_interactive_box(data["coords"]["vendor"], "green", "vendor")
-                val = data["final_values"].get("vendor")
-                self.create_text_entry("vendor", data["coords"]["vendor"], val, "green")
+        self._tk_image_ref = self._scaled_photo(new_w, new_h)
+        if self._bg_item is None:
+            self._bg_item = self.canvas.create_image(0, 0, image=self._tk_image_ref, anchor="nw", tags=("background",))
+            self.canvas.tag_lower(self._bg_item)
+        else:
+            self.canvas.itemconfigure(self._bg_item, image=self._tk_image_ref, state="normal")
+        self.canvas.itemconfigure(self.text_id, state="hidden")
+        self._rendered_size = (cw, ch)
+        return True
+
+    def _scaled_photo(self, width, height):
+        """PhotoImage of the current image at *width* x *height*, cached per image and size."""
+        path = self.images_data[self.current_index]["path"] if self.current_index >= 0 else None
+        key = (path, id(self.original_image), width, height)
+        photo = self._display_cache.get(key)
+        if photo is not None:
+            METRICS.inc("gui_scale_cache_hit")
+            return photo
+        METRICS.inc("gui_scale_cache_miss")
+        with METRICS.timer("gui_scale"):
+            # reducing_gap: cheap integer reduce first, then BILINEAR on the small image
+            resized_pil = self.original_image.resize((width, height), Image.Resampling.BILINEAR, reducing_gap=1.5)
+            photo = ImageTk.PhotoImage(resized_pil)
+        self._display_cache.put(key, photo, width * height * 4)
+        return photo
+
+    def _clear_overlays(self):
+        """Remove all boxes and text entries from the canvas."""
+        for widgets in self.active_widgets.values():
+            widgets["frame"].destroy()
+        self.active_widgets = {}
+        self.box_items = {}
+        self._detection_items = {}
+        self._hover_detection = None
+        self.canvas.delete("overlay")
+
+    def _layout_overlays(self, keys=tuple(FIELD_COLORS)):
+        """Place the boxes and entries of *keys* at their stored coordinates and the current scale."""
+        data = self.images_data[self.current_index]
+        for key in keys:
+            coords = data["coords"].get(key)
+            if not coords:
+                self._remove_box(key)
+                continue
+            self.create_interactive_box(coords, FIELD_COLORS[key], key)
+            if key in self.active_widgets:
+                self.canvas.coords(self.active_widgets[key]["window"], *self._entry_position(coords))
+            else:
+                self.create_text_entry(key, coords, data["final_values"].get(key), FIELD_COLORS[key])
+
+    # --- DETECTION OVERLAY ---
+    def _current_detections(self):
+        if self.current_index < 0: return []
+        return self.images_data[self.current_index].get("detections") or []
+
+    def _get_detection_index(self):
+        """GridIndex over the current image's detections (image pixels), rebuilt only when they change."""
+        detections = self._current_detections()
+        if self._detection_index is None or self._detection_source is not detections:
+            entries = []
+            for i, det in enumerate(detections):
+                try: entries.append((i, polygon_bbox(det[0])))
+                except (TypeError, ValueError, IndexError): continue
+            self._detection_index = GridIndex.from_boxes(entries)
+            self._detection_source = detections
+        return self._detection_index
+
+    def _toggle_detections(self):
+        if self.original_image is None: return
+        if self.show_detections.get():
+            self._draw_detections()
+            if not self._detection_items:
+                self.status_label.configure(text="Žádné detekce — nejprve spusťte OCR.")
+        else:
+            self._hide_detections()
+
+    def _draw_detections(self):
+        """Draw a thin outline for every detection, between the image and the field boxes."""
+        self._hide_detections()
+        index = self._get_detection_index()
+        r = self.scale_ratio
+        for i in range(len(self._current_detections())):
+            b = index.bbox(i)
+            if b is None: continue
+            self._detection_items[i] = self.canvas.create_rectangle(
+                b[0] * r, b[1] * r, b[2] * r, b[3] * r, outline=DETECTION_COLOR, width=1, dash=(2, 2),
+                tags=("detection", "overlay"))
+        if self._bg_item is not None and self._detection_items:
+            self.canvas.tag_raise("detection", self._bg_item)
+
+    def _hide_detections(self):
+        self.canvas.delete("detection")
+        self._detection_items = {}
+        self._hover_detection = None
+
+    def _layout_detections(self):
+        """Move the detection outlines to the current scale."""
+        if not self._detection_items: return
+        index = self._get_detection_index()
+        r = self.scale_ratio
+        for i, item in self._detection_items.items():
+            b = index.bbox(i)
+            self.canvas.coords(item, b[0] * r, b[1] * r, b[2] * r, b[3] * r)
+
+    def _detection_at(self, x, y, tolerance=2):
+        """Index of the smallest detection under canvas point (x, y), or None."""
+        if not self._detection_items or self.scale_ratio <= 0: return None
+        index = self._get_detection_index()
+        hits = index.query_point(x / self.scale_ratio, y / self.scale_ratio, tolerance / self.scale_ratio)
+        if not hits: return None
+        return min(hits, key=lambda i: box_area(index.bbox(i)))  # type: ignore
+
+    def _set_hover_detection(self, det):
+        if det == self._hover_detection: return
+        if self._hover_detection in self._detection_items:
+            self.canvas.itemconfigure(self._detection_items[self._hover_detection], outline=DETECTION_COLOR, width=1)
+        if det is not None:
+            self.canvas.itemconfigure(self._detection_items[det], outline=DETECTION_HOVER_COLOR, width=2)
+        self._hover_detection = det
+
+    def _show_assign_menu(self, det, event):
+        """Popup menu assigning detection *det* to price / date / vendor."""
+        menu = tkinter.Menu(self, tearoff=0)
+        text = self._current_detections()[det][1]
+        menu.add_command(label=f"„{text}“", state="disabled")
+        menu.add_separator()
+        for key, label in FIELD_LABELS.items():
+            menu.add_command(label=label, command=lambda k=key: self.assign_detection(det, k))
+        try:
+            menu.tk_popup(event.x_root, event.y_root)
+        finally:
+            menu.grab_release()
+
+    def assign_detection(self, det, type_key):
+        """Use detection *det* (its box and recognized text) as the *type_key* field."""
+        if self.current_index < 0: return
+        x1, y1, x2, y2 = (int(v) for v in self._get_detection_index().bbox(det))  # type: ignore
+        text = str(self._current_detections()[det][1])
+        data = self.images_data[self.current_index]
+        data["coords"][type_key] = [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+        data["final_values"][type_key] = text
+        if type_key in self.active_widgets:
+            entry = self.active_widgets[type_key]["entry"]
+            entry.delete(0, "end")
+            entry.insert(0, text)
+        self._layout_overlays((type_key,))
+        self.status_label.configure(text=f"{FIELD_LABELS[type_key]}: {text}")
+
+    def _entry_position(self, coords):
+        """Canvas position of a text entry: below the bottom-left corner of its box."""
+        return (min(pt[0] for pt in coords) * self.scale_ratio,
+                max(pt[1] for pt in coords) * self.scale_ratio + 5)
 
     def create_text_entry(self, type_key, coords, text_value, color):
         if not coords: return
         
-        ys = [pt[1] for pt in coords]
-        xs = [pt[0] for pt in coords]
-        target_x = min(xs) * self.scale_ratio
-        target_y = max(ys) * self.scale_ratio + 5 
+        target_x, target_y = self._entry_position(coords)
         
         container = ctk.CTkFrame(self.canvas, fg_color="transparent", width=160, height=30)
         
@@ -234,36 +515,24 @@ class FileSelectorApp(ctk.CTk):
                                     command=lambda: self.run_single_box_ocr(type_key))
         refresh_btn.pack(side="left")
 
-        self.canvas.create_window(target_x, target_y, window=container, anchor="nw")
-        self.active_widgets[type_key] = {"entry": entry, "frame": container}
+        window = self.canvas.create_window(target_x, target_y, window=container, anchor="nw",
+                                           tags=("overlay", f"entry_{type_key}"))
+        self.active_widgets[type_key] = {"entry": entry, "frame": container, "window": window}
 
     def run_single_box_ocr(self, type_key):
+        if not self._ocr_ready_or_queue(lambda: self.run_single_box_ocr(type_key)): return
         if self.ocr_engine is None or self.current_index == -1: return
 
         current_coords = self._get_coords(type_key)
         if not current_coords: return
 
         self.images_data[self.current_index]["coords"][type_key] = current_coords
-        filepath = self.images_data[self.current_index]["path"]
-
         self.status_label.configure(text=f"Skenuji {type_key}...")
-        self.update() 
-
-        try:
-            new_text = self.ocr_engine.get_text_from_region(filepath, current_coords)
-            if type_key in self.active_widgets:
-                entry = self.active_widgets[type_key]["entry"]
-                entry.delete(0, "end")
-                entry.insert(0, new_text)
-            
-            self.images_data[self.current_index]["final_values"][type_key] = new_text
-            self.status_label.configure(text=f"OCR pro {type_key} hotovo.")
-
-        except Exception as e:
-            self.status_label.configure(text=f"Chyba OCR: {e}")
+        self._submit_ocr_job({"kind": "region", "index": self.current_index, "field": type_key,
+                              "region": current_coords}, PRIORITY_INTERACTIVE)
 
     def create_interactive_box(self, raw_coords, color, type_key):
-        group_tag = f"group_{type_key}"
+        """Show the box of *type_key* at *raw_coords* (image pixels), reusing its items if it exists."""
         if raw_coords:
             xs = [pt[0] for pt in raw_coords]
             ys = [pt[1] for pt in raw_coords]
@@ -273,54 +542,72 @@ class FileSelectorApp(ctk.CTk):
             cw, ch = self.canvas.winfo_width(), self.canvas.winfo_height()
             x1, y1, x2, y2 = cw/2 - 50, ch/2 - 20, cw/2 + 50, ch/2 + 20
 
-        self.canvas.create_rectangle(x1, y1, x2, y2, outline=color, width=2, tags=(group_tag, "rect", "movable"))
-        for corner in ["NW", "NE", "SE", "SW"]:
-            self._draw_handle(x1, y1, x2, y2, group_tag, corner, color)
-
-    def _draw_handle(self, x1, y1, x2, y2, group_tag, corner, color):
-        size = 6
-        cx, cy = {"NW":(x1,y1), "NE":(x2,y1), "SE":(x2,y2), "SW":(x1,y2)}[corner]
-        self.canvas.create_rectangle(cx-size, cy-size, cx+size, cy+size, fill=color, outline="white", 
-                                     tags=(group_tag, "handle", f"corner_{corner}", "movable"))
+        box = self.box_items.get(type_key)
+        if box is None:
+            group_tag = f"group_{type_key}"
+            box = {
+                "rect": self.canvas.create_rectangle(x1, y1, x2, y2, outline=color, width=2,
+                                                     tags=(group_tag, "rect", "movable", "overlay")),
+                "corners": {corner: self.canvas.create_rectangle(0, 0, 0, 0, fill=color, outline="white",
+                                                                 tags=(group_tag, "handle", f"corner_{corner}", "movable", "overlay"))
+                            for corner in ("NW", "NE", "SE", "SW")},
+            }
+            self.box_items[type_key] = box
+        self._set_box_coords(box, x1, y1, x2, y2)
+
+    def _set_box_coords(self, box, x1, y1, x2, y2):
+        """Move the rectangle and corner handles of *box* to (x1, y1, x2, y2) in canvas pixels."""
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        box["xy"] = [x1, y1, x2, y2]
+        self.canvas.coords(box["rect"], x1, y1, x2, y2)
+        s = HANDLE_SIZE
+        for corner, (cx, cy) in _corner_points(x1, y1, x2, y2).items():
+            self.canvas.coords(box["corners"][corner], cx-s, cy-s, cx+s, cy+s)
+
+    def _remove_box(self, type_key):
+        if self.box_items.pop(type_key, None) is not None:
+            self.canvas.delete(f"group_{type_key}")
 
     def add_manual_box(self, type_key, color):
         if self.original_image:
-            self.canvas.delete(f"group_{type_key}")
+            self._remove_box(type_key)
             self.create_interactive_box(None, color, type_key)
             self.images_data[self.current_index]["final_values"][type_key] = ""
             self._save_coords_from_canvas()
-            self.show_image_on_canvas()
+            # Only this field's entry is rebuilt; text typed into the others stays
+            if type_key in self.active_widgets:
+                self.active_widgets.pop(type_key)["frame"].destroy()
+                self.canvas.delete(f"entry_{type_key}")
+            self._layout_overlays((type_key,))
         else:
             self.status_label.configure(text="Nejprve nahrajte obrázek.")
 
     # --- DRAG INTERACTION ---
     def _get_target_at_position(self, x, y, threshold=10):
+        # Pure Python on the stored box positions — no canvas queries per mouse event
+        reach = threshold + HANDLE_SIZE
         # 1. Corner handles (resize)
-        items = self.canvas.find_overlapping(x-threshold, y-threshold, x+threshold, y+threshold)
-        for item in items:
-            tags = self.canvas.gettags(item)
-            if "handle" in tags:
-                group = next((t for t in tags if t.startswith("group_")), None)
-                corner = next((t.split("_")[1] for t in tags if t.startswith("corner_")), None)
-                if group and corner:
-                    return group, "RESIZE", corner
-
-        # 2. Inside rectangle (move)
-        rects = self.canvas.find_withtag("rect")
-        for r_id in reversed(rects):
-            x1, y1, x2, y2 = self.canvas.coords(r_id)
+        for key, box in self.box_items.items():
+            for corner, (cx, cy) in _corner_points(*box["xy"]).items():
+                if abs(x - cx) <= reach and abs(y - cy) <= reach:
+                    return f"group_{key}", "RESIZE", corner
+
+        # 2. Inside rectangle (move), topmost box first
+        for key, box in reversed(list(self.box_items.items())):
+            x1, y1, x2, y2 = box["xy"]
             if x1 <= x <= x2 and y1 <= y <= y2:
-                tags = self.canvas.gettags(r_id)
-                group = next((t for t in tags if t.startswith("group_")), None)
-                if group:
-                    return group, "MOVE", None
+                return f"group_{key}", "MOVE", None
         return None, None, None
 
     def on_mouse_move(self, event):
         if self.drag_data["mode"]: return 
         _, mode, _ = self._get_target_at_position(event.x, event.y)
+        det = self._detection_at(event.x, event.y) if mode is None else None
+        self._set_hover_detection(det)
         if mode == "RESIZE": self.canvas.configure(cursor="crosshair")
         elif mode == "MOVE": self.canvas.configure(cursor="fleur")
+        elif det is not None: self.canvas.configure(cursor="hand2")
         else: self.canvas.configure(cursor="")
 
     def on_drag_start(self, event):
@@ -328,19 +615,27 @@ class FileSelectorApp(ctk.CTk):
         if group and mode:
             self.drag_data.update({"mode": mode, "group_tag": group, "corner": corner, "x": event.x, "y": event.y})
             if mode == "MOVE": self.canvas.configure(cursor="fleur")
+            return
+        det = self._detection_at(event.x, event.y)
+        if det is not None:
+            self._show_assign_menu(det, event)
 
     def on_drag_motion(self, event):
         if not self.drag_data["group_tag"]: return
-        group = self.drag_data["group_tag"]
+        key = self.drag_data["group_tag"][len("group_"):]
+        box = self.box_items.get(key)
+        if box is None: return
         dx, dy = event.x - self.drag_data["x"], event.y - self.drag_data["y"]
         
         if self.drag_data["mode"] == "MOVE":
-            self.canvas.move(group, dx, dy)
+            self.canvas.move(self.drag_data["group_tag"], dx, dy)
+            box["xy"] = [box["xy"][0] + dx, box["xy"][1] + dy, box["xy"][2] + dx, box["xy"][3] + dy]
+            if key in self.active_widgets:
+                self.canvas.move(self.active_widgets[key]["window"], dx, dy)
             self.drag_data["x"], self.drag_data["y"] = event.x, event.y
             
         elif self.drag_data["mode"] == "RESIZE":
-            rect = self.canvas.find_withtag(f"{group}&&rect")[0]
-            x1, y1, x2, y2 = self.canvas.coords(rect)
+            x1, y1, x2, y2 = box["xy"]
             c = self.drag_data["corner"]
             
             if c == "NW": x1, y1 = event.x, event.y
@@ -348,20 +643,15 @@ class FileSelectorApp(ctk.CTk):
             elif c == "SE": x2, y2 = event.x, event.y
             elif c == "SW": x1, y2 = event.x, event.y
             
-            nx1, nx2 = min(x1, x2), max(x1, x2)
-            ny1, ny2 = min(y1, y2), max(y1, y2)
-            
-            self.canvas.coords(rect, nx1, ny1, nx2, ny2)
-            s = 6
-            self.canvas.coords(self.canvas.find_withtag(f"{group}&&corner_NW")[0], nx1-s, ny1-s, nx1+s, ny1+s)
-            self.canvas.coords(self.canvas.find_withtag(f"{group}&&corner_NE")[0], nx2-s, ny1-s, nx2+s, ny1+s)
-            self.canvas.coords(self.canvas.find_withtag(f"{group}&&corner_SE")[0], nx2-s, ny2-s, nx2+s, ny2+s)
-            self.canvas.coords(self.canvas.find_withtag(f"{group}&&corner_SW")[0], nx1-s, ny2-s, nx1+s, ny2+s)
+            self._set_box_coords(box, x1, y1, x2, y2)
 
     def on_drag_stop(self, event):
-        self._save_current_entries_text()
-        self._save_coords_from_canvas()
-        self.show_image_on_canvas()
+        group = self.drag_data["group_tag"]
+        if group:
+            # Snap the dragged box to image pixels and move its entry along
+            with METRICS.timer("gui_overlay"):
+                self._save_coords_from_canvas()
+                self._layout_overlays((group[len("group_"):],))
         self.drag_data = {"x":0, "y":0, "item":None, "mode":None, "group_tag":None, "corner":None}
         self.canvas.configure(cursor="")
 
@@ -382,12 +672,14 @@ class FileSelectorApp(ctk.CTk):
             print(f"[System] Otočený soubor uložen: {temp_path}")
 
             # 3. Update app data
-            self.images_data[self.current_index]["image"] = self.original_image
             self.images_data[self.current_index]["path"] = temp_path
+            self._cache_image(temp_path, self.original_image)
             
             # Reset boxes (coordinates no longer valid after rotation)
             self.images_data[self.current_index]["coords"] = {"price": None, "date": None, "vendor": None}
             self.images_data[self.current_index]["ocr_done"] = False
+            self.images_data[self.current_index].pop("detections", None)
+            self.images_data[self.current_index].pop("journal_key", None)  # hash of the old pixels
             
             # Redraw
             self.show_image_on_canvas()
@@ -402,17 +694,19 @@ class FileSelectorApp(ctk.CTk):
 
         paths = filedialog.askopenfilenames(initialdir=home_dir, filetypes=[("Images", "*.png *.jpg *.jpeg"), ("All", "*")])
         if paths:
+            # Nothing is decoded here — hundreds of photos are listed instantly
+            self._cancel_ocr()
+            self.process_btn.configure(state="normal")
             self.images_data = []
+            self.image_cache.clear()
+            self._display_cache.clear()
             for p in paths:
-                img = self._load_image(p)
-                if img:
-                    self.images_data.append({
-                        "path": p, "image": img, 
-                        # Initialize with empty vendor key
-                        "coords": {"price": None, "date": None, "vendor": None}, 
-                        "final_values": {"price": None, "date": None, "vendor": None},
-                        "ocr_done": False
-                    })
+                self.images_data.append({
+                    "path": p,
+                    "coords": {"price": None, "date": None, "vendor": None}, 
+                    "final_values": {"price": None, "date": None, "vendor": None},
+                    "ocr_done": False
+                })
             if self.images_data:
                 self.current_index = 0
                 self.load_image_by_index(0)
@@ -424,6 +718,34 @@ class FileSelectorApp(ctk.CTk):
         try: return ImageOps.exif_transpose(Image.open(path)).convert("RGB")
         except: return None
 
+    def _cache_image(self, path, img):
+        """Keep the decoded *img* of *path* in the byte-bounded cache."""
+        try: st = os.stat(path)
+        except OSError: return
+        self.image_cache.put(path, img, img.width * img.height * len(img.getbands()),
+                             (st.st_mtime_ns, st.st_size))
+
+    def _get_image(self, path):
+        """Decoded RGB image of *path* from the cache, decoding it on a miss (None if unreadable)."""
+        try: st = os.stat(path)
+        except OSError: return None
+        img = self.image_cache.get(path, (st.st_mtime_ns, st.st_size))
+        if img is None:
+            img = self._load_image(path)
+            if img is not None:
+                self._cache_image(path, img)
+        return img
+
+    def _prefetch_image(self, idx):
+        """Decode the image at *idx* in the background so that "Další >" is instant."""
+        if not 0 <= idx < len(self.images_data): return
+        if self._prefetch_thread is not None and self._prefetch_thread.is_alive(): return
+        path = self.images_data[idx]["path"]
+        if path in self.image_cache: return
+        # Runs off the Tk thread — only touches the thread-safe cache
+        self._prefetch_thread = threading.Thread(target=self._get_image, args=(path,), daemon=True)
+        self._prefetch_thread.start()
+
     def change_image(self, direction):
         if not self.images_data: return
         self._save_current_entries_text() 
@@ -436,8 +758,17 @@ class FileSelectorApp(ctk.CTk):
 
     def load_image_by_index(self, idx):
         data = self.images_data[idx]
-        self.original_image = data["image"]
+        self.original_image = self._get_image(data["path"])
+        if self.original_image is None:
+            self._clear_overlays()
+            self._rendered_size = None
+            if self._bg_item is not None:
+                self.canvas.itemconfigure(self._bg_item, state="hidden")
+            self.canvas.itemconfigure(self.text_id, text="Obrázek nelze načíst", state="normal")
+            self.status_label.configure(text=f"Nelze načíst: {os.path.basename(data['path'])}")
+            return
         self.show_image_on_canvas()
+        self._prefetch_image(idx + 1)
 
     def _save_current_entries_text(self):
         if self.current_index == -1: return
@@ -452,9 +783,9 @@ class FileSelectorApp(ctk.CTk):
         self.images_data[self.current_index]["coords"]["vendor"] = self._get_coords("vendor")
 
     def _get_coords(self, key):
-        rects = self.canvas.find_withtag(f"group_{key}&&rect")
-        if not rects: return None
-        x1, y1, x2, y2 = self.canvas.coords(rects[0])
+        box = self.box_items.get(key)
+        if box is None: return None
+        x1, y1, x2, y2 = box["xy"]
         if self.scale_ratio > 0:
             return [[int(x/self.scale_ratio), int(y/self.scale_ratio)] for x,y in [(x1,y1), (x2,y1), (x2,y2), (x1,y2)]]
         return None
@@ -466,172 +797,227 @@ class FileSelectorApp(ctk.CTk):
         self.btn_prev.configure(state="normal" if self.current_index > 0 else "disabled")
         self.btn_next.configure(state="normal" if self.current_index < total - 1 else "disabled")
 
-    # --- OCR THREAD ---
-    def run_current_image_ocr(self):
-            """
-            Runs a complete OCR only for the currently displayed image.
-            ALWAYS overwrites old data with new data.
-            """
-            if self.ocr_engine is None or self.current_index == -1:
-                return
-            
-            self.btn_ocr_current.configure(state="disabled")
-
-            # 1. Save current entries and coords
+    # --- OCR WORKER ---
+    def _get_ocr_worker(self):
+        if self._ocr_worker is None:
+            self._ocr_worker = OCRWorker(self.ocr_engine, self.journal)
+        return self._ocr_worker
+
+    def _submit_ocr_job(self, job, priority):
+        """Queue *job* for the image at job["index"] and make sure results are picked up."""
+        data = self.images_data[job["index"]]
+        job.update(generation=self._ocr_generation, path=data["path"])
+        self._get_ocr_worker().submit(job, priority)
+        if self._ocr_poll_job is None:
+            self._ocr_poll_job = self.after(OCR_POLL_MS, self._poll_ocr_results)
+
+    def _submit_image_job(self, index, force=False):
+        data = self.images_data[index]
+        job = {"kind": "image", "index": index, "force": force,
+               "boxes": dict(data["coords"]), "journal_key": data.get("journal_key")}
+        # A re-run of the displayed image overtakes the queued batch
+        self._submit_ocr_job(job, PRIORITY_INTERACTIVE if force else PRIORITY_BATCH)
+
+    def _poll_ocr_results(self):
+        # Tk thread: the only place where OCR results touch images_data and widgets
+        self._ocr_poll_job = None
+        for result in self._ocr_worker.poll():
+            self._apply_ocr_result(result)
+        if self._ocr_worker.pending:
+            self._ocr_poll_job = self.after(OCR_POLL_MS, self._poll_ocr_results)
+
+    def _apply_ocr_result(self, result):
+        idx = result["index"]
+        # Dropped if the selection changed or the image was rotated meanwhile
+        valid = (result["generation"] == self._ocr_generation and idx < len(self.images_data)
+                 and self.images_data[idx]["path"] == result["path"])
+        if result["kind"] == "region":
+            if valid: self._apply_region_result(result)
+            return
+        if result["force"]:
+            self.btn_ocr_current.configure(state="normal")
+
+        if valid and result["error"]:
+            if self._batch is not None and not result["force"]:
+                self._batch["errors"] += 1
+                self._batch["last_error"] = f"(-)ERROR in file {result['path']}: {result['error']}"
+            else:
+                self.status_label.configure(text=f"Chyba OCR: {result['error']}")
+        elif valid:
+            self._merge_ocr_result(self.images_data[idx], result, idx == self.current_index)
+            if result["force"]:
+                self.status_label.configure(text="OCR aktuálního snímku hotovo." + self._latency_text())
+            self._log_startup("první výsledek OCR")
+
+        if self._batch is not None and not result["force"] and result["generation"] == self._batch["generation"]:
+            self._batch["done"] += 1
+            self._update_batch_progress()
+
+    def _merge_ocr_result(self, data, result, is_current):
+        """
+        Apply an image result to *data*.
+
+        A full re-run of the current image overwrites every field. Otherwise
+        only empty fields are filled, and a box the reviewer moved while the
+        image was queued is kept.
+        """
+        if is_current:
+            self._save_current_entries_text()
             self._save_coords_from_canvas()
+        changed = []
+        for key in FIELD_COLORS:
+            coords, value = result["coords"].get(key), result["values"].get(key)
+            if result["force"]:
+                data["coords"][key], data["final_values"][key] = coords, value
+                changed.append(key)
+                continue
+            if data["coords"][key] not in (None, result["boxes"].get(key)):
+                continue
+            if not data["coords"][key] and coords:
+                data["coords"][key] = coords
+                changed.append(key)
+            if not data["final_values"][key] and value:
+                data["final_values"][key] = value
+                changed.append(key)
+
+        if result["detections"]:
+            data["detections"] = result["detections"]
+        if result.get("journal_key"):
+            data["journal_key"] = result["journal_key"]
+        data["ocr_done"] = True
+        if not result["from_journal"]:
+            self._save_to_journal(data)
+
+        if is_current and self.original_image is not None:
+            # Only the changed fields move; an entry being typed into stays
+            changed = list(dict.fromkeys(changed))
+            for key in changed:
+                if key in self.active_widgets:
+                    self._set_entry_text(key, data["final_values"][key])
+            self._layout_overlays(changed)
+            if self.show_detections.get():
+                self._draw_detections()
+
+    def _apply_region_result(self, result):
+        key = result["field"]
+        if result["error"]:
+            self.status_label.configure(text=f"Chyba OCR: {result['error']}")
+            return
+        self.images_data[result["index"]]["final_values"][key] = result["text"]
+        if result["index"] == self.current_index and key in self.active_widgets:
+            self._set_entry_text(key, result["text"])
+        self.status_label.configure(text=f"OCR pro {key} hotovo.")
+        self._log_startup("první výsledek OCR")
 
-            # 2. UI Feedback
-            self.status_label.configure(text="Skenuji aktuální snímek...")
-            self.update() 
+    def _set_entry_text(self, key, text):
+        entry = self.active_widgets[key]["entry"]
+        entry.delete(0, "end")
+        entry.insert(0, str(text) if text else "")
 
-            data = self.images_data[self.current_index]
-            path = data["path"]
+    def run_current_image_ocr(self):
+        """
+        Runs a complete OCR for the currently displayed image, ahead of a running batch.
+        ALWAYS overwrites old data with new data.
+        """
+        if not self._ocr_ready_or_queue(self.run_current_image_ocr):
+            return
+        if self.ocr_engine is None or self.current_index == -1:
+            return
 
-            try:
-                # 3. Start analysis
-                self.ocr_engine.analyze_image(path)
-
-                # 4. Aplication of results
-
-                # --- PRICE ---
-                p_result = self.ocr_engine.get_price_coords()
-                if isinstance(p_result, tuple):
-                    data["coords"]["price"] = p_result[0]
-                    # Store text if available, otherwise None
-                    data["final_values"]["price"] = p_result[1] if p_result[1] else None
-                else:
-                    data["coords"]["price"] = p_result
-                
-                # If MyOCR did not find price text directly, try reading from the region
-                if not data["final_values"]["price"] and data["coords"]["price"]:
-                    data["final_values"]["price"] = self.ocr_engine.get_text_from_region(path, data["coords"]["price"])
-
-                # --- DATE ---
-                d_result = self.ocr_engine.get_date()
-                if isinstance(d_result, tuple):
-                    data["coords"]["date"] = d_result[0]
-                    data["final_values"]["date"] = d_result[1] if d_result[1] else None
-                else:
-                    data["coords"]["date"] = d_result if isinstance(d_result, list) else d_result
-
-                if not data["final_values"]["date"] and data["coords"]["date"]:
-                    data["final_values"]["date"] = self.ocr_engine.get_text_from_region(path, data["coords"]["date"])
-
-                # --- VENDOR ---
-                v_result = self.ocr_engine.get_vendor_coords()
-                if isinstance(v_result, tuple):
-                    data["coords"]["vendor"] = v_result[0]
-                    data["final_values"]["vendor"] = v_result[1] if v_result[1] else None
-                else:
-                    data["coords"]["vendor"] = v_result
-
-                if not data["final_values"]["vendor"] and data["coords"]["vendor"]:
-                    data["final_values"]["vendor"] = self.ocr_engine.get_text_from_region(path, data["coords"]["vendor"])
-
-                # 5. Mark as processed
-                data["ocr_done"] = True
-
-                # 6. Refresh the GUI
-                self.show_image_on_canvas()
-                self.status_label.configure(text="OCR aktuálního snímku hotovo.")
-
-            except Exception as e:
-                self.status_label.configure(text=f"Chyba OCR: {e}")
-                print(f"Error: {e}")
-                import traceback
-                traceback.print_exc()
-            finally:
-                self.btn_ocr_current.configure(state="normal")
+        self.btn_ocr_current.configure(state="disabled")
+        self._save_coords_from_canvas()
+        self.status_label.configure(text="Skenuji aktuální snímek...")
+        self._submit_image_job(self.current_index, force=True)
 
     def start_ocr_process(self):
+        if not self._ocr_ready_or_queue(self.start_ocr_process): return
         if self.ocr_engine is None: return
         self._save_coords_from_canvas()
-        
+
+        todo = [i for i, data in enumerate(self.images_data) if not data["ocr_done"]]
+        if not todo:
+            self.status_label.configure(text="Všechny snímky už jsou zpracované.")
+            return
+
         self.process_btn.configure(state="disabled")
-        
-        self.progress_bar.pack(pady=10); self.progress_bar.start()
+        self.progress_bar.set(0)
+        self.progress_bar.pack(pady=10)
+        self._batch = {"generation": self._ocr_generation, "total": len(todo), "done": 0,
+                       "errors": 0, "last_error": "", "start": time.perf_counter()}
         self.status_label.configure(text="OCR běží (automaticky)...")
-        
-        self._ocr_thread = threading.Thread(target=self.ocr_thread_logic)
-        self._ocr_thread.start()
-        self.monitor_ocr_thread()
+        # The displayed image goes first, the rest in order
+        todo.sort(key=lambda i: (i < self.current_index, i))
+        for i in todo:
+            self._submit_image_job(i)
+
+    def _update_batch_progress(self):
+        """Progress bar, throughput and ETA of the running batch."""
+        b = self._batch
+        elapsed = time.perf_counter() - b["start"]
+        rate = b["done"] / elapsed if elapsed > 0 else 0.0
+        self.progress_bar.set(b["done"] / b["total"])
+        if b["done"] < b["total"]:
+            eta = (b["total"] - b["done"]) / rate if rate > 0 else None
+            self.status_label.configure(
+                text=f"OCR {b['done']}/{b['total']} · {rate:.2f} snímků/s · zbývá {_format_duration(eta)}"
+                     + self._latency_text())
+            return
 
-    
-    def ocr_thread_logic(self):
-            if self.ocr_engine is None: return
-
-            errors = 0
-            total = len(self.images_data)
-
-            for i, data in enumerate(self.images_data):
-                try: 
-                    self.current_processing_status = f"OCR {i+1}/{total}..."
-                    self.ocr_engine.analyze_image(data["path"])
-                    
-                    # --- PRICE ---
-                    if not data["coords"]["price"]: 
-                        res = self.ocr_engine.get_price_coords()
-                        if isinstance(res, tuple):
-                            data["coords"]["price"] = res[0]
-                            if res[1]: data["final_values"]["price"] = res[1]
-                        else:
-                            data["coords"]["price"] = res
-
-                    # --- DATE ---
-                    if not data["coords"]["date"]: 
-                        res = self.ocr_engine.get_date()
-                        if isinstance(res, tuple):
-                            data["coords"]["date"] = res[0]
-                            if res[1]: data["final_values"]["date"] = res[1]
-                        else:
-                            data["coords"]["date"] = res
-
-                    # --- VENDOR ---
-                    if not data["coords"]["vendor"]: 
-                        res = self.ocr_engine.get_vendor_coords()
-                        if isinstance(res, tuple):
-                            data["coords"]["vendor"] = res[0]
-                            if res[1]: data["final_values"]["vendor"] = res[1]
-                        else:
-                            data["coords"]["vendor"] = res
-                    
-                    
-                    # Price
-                    if not data["final_values"]["price"] and data["coords"]["price"]:
-                        data["final_values"]["price"] = self.ocr_engine.get_text_from_region(data["path"], data["coords"]["price"])
-                    
-                    # Date
-                    if not data["final_values"]["date"] and data["coords"]["date"]:
-                        data["final_values"]["date"] = self.ocr_engine.get_text_from_region(data["path"], data["coords"]["date"])
-
-                    # Vendor
-                    if not data["final_values"]["vendor"] and data["coords"]["vendor"]:
-                        data["final_values"]["vendor"] = self.ocr_engine.get_text_from_region(data["path"], data["coords"]["vendor"])
-                    
-                    data["ocr_done"] = True
-                    self._thread_result_msg = "(+)OCR done."
-
-                except Exception as e:
-                    errors += 1
-                    self._thread_result_msg = f"(-)ERROR in file {data['path']}: {e}"
-                    print(f"Error processing {data['path']}: {e}")
-                    
-
-    def monitor_ocr_thread(self):
-        if self._ocr_thread and self._ocr_thread.is_alive():
-            if hasattr(self, 'current_processing_status'):
-                self.status_label.configure(text=self.current_processing_status)
-
-            self.after(100, self.monitor_ocr_thread)
-        else:
-            self.progress_bar.stop(); self.progress_bar.pack_forget()
-            self.status_label.configure(text=self._thread_result_msg)
-            self.process_btn.configure(state="normal")
-            self.show_image_on_canvas()
+        self._batch = None
+        self.progress_bar.pack_forget()
+        self.process_btn.configure(state="normal")
+        msg = b["last_error"] if b["errors"] else "(+)OCR done."
+        self.status_label.configure(text=f"{msg} {b['done']} snímků za {_format_duration(elapsed)}"
+                                         f" ({rate:.2f} snímků/s)")
+
+    def _cancel_ocr(self):
+        """Forget queued OCR work (new file selection)."""
+        self._ocr_generation += 1
+        if self._ocr_worker is not None:
+            self._ocr_worker.cancel_pending()
+        if self._batch is not None:
+            self._batch = None
+            self.progress_bar.pack_forget()
+
+    # --- RESULTS JOURNAL ---
+    def _journal_key(self, data):
+        """Content hash of the entry's image (computed once), None without a journal."""
+        if self.journal is None: return None
+        if "journal_key" not in data:
+            try: data["journal_key"] = self.journal.key_for(data["path"])
+            except OSError: data["journal_key"] = None
+        return data["journal_key"]
+
+    def _journal_record(self, data):
+        return {
+            "filepath": data["path"],
+            "price_text": data["final_values"]["price"],
+            "date_text": data["final_values"]["date"],
+            "vendor_text": data["final_values"]["vendor"],
+            "coords": data["coords"],
+        }
+
+    def _save_to_journal(self, data):
+        key = self._journal_key(data)
+        if key is None: return
+        try:
+            self.journal.append(key, self._journal_record(data))
+        except (OSError, TypeError) as e:
+            print(f"(-) Nelze zapsat do deníku výsledků: {e}")
 
     # --- EXPORT ---
     def finalize_and_close(self):
         self._save_current_entries_text()
+        self._save_coords_from_canvas()
+        if self.journal is not None:
+            # Manual corrections: the latest record of a receipt wins
+            edited = [item for item in self.images_data
+                      if item["ocr_done"] or any(item["final_values"].values())]
+            try:
+                self.journal.append_many([(self._journal_key(item), self._journal_record(item))
+                                          for item in edited if self._journal_key(item)])
+            except (OSError, TypeError) as e:
+                print(f"(-) Nelze zapsat do deníku výsledků: {e}")
         export_list = []
         for item in self.images_data:
             export_list.append({
@@ -641,6 +1027,9 @@ class FileSelectorApp(ctk.CTk):
                 "vendor_text": item["final_values"]["vendor"]  # Export vendor name
             })
         self.final_output_data = export_list
+        if self._ocr_worker is not None:
+            self._ocr_worker.stop()
+        self.final_output_format = self.export_format.get()
         self.destroy()
 
     
@@ -670,12 +1059,14 @@ class FileSelectorApp(ctk.CTk):
 
             # 3. Update app data
             self.original_image = new_image
-            self.images_data[self.current_index]["image"] = new_image
             self.images_data[self.current_index]["path"] = temp_path  # Swap in new path
+            self._cache_image(temp_path, new_image)
             
             # Reset boxes (coordinates no longer valid after deskew)
             self.images_data[self.current_index]["coords"] = {"price": None, "date": None, "vendor": None}
             self.images_data[self.current_index]["ocr_done"] = False
+            self.images_data[self.current_index].pop("detections", None)
+            self.images_data[self.current_index].pop("journal_key", None)  # hash of the old pixels
             
             # Redraw
             self.show_image_on_canvas()
@@ -684,6 +1075,16 @@ class FileSelectorApp(ctk.CTk):
         except Exception as e:
             self.status_label.configure(text=f"Chyba: {e}")
 
+def _format_duration(seconds):
+    """Short Czech duration, e.g. "1 min 20 s" ("?" if unknown)."""
+    if seconds is None: return "?"
+    seconds = int(round(seconds))
+    if seconds < 60: return f"{seconds} s"
+    return f"{seconds // 60} min {seconds % 60} s"
+
+def _corner_points(x1, y1, x2, y2):
+    return {"NW": (x1, y1), "NE": (x2, y1), "SE": (x2, y2), "SW": (x1, y2)}
+
 def deskew_image_logic(pil_image):
     """
     Straighten a skewed image by detecting dominant line angles.
@@ -691,6 +1092,9 @@ def deskew_image_logic(pil_image):
     Returns:
         tuple: (corrected_image, was_changed_bool)
     """
+    import cv2
+    import numpy as np
+
     # 1. Convert to OpenCV format
     img = np.array(pil_image)
     if len(img.shape) == 3:
@@ -755,10 +1159,11 @@ def deskew_image_logic(pil_image):
 
     return Image.fromarray(cv2.cvtColor(rotated, cv2.COLOR_BGR2RGB)), True
 
-def create_window():
-    app = FileSelectorApp()
+def create_window(journal=None):
+    """Run the editor; returns (results or None, chosen export format)."""
+    app = FileSelectorApp(journal)
     app.mainloop()
-    return app.final_output_data
+    return app.final_output_data, app.final_output_format
 
 if __name__ == "__main__":
     create_window()
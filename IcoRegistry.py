@@ -0,0 +1,212 @@
+"""
+Offline index of the Czech business register (IČO -> company name).
+
+A CSV export of the register is compiled once into a compact binary file:
+
+    header   8s magic, uint32 count, uint32 reserved        (16 bytes)
+    icos     uint32[count], sorted ascending
+    offsets  uint32[count + 1] into the names blob
+    names    UTF-8 company names, concatenated
+
+The file is memory-mapped and binary-searched, so even millions of entries
+take almost no RAM (only the touched pages are read) and a lookup costs a
+few microseconds.
+
+Usage:
+    python IcoRegistry.py ares_dump.csv registr.bin
+    python IcoRegistry.py dump.csv registr.bin --ico-column ico --name-column obchodni_jmeno
+"""
+import argparse
+import csv
+import os
+import re
+import struct
+import sys
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from AtomicFile import atomic_path
+
+_MAGIC = b"ORRICO01"
+_HEADER = struct.Struct("<8sII")
+
+# IČO after its label ("IČ:", "IČO", "DIČ: CZ", also OCR'd without the
+# háček) or a CZ-DIČ of a legal entity (CZ + the 8-digit IČO); digits may be
+# split by single spaces
+_ICO_NUMBER = re.compile(
+    r"(?:\bi[čc][o0]?|\bdi[čc])\s*[:.]?\s*(?:cz)?\s*((?:\d ?){7}\d)(?!\d)"
+    r"|\bcz\s*((?:\d ?){7}\d)(?!\d)",
+    re.IGNORECASE,
+)
+
+# Header names recognised when the columns are not given explicitly
+_ICO_HEADERS = ("ico", "ičo", "ic", "ič")
+_NAME_HEADERS = ("nazev", "název", "obchodni_jmeno", "obchodnijmeno", "obchodní jméno",
+                 "obchodni jmeno", "jmeno", "jméno", "name")
+
+
+def ico_checksum_ok(ico: str) -> bool:
+    """Validate the mod-11 check digit of an 8-digit IČO."""
+    if len(ico) != 8 or not ico.isdigit():
+        return False
+    total = sum(int(d) * w for d, w in zip(ico[:7], range(8, 1, -1)))
+    remainder = total % 11
+    check = 1 if remainder == 0 else 0 if remainder == 1 else 11 - remainder
+    return check == int(ico[7])
+
+
+def find_ico_numbers(text: str) -> List[Tuple[int, int, str]]:
+    """
+    Return (start, end, ico) for every IČO / CZ-DIČ in *text* with a valid checksum.
+    """
+    found = []
+    for m in _ICO_NUMBER.finditer(text):
+        group = 1 if m.group(1) is not None else 2
+        ico = m.group(group).replace(" ", "")
+        if ico_checksum_ok(ico):
+            found.append((m.start(group), m.end(group), ico))
+    return found
+
+
+# ==========================================
+# COMPILING
+# ==========================================
+
+def _pick_column(header: Sequence[str], wanted: Optional[str], candidates: Sequence[str]) -> int:
+    normalized = [h.strip().lower() for h in header]
+    if wanted:
+        if wanted.lower() not in normalized:
+            raise ValueError(f"Sloupec '{wanted}' v CSV chybí (k dispozici: {', '.join(header)})")
+        return normalized.index(wanted.lower())
+    for name in candidates:
+        if name in normalized:
+            return normalized.index(name)
+    raise ValueError(f"Nelze určit sloupec ({' / '.join(candidates)}), zadejte ho ručně")
+
+
+def compile_registry(csv_path: str, out_path: str, ico_column: Optional[str] = None,
+                     name_column: Optional[str] = None, delimiter: Optional[str] = None) -> int:
+    """
+    Compile a register CSV export into the binary index at *out_path*.
+
+    Rows without a usable IČO or name are skipped; for duplicate IČOs the
+    last row wins. The output is replaced atomically.
+
+    Returns:
+        Number of entries written.
+    """
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        if delimiter is None:
+            delimiter = csv.Sniffer().sniff(f.read(64 * 1024), delimiters=",;\t|").delimiter
+            f.seek(0)
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader)
+        ico_idx = _pick_column(header, ico_column, _ICO_HEADERS)
+        name_idx = _pick_column(header, name_column, _NAME_HEADERS)
+
+        names_by_ico = {}
+        for row in reader:
+            if len(row) <= max(ico_idx, name_idx):
+                continue
+            digits = "".join(ch for ch in row[ico_idx] if ch.isdigit())
+            name = row[name_idx].strip()
+            if not digits or len(digits) > 8 or not name:
+                continue
+            names_by_ico[int(digits)] = name
+
+    icos = np.fromiter(names_by_ico.keys(), dtype=np.uint32, count=len(names_by_ico))
+    icos.sort()
+    encoded = [names_by_ico[int(ico)].encode("utf-8") for ico in icos]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(b) for b in encoded], dtype=np.int64)
+
+    with atomic_path(out_path) as temp_path:
+        with open(temp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, len(icos), 0))
+            f.write(icos.astype("<u4").tobytes())
+            f.write(offsets.tobytes())
+            for b in encoded:
+                f.write(b)
+    return len(icos)
+
+
+# ==========================================
+# LOOKUP
+# ==========================================
+
+class IcoRegistry:
+    """
+    Read-only, memory-mapped IČO -> company name index.
+
+    Attributes:
+        path (str): The compiled registry file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+        if len(data) < _HEADER.size:
+            raise ValueError(f"Soubor registru je poškozený: {path}")
+        magic, count, _ = _HEADER.unpack(bytes(data[:_HEADER.size]))
+        if magic != _MAGIC:
+            raise ValueError(f"Soubor není zkompilovaný registr IČO: {path}")
+
+        ico_end = _HEADER.size + 4 * count
+        offsets_end = ico_end + 4 * (count + 1)
+        # A truncated file would otherwise fail (or read garbage) in lookup()
+        if len(data) < offsets_end:
+            raise ValueError(f"Soubor registru je poškozený (zkrácený): {path}")
+        self._data = data
+        self._icos = data[_HEADER.size:ico_end].view("<u4")
+        self._offsets = data[ico_end:offsets_end].view("<u4")
+        self._names = data[offsets_end:]
+        if int(self._offsets[-1]) > len(self._names):
+            raise ValueError(f"Soubor registru je poškozený (zkrácený): {path}")
+
+    def __len__(self) -> int:
+        return len(self._icos)
+
+    def lookup(self, ico) -> Optional[str]:
+        """Return the company name for *ico* (int or digit string), or None."""
+        try:
+            key = int(ico)
+        except (TypeError, ValueError):
+            return None
+        if not 0 <= key <= 0xFFFFFFFF:
+            return None
+        # A uint32 key — any other type makes numpy convert the whole array
+        i = int(np.searchsorted(self._icos, np.uint32(key)))
+        if i >= len(self._icos) or self._icos[i] != key:
+            return None
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return bytes(self._names[start:end]).decode("utf-8")
+
+    def __contains__(self, ico) -> bool:
+        return self.lookup(ico) is not None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Zkompiluje CSV export obchodního rejstříku pro vyhledávání podle IČO.")
+    parser.add_argument("csv", help="CSV export rejstříku (s hlavičkou).")
+    parser.add_argument("output", help="Výstupní binární soubor registru.")
+    parser.add_argument("--ico-column", help="Název sloupce s IČO (výchozí: autodetekce).")
+    parser.add_argument("--name-column", help="Název sloupce s obchodním jménem (výchozí: autodetekce).")
+    parser.add_argument("--delimiter", help="Oddělovač sloupců (výchozí: autodetekce).")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        count = compile_registry(args.csv, args.output, args.ico_column, args.name_column, args.delimiter)
+    except (OSError, ValueError, csv.Error) as e:
+        print(f"(!) CHYBA: {e}")
+        return 1
+    size_mb = os.path.getsize(args.output) / (1024 * 1024)
+    print(f"(+) Zkompilováno {count} záznamů do {args.output} ({size_mb:.1f} MB) "
+          f"za {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
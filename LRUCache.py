@@ -0,0 +1,102 @@
+"""
+Small thread-safe LRU cache bounded by a byte budget.
+
+Used for decoded/preprocessed images, where the number of entries matters
+much less than how much memory they take.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class ByteLRU:
+    """
+    Least-recently-used cache whose capacity is a total size in bytes.
+
+    Every entry is stored together with a *stamp* (e.g. file mtime and
+    size); ``get`` with a different stamp treats the entry as stale,
+    drops it and counts a miss.
+
+    Attributes:
+        max_bytes (int): Size budget; the oldest entries are evicted above it.
+        hits (int): Successful lookups.
+        misses (int): Failed or stale lookups.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (stamp, value, size)
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, stamp: Any = None) -> Optional[Any]:
+        """Return the value for *key* if present and its stamp matches *stamp*."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            if item[0] != stamp:
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key: Hashable, value: Any, size: int, stamp: Any = None) -> None:
+        """
+        Store *value* (taking *size* bytes) and evict old entries over budget.
+
+        A value larger than the whole budget is not stored at all.
+        """
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+            if size > self.max_bytes:
+                return
+            self._items[key] = (stamp, value, size)
+            self._total += size
+            while self._total > self.max_bytes and self._items:
+                self._drop(next(iter(self._items)))
+
+    def discard(self, key: Hashable) -> None:
+        """Remove *key* if present."""
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._total = 0
+
+    def _drop(self, key: Hashable) -> None:
+        # Caller holds the lock
+        _, _, size = self._items.pop(key)
+        self._total -= size
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and memory usage."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._items),
+            "bytes": self._total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,169 @@
+"""
+Reconstruction of visual text lines from EasyOCR fragments.
+
+EasyOCR returns text fragments in detection order, which on multi-column
+receipts does not follow the visual lines. ``LineTable.from_ocr`` groups
+fragments into lines by vertical overlap and orders each line left to
+right, using NumPy over the box arrays (a single sort plus a few
+vectorized reductions — no per-pair Python loops).
+
+The resulting table is what the field extractors (ReturnPrice, ReturnDate,
+ReturnVendor) work on.
+"""
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Two vertically adjacent fragments are on the same line when they overlap
+# by at least this fraction of the smaller fragment height
+_LINE_OVERLAP_RATIO = 0.5
+
+
+def _group_lines(boxes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Group (n, 4) [x1, y1, x2, y2] *boxes* into visual lines.
+
+    Returns:
+        (order, line_id): *order* lists box indices in reading order (lines
+        top to bottom, boxes left to right); *line_id[k]* is the line number
+        of box ``order[k]``.
+    """
+    n = len(boxes)
+    if n == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+    y1, y2 = boxes[:, 1], boxes[:, 3]
+    by_y = np.argsort((y1 + y2) / 2, kind="stable")
+    sy1, sy2 = y1[by_y], y2[by_y]
+    sh = sy2 - sy1
+
+    # Overlap of each fragment with the previous one in vertical order
+    overlap = np.minimum(sy2[1:], sy2[:-1]) - np.maximum(sy1[1:], sy1[:-1])
+    min_h = np.minimum(sh[1:], sh[:-1])
+    new_line = overlap < _LINE_OVERLAP_RATIO * np.maximum(min_h, 1e-6)
+    line_of_sorted = np.concatenate(([0], np.cumsum(new_line)))
+
+    # Within a line: left to right
+    perm = np.lexsort((boxes[by_y, 0], line_of_sorted))
+    return by_y[perm], line_of_sorted[perm]
+
+
+def reading_order(boxes: Sequence[Sequence[float]]) -> List[int]:
+    """Return the indices of (x1, y1, x2, y2) *boxes* in reading order."""
+    if len(boxes) == 0:
+        return []
+    order, _ = _group_lines(np.asarray(boxes, dtype=np.float64).reshape(-1, 4))
+    return order.tolist()
+
+
+class LineTable:
+    """
+    Compact table of visual text lines built from EasyOCR output.
+
+    Attributes:
+        texts (list[str]): Line text (fragments joined by one space).
+        boxes (np.ndarray): (n_lines, 4) line bounds [x1, y1, x2, y2].
+        confidences (np.ndarray): Mean fragment confidence per line.
+        fragment_ids (list[list[int]]): Indices into the original OCR data,
+            left to right, for every line.
+        fragment_spans (list[list[tuple]]): (start, end) character span of
+            each fragment inside the line text.
+        fragment_boxes (np.ndarray): (n_fragments, 4) bounds of every
+            original fragment (rows of skipped fragments are zero).
+    """
+
+    def __init__(self, texts, boxes, confidences, fragment_ids, fragment_spans, fragment_boxes):
+        self.texts: List[str] = texts
+        self.boxes: np.ndarray = boxes
+        self.confidences: np.ndarray = confidences
+        self.fragment_ids: List[List[int]] = fragment_ids
+        self.fragment_spans: List[List[Tuple[int, int]]] = fragment_spans
+        self.fragment_boxes: np.ndarray = fragment_boxes
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @classmethod
+    def from_ocr(cls, data: Optional[List[Any]]) -> "LineTable":
+        """Build the line table from ``reader.readtext`` output."""
+        data = data or []
+        fragment_boxes = np.zeros((len(data), 4), dtype=np.float64)
+        conf = np.zeros(len(data), dtype=np.float64)
+        valid: List[int] = []
+
+        for i, item in enumerate(data):
+            try:
+                text = item[1]
+                pts = np.asarray(item[0], dtype=np.float64).reshape(-1, 2)
+            except (TypeError, ValueError, IndexError):
+                continue
+            if not isinstance(text, str) or len(pts) == 0:
+                continue
+            fragment_boxes[i] = (pts[:, 0].min(), pts[:, 1].min(), pts[:, 0].max(), pts[:, 1].max())
+            conf[i] = float(item[2]) if len(item) > 2 else 1.0
+            valid.append(i)
+
+        if not valid:
+            return cls([], np.zeros((0, 4)), np.zeros(0), [], [], fragment_boxes)
+
+        valid_ids = np.asarray(valid, dtype=np.intp)
+        order, line_id = _group_lines(fragment_boxes[valid_ids])
+        frag_order = valid_ids[order]
+
+        # Line boundaries in the reading-ordered fragment list
+        starts = np.flatnonzero(np.concatenate(([True], line_id[1:] != line_id[:-1])))
+        ordered_boxes = fragment_boxes[frag_order]
+        line_boxes = np.column_stack((
+            np.minimum.reduceat(ordered_boxes[:, 0], starts),
+            np.minimum.reduceat(ordered_boxes[:, 1], starts),
+            np.maximum.reduceat(ordered_boxes[:, 2], starts),
+            np.maximum.reduceat(ordered_boxes[:, 3], starts),
+        ))
+        counts = np.diff(np.append(starts, len(frag_order)))
+        line_conf = np.add.reduceat(conf[frag_order], starts) / counts
+
+        texts: List[str] = []
+        fragment_ids: List[List[int]] = []
+        fragment_spans: List[List[Tuple[int, int]]] = []
+        bounds = np.append(starts, len(frag_order)).tolist()
+        frag_list = frag_order.tolist()
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            ids = frag_list[a:b]
+            spans = []
+            pos = 0
+            for fid in ids:
+                t = data[fid][1]
+                spans.append((pos, pos + len(t)))
+                pos += len(t) + 1
+            texts.append(" ".join(data[fid][1] for fid in ids))
+            fragment_ids.append(ids)
+            fragment_spans.append(spans)
+
+        return cls(texts, line_boxes, line_conf, fragment_ids, fragment_spans, fragment_boxes)
+
+    # ------------------------------------------------------------------
+    # Coordinates for the GUI ([[x1,y1], [x2,y1], [x2,y2], [x1,y2]])
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _polygon(b) -> List[List[int]]:
+        x1, y1, x2, y2 = (int(v) for v in b)
+        return [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+
+    def line_box(self, line: int) -> List[List[int]]:
+        """Polygon around the whole line."""
+        return self._polygon(self.boxes[line])
+
+    def span_box(self, line: int, start: int, end: int) -> List[List[int]]:
+        """
+        Polygon around the fragments of *line* that overlap characters
+        ``[start, end)`` of its text (the whole line if none do).
+        """
+        ids = [
+            fid for fid, (a, b) in zip(self.fragment_ids[line], self.fragment_spans[line])
+            if a < end and start < b
+        ]
+        if not ids:
+            return self.line_box(line)
+        sel = self.fragment_boxes[ids]
+        return self._polygon((sel[:, 0].min(), sel[:, 1].min(), sel[:, 2].max(), sel[:, 3].max()))
@@ -0,0 +1,273 @@
+"""
+Low-overhead runtime metrics: stage timers, counters and gauges.
+
+Metrics are off by default. While off, ``timer()`` returns a shared no-op
+context manager and ``inc`` / ``set_gauge`` / ``observe`` return after one
+attribute check, so instrumented hot paths cost practically nothing.
+
+Environment:
+    ORR_METRICS=1              enable collection
+    ORR_METRICS_FILE=path      periodically dump to *path* (implies ORR_METRICS=1)
+    ORR_METRICS_FORMAT=jsonl   "jsonl" (one snapshot appended per line) or
+                               "prometheus" (text exposition format, file replaced)
+    ORR_METRICS_INTERVAL=10    dump period in seconds
+
+Usage:
+    from Metrics import METRICS
+
+    with METRICS.timer("readtext"):
+        ...
+    METRICS.inc("ocr_cache_hit")
+    print(METRICS.last("image"))
+"""
+import atexit
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from AtomicFile import atomic_path
+
+FORMATS = ("jsonl", "prometheus")
+
+
+class _NullTimer:
+    """Context manager that does nothing (used while metrics are off)."""
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    """Measures one ``with`` block and records it under *name*."""
+
+    __slots__ = ("_metrics", "_name", "_start")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._metrics.observe(self._name, time.perf_counter() - self._start)
+
+
+class Metrics:
+    """
+    Thread-safe registry of timers, counters and gauges.
+
+    Timers keep count, total, maximum and the last observed duration, which
+    is enough for rates, means and a "latency of the last image" display
+    without storing individual samples.
+
+    Attributes:
+        enabled (bool): Whether anything is recorded.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._timers: Dict[str, list] = {}  # name -> [count, total, max, last]
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._started = time.time()
+        self._dump_thread: Optional[threading.Thread] = None
+        self._dump_stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def timer(self, name: str):
+        """Context manager timing its block as *name* (no-op while disabled)."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record one duration of *name*."""
+        if not self.enabled:
+            return
+        with self._lock:
+            t = self._timers.get(name)
+            if t is None:
+                self._timers[name] = [1, seconds, seconds, seconds]
+            else:
+                t[0] += 1
+                t[1] += seconds
+                if seconds > t[2]:
+                    t[2] = seconds
+                t[3] = seconds
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """Increase counter *name* by *value*."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set gauge *name* to *value*."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def last(self, name: str) -> Optional[float]:
+        """Last recorded duration of timer *name* in seconds (None if never recorded)."""
+        with self._lock:
+            t = self._timers.get(name)
+            return t[3] if t is not None else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copy of everything recorded so far, JSON-serializable."""
+        with self._lock:
+            timers = {
+                name: {"count": c, "total_s": total, "mean_s": total / c, "max_s": mx, "last_s": last}
+                for name, (c, total, mx, last) in self._timers.items()
+            }
+            return {
+                "pid": os.getpid(),
+                "time": time.time(),
+                "uptime_s": time.time() - self._started,
+                "timers": timers,
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+            }
+
+    def reset(self) -> None:
+        """Forget all recorded values."""
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+            self._gauges.clear()
+            self._started = time.time()
+
+    def to_prometheus(self, prefix: str = "orr") -> str:
+        """Render the current values in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        out = []
+        if snap["timers"]:
+            out.append(f"# TYPE {prefix}_stage_seconds summary")
+            for name, t in sorted(snap["timers"].items()):
+                label = _label(name)
+                out.append(f'{prefix}_stage_seconds_sum{{stage="{label}"}} {t["total_s"]:.6f}')
+                out.append(f'{prefix}_stage_seconds_count{{stage="{label}"}} {t["count"]}')
+            out.append(f"# TYPE {prefix}_stage_seconds_max gauge")
+            for name, t in sorted(snap["timers"].items()):
+                out.append(f'{prefix}_stage_seconds_max{{stage="{_label(name)}"}} {t["max_s"]:.6f}')
+        for name, value in sorted(snap["counters"].items()):
+            metric = f"{prefix}_{_metric_name(name)}_total"
+            out.append(f"# TYPE {metric} counter")
+            out.append(f"{metric} {value}")
+        for name, value in sorted(snap["gauges"].items()):
+            metric = f"{prefix}_{_metric_name(name)}"
+            out.append(f"# TYPE {metric} gauge")
+            out.append(f"{metric} {value}")
+        return "\n".join(out) + "\n"
+
+    # ------------------------------------------------------------------
+    # Dumping
+    # ------------------------------------------------------------------
+
+    def dump(self, path: str, fmt: str = "jsonl") -> None:
+        """
+        Write the current values to *path*.
+
+        "jsonl" appends one snapshot per line; "prometheus" replaces the
+        file atomically (for the node_exporter textfile collector).
+        """
+        if fmt == "jsonl":
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.snapshot(), ensure_ascii=False) + "\n")
+        elif fmt == "prometheus":
+            with atomic_path(path) as temp_path:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    f.write(self.to_prometheus())
+        else:
+            raise ValueError(f"Neznámý formát metrik: {fmt}")
+
+    def start_periodic_dump(self, path: str, interval: float = 10.0, fmt: str = "jsonl") -> None:
+        """Dump to *path* every *interval* seconds on a daemon thread (and once more on stop)."""
+        if fmt not in FORMATS:
+            raise ValueError(f"Neznámý formát metrik: {fmt}")
+        self.stop_periodic_dump()
+        self.enabled = True
+        self._dump_stop.clear()
+
+        def loop():
+            while not self._dump_stop.wait(interval):
+                self._safe_dump(path, fmt)
+            self._safe_dump(path, fmt)
+
+        self._dump_thread = threading.Thread(target=loop, name="metrics-dump", daemon=True)
+        self._dump_thread.start()
+        atexit.register(self.stop_periodic_dump)
+
+    def stop_periodic_dump(self) -> None:
+        """Stop the periodic dump thread after a final dump."""
+        if self._dump_thread is None:
+            return
+        self._dump_stop.set()
+        self._dump_thread.join(timeout=5)
+        self._dump_thread = None
+
+    def _safe_dump(self, path: str, fmt: str) -> None:
+        try:
+            self.dump(path, fmt)
+        except OSError as e:
+            print(f"(-) Nelze zapsat metriky do {path}: {e}")
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _label(name: str) -> str:
+    return name.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def configure_from_env(metrics: "Metrics") -> None:
+    """
+    Apply the ORR_METRICS* environment variables to *metrics*.
+
+    In a child process (e.g. a BatchOCR worker) a Prometheus dump goes to
+    ``<stem>.<pid><ext>`` (``orr.prom`` -> ``orr.1234.prom``, still picked
+    up by the textfile collector) so that the workers do not overwrite
+    each other; JSON lines carry the pid and share one file. The dump is
+    readable by other users (node_exporter), see AtomicFile.
+    """
+    path = os.environ.get("ORR_METRICS_FILE")
+    if os.environ.get("ORR_METRICS") == "1" or path:
+        metrics.enabled = True
+    if path:
+        fmt = os.environ.get("ORR_METRICS_FORMAT", "jsonl")
+        if fmt == "prometheus" and multiprocessing.parent_process() is not None:
+            stem, ext = os.path.splitext(path)
+            path = f"{stem}.{os.getpid()}{ext}"
+        try:
+            interval = float(os.environ.get("ORR_METRICS_INTERVAL", "10"))
+            metrics.start_periodic_dump(path, interval, fmt)
+        except ValueError as e:
+            print(f"(-) Metriky se nebudou ukládat: {e}")
+
+
+# Process-wide registry used by the application modules
+METRICS = Metrics()
+configure_from_env(METRICS)
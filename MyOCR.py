@@ -1,9 +1,17 @@
-import easyocr
 import os
 from PIL import Image, ImageOps, ImageEnhance, ImageFilter
 import re
 import numpy as np
-from typing import List, Any, Optional, Tuple
+from collections import OrderedDict
+from typing import List, Any, Optional, Tuple, Dict, Iterable
+
+from LRUCache import ByteLRU
+from OCRCache import OCRCache, file_digest
+from LineTable import LineTable, reading_order
+from SpatialIndex import GridIndex, box_area, intersection_area, polygon_bbox
+from VendorIndex import VendorIndex
+from IcoRegistry import IcoRegistry, find_ico_numbers
+from Metrics import METRICS
 
 
 # ==========================================
@@ -48,6 +56,9 @@ _DATE_PATTERNS = [
     re.compile(r"\b\d{1,2}\s+\d{1,2}\s+\d{4}"),                     # Spaced
 ]
 
+# Any of the patterns above (a cheap first test for lines without a date)
+_DATE_ANY = re.compile("|".join(f"(?:{p.pattern})" for p in _DATE_PATTERNS))
+
 _DATE_KEYWORDS = re.compile(
     r"(?:datum|dne|date|den vystavení|vystaveno|dat\.|day)",
     re.IGNORECASE,
@@ -79,20 +90,30 @@ _VENDOR_KNOWN_BRANDS = [
     'bageterie boulevard', 'paul', 'ugova cerstva stava',
 ]
 
-# Short brands need word-boundary match; long brands can use substring
-_VENDOR_SHORT_BRANDS = sorted(
-    [k for k in _VENDOR_KNOWN_BRANDS if len(k) <= 3], key=len, reverse=True
-)
-_VENDOR_LONG_BRANDS = [k for k in _VENDOR_KNOWN_BRANDS if len(k) > 3]
+# Brand names are searched with an automaton (see VendorIndex): names of up
+# to 3 characters need word boundaries, longer ones match as substrings.
+# A supplier list file ($ORR_VENDOR_LIST or MyOCR(vendor_list=...)) is
+# appended after these brands.
+_VENDOR_INDEX = VendorIndex(_VENDOR_KNOWN_BRANDS)
+_vendor_indexes: Dict[str, VendorIndex] = {}
 
-_VENDOR_SHORT_PATTERN: Optional[re.Pattern] = (
-    re.compile(
-        r'\b(' + '|'.join(re.escape(k) for k in _VENDOR_SHORT_BRANDS) + r')\b',
-        re.IGNORECASE,
-    )
-    if _VENDOR_SHORT_BRANDS
-    else None
-)
+
+def load_vendor_index(path: str) -> VendorIndex:
+    """
+    Return the index of the built-in brands followed by the names in *path*.
+
+    Indexes are kept per path for the lifetime of the process; the compiled
+    form is cached on disk by ``VendorIndex.load``.
+    """
+    index = _vendor_indexes.get(path)
+    if index is None:
+        index = VendorIndex.load(path, base_names=_VENDOR_KNOWN_BRANDS)
+        _vendor_indexes[path] = index
+    return index
+
+
+# Compiled business registers (see IcoRegistry.py) by path
+_ico_registries: Dict[str, IcoRegistry] = {}
 
 _VENDOR_LEGAL_ENTITIES = ['s.r.o', 'a.s', 'spol', 'spol. s r.o', 'k.s', 'gmbh']
 
@@ -102,6 +123,56 @@ _VENDOR_ICO_DIC = re.compile(
     re.IGNORECASE,
 )
 
+# --- Single-pass extraction engine ---
+# The keyword patterns above are written in lowercase, so on a lowercased
+# line they can run case-sensitively, which is several times faster than
+# IGNORECASE. The only characters for which ``str.lower()`` and IGNORECASE
+# disagree on their letters are İ, ı and ſ; lines containing one of them
+# use the original patterns instead.
+_CASE_FOLD_SPECIAL = re.compile("[\u0130\u0131\u017f]")
+
+FIELDS = ("price", "date", "vendor")
+
+
+def _lower_same_length(text: str) -> str:
+    """
+    ``text.lower()`` with one character per character of *text*.
+
+    İ is the only character whose lowercase is two code points; it becomes
+    a plain "i" so that offsets found in the result are valid in *text*.
+    """
+    if "\u0130" in text:
+        text = text.replace("\u0130", "i")
+    return text.lower()
+
+
+def _case_sensitive(pattern: re.Pattern) -> re.Pattern:
+    return re.compile(pattern.pattern, pattern.flags & ~re.IGNORECASE)
+
+
+# (price keywords, price blacklist, date keywords, IČO/DIČ) for lowercased
+# and for original text
+_LINE_KEYWORDS_LOWER = tuple(
+    _case_sensitive(p) for p in (_PRICE_KEYWORDS, _PRICE_BLACKLIST, _DATE_KEYWORDS, _VENDOR_ICO_DIC)
+)
+_LINE_KEYWORDS_ANY_CASE = (_PRICE_KEYWORDS, _PRICE_BLACKLIST, _DATE_KEYWORDS, _VENDOR_ICO_DIC)
+
+
+# --- Preprocessing parameters (part of the OCR cache key) ---
+_PREPROCESS_PARAMS = {
+    "contrast": 1.5,
+    "sharpen": True,
+}
+
+# Adaptive resolution: downsample so that a text line is about
+# ``text_height`` px tall, never below ``min_side`` / above ``max_side``
+# on the long side and never upscale.
+_ADAPTIVE_RESIZE_PARAMS = {
+    "text_height": 32,
+    "min_side": 1280,
+    "max_side": 2560,
+}
+
 
 # ==========================================
 # MyOCR CLASS
@@ -111,65 +182,254 @@ class MyOCR:
     """
     Wrapper class for EasyOCR with image caching and preprocessing.
 
+    Preprocessed images are kept in a byte-bounded LRU shared by
+    ``analyze_image`` and ``get_text_from_region``; entries are
+    invalidated when the file's mtime or size changes.
+
+    Args:
+        use_cache: Use the persistent OCR result cache.
+        adaptive_resize: Downsample large photos to a working resolution
+            derived from the estimated text size before OCR. All returned
+            boxes stay in original-image coordinates.
+        image_cache_bytes: Memory budget for preprocessed images.
+        vendor_list: Supplier list file (one name per line) searched after
+            the built-in brands; defaults to $ORR_VENDOR_LIST.
+        ico_registry: Compiled business register (IcoRegistry.py) used to
+            name the vendor by its IČO; defaults to $ORR_ICO_REGISTRY.
+        device: "auto" (CUDA if available), "cpu" or "cuda".
+        intra_threads: Torch intra-op threads (0 = torch default).
+        inter_threads: Torch inter-op threads (0 = torch default).
+        precision: Model precision on CPU —
+            "default": EasyOCR's own behaviour (detector and recognizer
+                       are dynamically quantized on CPU),
+            "fp32":    no quantization,
+            "int8":    fp32 detector, int8 dynamically quantized recognizer.
+
     Attributes:
         reader (easyocr.Reader): The shared EasyOCR reader instance.
+        cache (OCRCache): Persistent OCR result cache (None when disabled).
+        image_cache (ByteLRU): Preprocessed images (hits/misses via ``stats()``).
+        device (str): Resolved inference device ("cpu" or "cuda").
         current_data (list): The last OCR result data.
+        current_lines (LineTable): Visual lines of ``current_data``.
         current_image_path (str): The path of the last processed image.
+        metrics (Metrics): Stage timers and cache counters (the process-wide
+            ``Metrics.METRICS``; records nothing unless enabled).
     """
-    _reader = None
-
-    def __init__(self):
-        if MyOCR._reader is None:
-            print("Inicializace OCR modelu...")
-            MyOCR._reader = easyocr.Reader(['en', 'cs'], gpu=True)
-
-        self.reader = MyOCR._reader
+    LANGUAGES = ['en', 'cs']
+    DEVICES = ("auto", "cpu", "cuda")
+    PRECISIONS = ("default", "fp32", "int8")
+
+    # One shared reader per (device, precision) — loading a model is expensive
+    _readers: Dict[Tuple[str, str], Any] = {}
+    _cache: Optional[OCRCache] = None
+
+    def __init__(self, use_cache: bool = True, device: str = "auto",
+                 intra_threads: int = 0, inter_threads: int = 0,
+                 precision: str = "default", adaptive_resize: bool = False,
+                 image_cache_bytes: int = 512 * 1024 * 1024,
+                 vendor_list: Optional[str] = None, ico_registry: Optional[str] = None):
+        if device not in MyOCR.DEVICES:
+            raise ValueError(f"Neznámé zařízení: {device}")
+        if precision not in MyOCR.PRECISIONS:
+            raise ValueError(f"Neznámá přesnost modelu: {precision}")
+
+        MyOCR._configure_threads(intra_threads, inter_threads)
+        self.device = MyOCR._resolve_device(device)
+        # Quantization only exists for the CPU path in EasyOCR
+        self.precision = precision if self.device == "cpu" else "default"
+
+        key = (self.device, self.precision)
+        if key not in MyOCR._readers:
+            with METRICS.timer("model_load"):
+                MyOCR._readers[key] = MyOCR._create_reader(self.device, self.precision)
+
+        self.reader = MyOCR._readers[key]
+        self.adaptive_resize = adaptive_resize
+        self.cache = MyOCR._get_shared_cache() if use_cache else None
         self.current_data: Optional[List[Any]] = None
+        self._current_lines: Optional[LineTable] = None
+        self._lines_source: Optional[List[Any]] = None
+        self._current_fields: Optional[Dict[str, Tuple[Optional[List], str]]] = None
+        self._fields_source: Optional[LineTable] = None
         self.current_image_path: Optional[str] = None
-        self._cached_image_np: Optional[np.ndarray] = None
-        self._cached_image_path: Optional[str] = None
+        self.image_cache = ByteLRU(image_cache_bytes)
+        # path -> (file stamp, detections, GridIndex) for recently analyzed images
+        self._detection_indexes: "OrderedDict[str, Tuple[Any, List[Any], GridIndex]]" = OrderedDict()
+        self.region_stats = {"index": 0, "inference": 0}
+        self.metrics = METRICS
+        self.vendors = MyOCR._load_vendors(vendor_list or os.environ.get("ORR_VENDOR_LIST"))
+        self.registry = MyOCR._load_registry(ico_registry or os.environ.get("ORR_ICO_REGISTRY"))
+
+    # ------------------------------------------------------------------
+    # Model setup helpers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _configure_threads(intra_threads: int, inter_threads: int) -> None:
+        """Set torch CPU thread pools (before the first model is created)."""
+        if intra_threads <= 0 and inter_threads <= 0:
+            return
+        import torch
+        if intra_threads > 0:
+            torch.set_num_threads(intra_threads)
+        if inter_threads > 0:
+            try:
+                torch.set_num_interop_threads(inter_threads)
+            except RuntimeError:
+                # Can only be set once, before any inter-op parallel work
+                print("(-) Počet inter-op vláken už nelze změnit.")
+
+    @staticmethod
+    def _resolve_device(device: str) -> str:
+        if device != "auto":
+            return device
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+
+    @staticmethod
+    def _create_reader(device: str, precision: str):
+        """Build an easyocr.Reader for *device* with the requested precision."""
+        print(f"Inicializace OCR modelu ({device}, {precision})...")
+        import easyocr  # heavy (torch) — imported on first use
+
+        if precision == "default":
+            return easyocr.Reader(MyOCR.LANGUAGES, gpu=(device == "cuda"))
+
+        reader = easyocr.Reader(MyOCR.LANGUAGES, gpu=(device == "cuda"), quantize=False)
+        if precision == "int8":
+            import torch
+            reader.recognizer = torch.quantization.quantize_dynamic(
+                reader.recognizer, {torch.nn.LSTM, torch.nn.Linear}, dtype=torch.qint8
+            )
+        return reader
 
     # ------------------------------------------------------------------
     # Image preprocessing helpers
     # ------------------------------------------------------------------
 
     @staticmethod
-    def _preprocess_pil(img: Image.Image) -> np.ndarray:
+    def _preprocess_pil(img: Image.Image, adaptive_resize: bool = False) -> Tuple[np.ndarray, float]:
         """
         Convert a PIL image to a preprocessed grayscale numpy array.
 
-        Steps: EXIF fix -> grayscale -> contrast boost -> light sharpen.
+        Steps: EXIF fix -> grayscale -> (adaptive downsample) -> contrast
+        boost -> light sharpen.
+
+        Returns:
+            (array, scale) where *scale* maps original-image coordinates
+            to array coordinates (1.0 when not resized).
         """
         img = ImageOps.exif_transpose(img)
         img = img.convert('L')
 
+        scale = _adaptive_scale(img) if adaptive_resize else 1.0
+        if scale < 1.0:
+            new_size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            img = img.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
         # Boost contrast (helps with faded receipts)
         enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(1.5)
+        img = enhancer.enhance(_PREPROCESS_PARAMS["contrast"])
 
         # Mild sharpen to help EasyOCR with blurry photos
-        img = img.filter(ImageFilter.SHARPEN)
+        if _PREPROCESS_PARAMS["sharpen"]:
+            img = img.filter(ImageFilter.SHARPEN)
 
-        return np.array(img)
+        return np.array(img), scale
 
-    def _get_image_np(self, path: str) -> Optional[np.ndarray]:
-        """Return preprocessed numpy array for *path*, using cache when possible."""
-        if self._cached_image_path == path and self._cached_image_np is not None:
-            return self._cached_image_np
+    def _get_image_np(self, path: str) -> Optional[Tuple[np.ndarray, float]]:
+        """
+        Return (preprocessed array, scale) for *path*, using cache when possible.
 
-        if not os.path.exists(path):
+        *scale* maps original-image coordinates to array coordinates.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
             return None
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        cached = self.image_cache.get(path, stamp)
+        if cached is not None:
+            METRICS.inc("image_cache_hit")
+            return cached
+        METRICS.inc("image_cache_miss")
 
         try:
-            img = Image.open(path)
-            arr = self._preprocess_pil(img)
-            self._cached_image_np = arr
-            self._cached_image_path = path
-            return arr
+            with METRICS.timer("preprocess"):
+                img = Image.open(path)
+                arr, scale = self._preprocess_pil(img, self.adaptive_resize)
+            self.image_cache.put(path, (arr, scale), arr.nbytes, stamp)
+            return arr, scale
         except Exception as e:
             print(f"(-) Chyba při přípravě obrázku: {e}")
             return None
 
+    # ------------------------------------------------------------------
+    # OCR result cache helpers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _get_shared_cache() -> Optional[OCRCache]:
+        """Return the process-wide OCR cache (opened on first use)."""
+        if MyOCR._cache is None:
+            try:
+                MyOCR._cache = OCRCache()
+            except Exception as e:
+                print(f"(-) OCR cache není k dispozici: {e}")
+        return MyOCR._cache
+
+    @staticmethod
+    def _load_vendors(path: Optional[str]) -> VendorIndex:
+        """Return the vendor index for *path* (built-in brands on any error)."""
+        if not path:
+            return _VENDOR_INDEX
+        try:
+            return load_vendor_index(path)
+        except (OSError, ValueError) as e:
+            print(f"(!) CHYBA: Seznam dodavatelů '{path}' nelze načíst: {e}")
+            return _VENDOR_INDEX
+
+    @staticmethod
+    def _load_registry(path: Optional[str]) -> Optional[IcoRegistry]:
+        """Return the IČO registry for *path* (None when unset or unreadable)."""
+        if not path:
+            return None
+        registry = _ico_registries.get(path)
+        if registry is None:
+            try:
+                registry = _ico_registries[path] = IcoRegistry(path)
+            except (OSError, ValueError) as e:
+                print(f"(!) CHYBA: Registr IČO '{path}' nelze načíst: {e}")
+        return registry
+
+    def _cache_params(self) -> Dict[str, Any]:
+        """Everything besides the image itself that changes the OCR output."""
+        return {
+            "languages": MyOCR.LANGUAGES,
+            "preprocess": _PREPROCESS_PARAMS,
+            "adaptive_resize": _ADAPTIVE_RESIZE_PARAMS if self.adaptive_resize else None,
+            "device": self.device,
+            "precision": self.precision,
+        }
+
+    def _cache_key(self, path: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        try:
+            return OCRCache.make_key(file_digest(path), self._cache_params())
+        except OSError:
+            return None
+
+    def _update_cache_gauges(self) -> None:
+        """Publish the hit rates of the OCR result and image caches."""
+        METRICS.set_gauge("image_cache_hit_rate", self.image_cache.stats()["hit_rate"])
+        METRICS.set_gauge("image_cache_bytes", self.image_cache.total_bytes)
+        if self.cache is not None:
+            lookups = self.cache.hits + self.cache.misses
+            METRICS.set_gauge("ocr_cache_hit_rate", self.cache.hits / lookups if lookups else 0.0)
+
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
@@ -178,144 +438,522 @@ class MyOCR:
         """
         Analyze the image at *path* and perform full-page OCR.
 
-        The preprocessed image is cached so that subsequent
-        ``get_text_from_region`` calls skip disk I/O.
+        Results are looked up in the persistent OCR cache first (keyed by
+        the file contents), so an already seen image returns instantly.
+        Otherwise the preprocessed image is cached so that subsequent
+        ``get_text_from_region`` calls skip disk I/O. Returned boxes are
+        always in original-image coordinates, even with adaptive resizing.
 
         Args:
             path: Path to the image file.
         Returns:
             OCR result list or None on failure.
         """
+        with METRICS.timer("image"):
+            result = self._analyze_image(path)
+        if METRICS.enabled:
+            self._update_cache_gauges()
+        return result
+
+    def _analyze_image(self, path: str) -> Optional[List[Any]]:
         if not os.path.exists(path):
             print(f"(-) Soubor neexistuje: {path}")
             return None
 
         self.current_image_path = path
-        img_np = self._get_image_np(path)
-        if img_np is None:
+
+        cache_key = self._cache_key(path)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)  # type: ignore
+            METRICS.inc("ocr_cache_miss" if cached is None else "ocr_cache_hit")
+            if cached is not None:
+                print(f"(+) OCR z mezipaměti: {path}")
+                self.current_data = cached
+                self._remember_detections(path, self.current_data)
+                return self.current_data
+
+        prepared = self._get_image_np(path)
+        if prepared is None:
             return None
+        img_np, scale = prepared
 
         print(f"(+) Zpracovávám OCR pro soubor: {path}")
 
         try:
-            self.current_data = self.reader.readtext(img_np)
+            with METRICS.timer("readtext"):
+                detections = self.reader.readtext(img_np)
+            self.current_data = _scale_results(detections, 1.0 / scale)
         except Exception as e:
             print(f"(-) CHYBA: {e}")
             self.current_data = None
 
+        if cache_key is not None and self.current_data is not None:
+            try:
+                self.cache.put(cache_key, self.current_data)  # type: ignore
+            except Exception as e:
+                print(f"(-) Nelze uložit do OCR cache: {e}")
+
+        if self.current_data is not None:
+            self._remember_detections(path, self.current_data)
         return self.current_data
 
-    def get_text_from_region(self, path: str, coords: List[List[int]]) -> str:
+    @staticmethod
+    def _region_box(coords: List[List[int]], scale: float, w: int, h: int) -> Optional[List[int]]:
+        """
+        Convert a polygon in original-image pixels to an EasyOCR horizontal box
+        ``[x_min, x_max, y_min, y_max]`` in working-array pixels, clipped to the
+        image. Returns None for accidental (tiny) selections.
+        """
+        # *coords* are in original-image pixels; the array may be downsampled
+        xs = [int(pt[0] * scale) for pt in coords]
+        ys = [int(pt[1] * scale) for pt in coords]
+
+        min_x = max(0, min(xs))
+        min_y = max(0, min(ys))
+        max_x = min(w, max(xs))
+        max_y = min(h, max(ys))
+
+        # Skip accidental single-pixel selections
+        if (max_x - min_x) < 5 or (max_y - min_y) < 5:
+            return None
+        return [min_x, max_x, min_y, max_y]
+
+    def get_text_from_regions(self, path: str, coords_list: List[List[List[int]]],
+                              detect: bool = False) -> List[str]:
+        """
+        Recognize the text of several regions of one image in a single call.
+
+        By default the regions go straight to the recognizer (no CRAFT text
+        detection): a user-drawn box around one field already *is* the text
+        box, so detection would only cost time. All distinct boxes go to one
+        ``reader.recognize`` call; it batches them on GPU, on CPU EasyOCR
+        still recognizes them one by one. Regions with the same box (e.g.
+        price and date on one line) are recognized once and share the text.
+
+        Args:
+            path: Path to the image file.
+            coords_list: Bounding polygons [[x1,y1], [x2,y1], [x2,y2], [x1,y2]].
+            detect: Run full detection + recognition on each crop instead
+                    (for regions spanning several lines).
+        Returns:
+            One recognized string per region (empty on failure).
+        """
+        prepared = self._get_image_np(path)
+        if prepared is None:
+            return ["(-) Soubor neexistuje."] * len(coords_list)
+        img_np, scale = prepared
+        h, w = img_np.shape[:2]
+
+        boxes = [self._region_box(c, scale, w, h) if c else None for c in coords_list]
+        # Distinct boxes only: results are matched back by box
+        valid = [list(b) for b in dict.fromkeys(tuple(b) for b in boxes if b is not None)]
+        if not valid:
+            return [""] * len(coords_list)
+
+        try:
+            with METRICS.timer("region_ocr"):
+                if detect:
+                    texts = {}
+                    for x1, x2, y1, y2 in valid:
+                        results = self.reader.readtext(img_np[y1:y2, x1:x2])
+                        texts[(x1, x2, y1, y2)] = _make_string(results)
+                else:
+                    results = self.reader.recognize(
+                        img_np, horizontal_list=valid, free_list=[],
+                        batch_size=len(valid), detail=1, paragraph=False,
+                    )
+                    # On GPU EasyOCR may reorder the boxes — match results by box
+                    texts = {}
+                    for box, text, *_ in results:
+                        key = (int(box[0][0]), int(box[2][0]), int(box[0][1]), int(box[2][1]))
+                        texts[key] = (texts[key] + " " + text) if key in texts else text
+
+            return [texts.get(tuple(b), "") if b is not None else "" for b in boxes]
+
+        except Exception as e:
+            print(f"Chyba OCR na výřezu: {e}")
+            return [""] * len(coords_list)
+
+    def get_text_from_region(self, path: str, coords: List[List[int]], detect: bool = False) -> str:
         """
         Run OCR on a specific region of the image defined by *coords*.
 
-        Uses the cached preprocessed image when available, avoiding
-        redundant disk reads and conversions.
+        Uses the cached preprocessed image when available and, unless
+        *detect* is set, skips text detection (see ``get_text_from_regions``).
 
         Args:
             path: Path to the image file.
             coords: Bounding polygon [[x1,y1], [x2,y1], [x2,y2], [x1,y2]].
+            detect: Run detection + recognition on the crop.
         Returns:
             Recognized text as a single string (empty on failure).
         """
-        img_np = self._get_image_np(path)
-        if img_np is None:
-            return "(-) Soubor neexistuje."
+        return self.get_text_from_regions(path, [coords], detect=detect)[0]
+
+    # ------------------------------------------------------------------
+    # Region queries answered from full-page detections
+    # ------------------------------------------------------------------
 
+    # How many analyzed images keep their detection index
+    _MAX_DETECTION_INDEXES = 32
+    # A detection belongs to the region if this share of it lies inside
+    _REGION_INSIDE_RATIO = 0.5
+    # Detections cut by the region more than this (but less than the ratio
+    # above) make the stored result unusable — the user split a word
+    _REGION_PARTIAL_RATIO = 0.15
+
+    def _remember_detections(self, path: str, detections: List[Any]) -> None:
+        """Build and keep a spatial index over the detections of *path*."""
         try:
-            h, w = img_np.shape[:2]
+            st = os.stat(path)
+        except OSError:
+            return
+        entries = []
+        for i, det in enumerate(detections):
+            try:
+                entries.append((i, polygon_bbox(det[0])))
+            except (TypeError, ValueError, IndexError):
+                continue
+
+        self._detection_indexes[path] = (
+            (st.st_mtime_ns, st.st_size), detections, GridIndex.from_boxes(entries)
+        )
+        self._detection_indexes.move_to_end(path)
+        while len(self._detection_indexes) > MyOCR._MAX_DETECTION_INDEXES:
+            self._detection_indexes.popitem(last=False)
 
-            xs = [pt[0] for pt in coords]
-            ys = [pt[1] for pt in coords]
+    def _text_from_detections(self, path: str, coords: List[List[int]]) -> Optional[str]:
+        """
+        Answer a region query from the stored detections of *path*.
 
-            min_x = max(0, min(xs))
-            min_y = max(0, min(ys))
-            max_x = min(w, max(xs))
-            max_y = min(h, max(ys))
+        Returns None when there is no usable index or the detections do not
+        cover the region well enough (nothing inside, a detection only
+        partially inside, or only detections without text).
+        """
+        entry = self._detection_indexes.get(path)
+        if entry is None or not coords:
+            return None
+        stamp, detections, index = entry
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if stamp != (st.st_mtime_ns, st.st_size):
+            del self._detection_indexes[path]
+            return None
 
-            # Skip accidental single-pixel selections
-            if (max_x - min_x) < 5 or (max_y - min_y) < 5:
-                return ""
+        query = polygon_bbox(coords)
+        selected = []
+        for i in index.query(query):
+            det_box = index.bbox(i)
+            area = box_area(det_box)  # type: ignore
+            if area <= 0:
+                continue
+            ratio = intersection_area(query, det_box) / area  # type: ignore
+            if ratio >= MyOCR._REGION_INSIDE_RATIO:
+                selected.append(i)
+            elif ratio > MyOCR._REGION_PARTIAL_RATIO:
+                return None
+
+        if not selected:
+            return None
+        ordered = reading_order([index.bbox(i) for i in selected])
+        text = " ".join(
+            detections[selected[k]][1] for k in ordered
+            if isinstance(detections[selected[k]][1], str) and detections[selected[k]][1]
+        )
+        # Detections without text answer nothing — let the recognizer try
+        return text or None
 
-            cropped = img_np[min_y:max_y, min_x:max_x]
-            results = self.reader.readtext(cropped)
-            return _make_string(results)
+    def resolve_region_texts(self, path: str, coords_list: List[Optional[List[List[int]]]]) -> List[str]:
+        """
+        Return the text of each region, preferring the existing full-page OCR.
 
-        except Exception as e:
-            print(f"Chyba OCR na výřezu: {e}")
-            return ""
+        Regions fully covered by detections from ``analyze_image`` are
+        answered from the spatial index without any inference; only the
+        rest go to the recognizer (in one batch).
+        """
+        texts: List[Optional[str]] = [
+            self._text_from_detections(path, c) if c else "" for c in coords_list
+        ]
+        todo = [i for i, t in enumerate(texts) if t is None]
+        self.region_stats["index"] += len(coords_list) - len(todo)
+        self.region_stats["inference"] += len(todo)
+        METRICS.inc("region_from_index", len(coords_list) - len(todo))
+        METRICS.inc("region_inference", len(todo))
+
+        if todo:
+            recognized = self.get_text_from_regions(path, [coords_list[i] for i in todo])  # type: ignore
+            for i, text in zip(todo, recognized):
+                texts[i] = text
+        return [t or "" for t in texts]
+
+    @property
+    def current_lines(self) -> LineTable:
+        """Line table of ``current_data`` (built once, shared by all extractors)."""
+        if self._current_lines is None or self._lines_source is not self.current_data:
+            with METRICS.timer("lines"):
+                self._current_lines = LineTable.from_ocr(self.current_data)
+            self._lines_source = self.current_data
+        return self._current_lines
+
+    @property
+    def current_fields(self) -> Dict[str, Tuple[Optional[List], str]]:
+        """All extracted fields of ``current_data`` (one engine pass, cached)."""
+        lines = self.current_lines
+        if self._current_fields is None or self._fields_source is not lines:
+            with METRICS.timer("extract"):
+                self._current_fields = extract_fields(lines, self.vendors, self.registry)
+            self._fields_source = lines
+        return self._current_fields
 
     def get_price_coords(self) -> Tuple[Optional[List], str]:
         """Returns (coords, text) tuple for the detected price."""
-        return ReturnPrice(self.current_data)
+        return self.current_fields["price"]
 
     def get_date(self) -> Tuple[Optional[List], str]:
         """Returns (coords, text) tuple for the detected date."""
-        return ReturnDate(self.current_data)
+        return self.current_fields["date"]
 
     def get_vendor_coords(self) -> Tuple[Optional[List], str]:
         """Returns (coords, text) tuple for the detected vendor."""
-        return ReturnVendor(self.current_data)
+        return self.current_fields["vendor"]
 
 
 # ==========================================
 # STANDALONE HELPER FUNCTIONS (Logic Only)
 # ==========================================
 
-def ReturnPrice(data: Optional[List]) -> Tuple[Optional[List], str]:
-    """
-    Find the total price in OCR results.
+def _as_lines(data) -> LineTable:
+    """Accept raw ``readtext`` output or an already built LineTable."""
+    if isinstance(data, LineTable):
+        return data
+    return LineTable.from_ocr(data)
 
-    Strategy:
-      1. Search BOTTOM-UP (totals are near the end of receipts).
-      2. Prefer lines where a keyword + price appear together.
-      3. Fall back to keyword-only line and grab price from the next 1-2 lines.
-      4. Skip lines containing blacklisted words (DPH, sleva, …).
+
+def extract_fields(data, vendors: Optional[VendorIndex] = None,
+                   registry: Optional[IcoRegistry] = None,
+                   fuzzy_vendors: bool = True,
+                   fields: Iterable[str] = FIELDS) -> Dict[str, Tuple[Optional[List], str]]:
     """
-    if not data:
-        return None, ""
+    Extract price, date and vendor in ONE walk over the OCR lines.
+
+    Every line is lowercased once and tested against the keyword families
+    of all three fields; candidate hits for every field and priority are
+    recorded on the way and the priorities are resolved at the end. Each
+    family stops doing work as soon as its best possible candidate is known
+    (dates once a keyword-line date is found, vendor priorities once a
+    higher one is found) and the walk ends when price and vendor are
+    settled; a date keyword line further down is then found with the
+    keyword pattern alone. The price total, which is the LAST matching
+    line, is looked for first in a short bottom-up walk, so that a long
+    receipt is not read to the end just for it. The result is identical to
+    running the individual strategies described in ``ReturnPrice``,
+    ``ReturnDate`` and ``ReturnVendor``.
+
+    Args:
+        data: ``readtext`` output or a LineTable built from it.
+        vendors: Brand/supplier index (default: the built-in brands).
+        registry: Business register; when given, the first IČO / CZ-DIČ
+            on the receipt that it knows wins over all other vendor
+            priorities and its registered company name is returned, with
+            the box of the line above the number (None on the first line).
+        fuzzy_vendors: Also accept brand names garbled by OCR (priority
+            1b, after exact brand matches anywhere on the receipt).
+        fields: Only look for these fields (the others come back empty);
+            the walk ends as soon as the requested ones are settled.
+    Returns:
+        {"price": (coords, text), "date": (coords, text), "vendor": (coords, text)}
+        with (None, "") for fields that were not found.
+    """
+    want_price, want_date, want_vendor = (f in fields for f in FIELDS)
+    result: Dict[str, Tuple[Optional[List], str]] = {
+        "price": (None, ""), "date": (None, ""), "vendor": (None, ""),
+    }
+    lines = _as_lines(data)
+    if not len(lines):
+        return result
+    texts = lines.texts
+    entity_pattern = _get_legal_entity_pattern()
+    if vendors is None:
+        vendors = _VENDOR_INDEX
+
+    # (keyword patterns, lowercased text, text to probe the patterns on) per line
+    probed: List[Optional[Tuple[Tuple[re.Pattern, ...], str, str]]] = [None] * len(texts)
+
+    def probe_line(i: int) -> Tuple[Tuple[re.Pattern, ...], str, str]:
+        entry = probed[i]
+        if entry is None:
+            text = texts[i]
+            if _CASE_FOLD_SPECIAL.search(text):
+                entry = (_LINE_KEYWORDS_ANY_CASE, _lower_same_length(text), text)
+            else:
+                lower = text.lower()
+                entry = (_LINE_KEYWORDS_LOWER, lower, lower)
+            probed[i] = entry
+        return entry
+
+    # --- PRICE, strategy 1: the last keyword line with the price on it ---
+    price_done = not want_price
+    if want_price:
+        for i in range(len(texts) - 1, -1, -1):
+            (price_kw, blacklist, _, _), _, probe = probe_line(i)
+            if price_kw.search(probe) and not blacklist.search(probe):
+                m = _PRICE_FULL.search(texts[i])
+                if m and _clean_price_string(m.group(1)):
+                    result["price"] = (lines.span_box(i, m.start(1), m.end(1)), m.group(1))
+                    price_done = True
+                    break
+
+    date_kw = None           # (line, match) on a line with a date keyword
+    vendor: List[Optional[Tuple[Optional[List], str]]] = [None] * 5  # priorities 1, 1b, 2, 3, 4
+    registered = None        # (coords, company name) from the IČO registry
+
+    walked = len(texts)
+    for i, text in enumerate(texts):
+        # Price and vendor are settled; a date keyword line is looked for
+        # below, without probing the lines for the other families
+        if price_done and (not want_vendor or (vendor[0] is not None
+                                               and (registry is None or registered is not None))):
+            walked = i
+            break
+
+        (price_kw, blacklist, date_kw_pat, ico_pat), txt_lower, probe = probe_line(i)
+
+        # --- PRICE, strategy 2: first keyword line with a price on one of the next two lines ---
+        if not price_done and price_kw.search(probe) and not blacklist.search(probe):
+            for j in (i + 1, i + 2):
+                if j < len(texts):
+                    pm = _PRICE_NUMBER.search(texts[j])
+                    if pm and _clean_price_string(pm.group(0)):
+                        result["price"] = (lines.span_box(j, pm.start(), pm.end()), pm.group(0))
+                        price_done = True
+                        break
+
+        # --- DATE, strategy 1: first date on a line with a date keyword ---
+        if want_date and date_kw is None and date_kw_pat.search(probe):
+            m = _first_date_match(text)
+            if m:
+                date_kw = (i, m)
 
-    # Pass 1: bottom-up scan for keyword+price on the same line
-    for i in range(len(data) - 1, -1, -1):
-        item = data[i]
-        text = item[1]
-        if not isinstance(text, str):
+        # --- VENDOR ---
+        if not want_vendor:
             continue
-
-        if _PRICE_BLACKLIST.search(text):
+        if registry is not None and registered is None:
+            for _, _, ico in find_ico_numbers(text):
+                name = registry.lookup(ico)
+                if name:
+                    # The box of the name, not of the digits: as for
+                    # priority 4, the supplier is printed above its IČO
+                    registered = (lines.line_box(i - 1) if i > 0 else None, name)
+                    break
+
+        if vendor[0] is not None:
             continue
 
-        match = _PRICE_FULL.search(text)
-        if match:
-            raw_price = match.group(1)
-            if _clean_price_string(raw_price):
-                return _clean_coords_helper(item[0]), raw_price
-
-    # Pass 2: keyword on one line, price on the next 1-2 lines
-    for i, item in enumerate(data):
-        text = item[1]
-        if not isinstance(text, str):
+        # Priority 1: brand names (long: substring, list order; short: word boundary)
+        brand = vendors.find(txt_lower)
+        if brand is not None:
+            start, end, name = brand
+            vendor[0] = (lines.span_box(i, start, end), name)
+            continue
+        if vendor[1] is not None:
             continue
 
-        if _PRICE_BLACKLIST.search(text):
+        # Priority 1b: brand names garbled by OCR ("T3SC0", "Kaufl4nd")
+        if fuzzy_vendors:
+            brand = vendors.find_fuzzy(txt_lower)
+            if brand is not None:
+                start, end, name, _ = brand
+                vendor[1] = (lines.span_box(i, start, end), name)
+                continue
+        if vendor[2] is not None:
             continue
 
-        if _PRICE_KEYWORDS.search(text):
-            for offset in (1, 2):
-                if i + offset < len(data):
-                    next_text = data[i + offset][1]
-                    if not isinstance(next_text, str):
-                        continue
-                    price_match = _PRICE_NUMBER.search(next_text)
-                    if price_match:
-                        raw_next = price_match.group(0)
-                        if _clean_price_string(raw_next):
-                            return _clean_coords_helper(data[i + offset][0]), raw_next
+        # Priority 2: legal entity suffix
+        m = entity_pattern.search(text)
+        if m:
+            vendor_candidate = text[:m.start()].strip()
+            if len(vendor_candidate) > 1:
+                vendor[2] = (lines.span_box(i, 0, m.start()), vendor_candidate)
+                continue
+            elif i > 0:
+                vendor[2] = (lines.line_box(i - 1), texts[i - 1])
+                continue
+
+        # Priority 3: "dodavatel" / "prodávající"
+        if vendor[3] is None and ('dodavatel' in txt_lower or 'prodávající' in txt_lower):
+            if len(text) > 12:
+                vendor[3] = (lines.line_box(i), text)
+            elif i + 1 < len(texts):
+                vendor[3] = (lines.line_box(i + 1), texts[i + 1])
+
+        # Priority 4: IČO/DIČ — the preceding line
+        if vendor[3] is None and vendor[4] is None and i > 0 and ico_pat.search(probe):
+            vendor[4] = (lines.line_box(i - 1), texts[i - 1])
+
+    # --- DATE: strategy 1 below the walk, else strategy 2: the first date anywhere ---
+    if want_date:
+        date_hit = date_kw
+        if date_hit is None:
+            for i in range(walked, len(texts)):
+                m = _first_date_match(texts[i]) if _DATE_KEYWORDS.search(texts[i]) else None
+                if m:
+                    date_hit = (i, m)
+                    break
+        if date_hit is None:
+            for i, text in enumerate(texts):
+                m = _first_date_match(text)
+                if m:
+                    date_hit = (i, m)
+                    break
+        if date_hit is not None:
+            i, m = date_hit
+            result["date"] = (lines.span_box(i, m.start(), m.end()), m.group(0))
+
+    # --- Resolve the vendor priorities ---
+    for candidate in (registered, *vendor):
+        if candidate is not None:
+            result["vendor"] = candidate
+            break
+
+    return result
+
+
+def _first_date_match(text: str) -> Optional[re.Match]:
+    """Match of the first pattern in ``_DATE_PATTERNS`` order that occurs in *text*."""
+    # Most lines hold no date at all: one scan rules out all the patterns
+    if not _DATE_ANY.search(text):
+        return None
+    for pat in _DATE_PATTERNS:
+        match = pat.search(text)
+        if match:
+            return match
+    return None
+
+
+def ReturnPrice(data) -> Tuple[Optional[List], str]:
+    """
+    Find the total price in OCR results.
 
-    return None, ""
+    Works on visual lines (see LineTable), so "Celkem" and the amount
+    printed on the same line are matched together even when EasyOCR
+    returns them as separate fragments.
 
+    Strategy:
+      1. Search BOTTOM-UP (totals are near the end of receipts).
+      2. Prefer lines where a keyword + price appear together.
+      3. Fall back to keyword-only line and grab price from the next 1-2 lines.
+      4. Skip lines containing blacklisted words (DPH, sleva, …).
 
-def ReturnDate(data: Optional[List]) -> Tuple[Optional[List], str]:
+    Args:
+        data: ``readtext`` output or a LineTable built from it.
+    """
+    with METRICS.timer("extract_price"):
+        return extract_fields(data, fields=("price",))["price"]
+
+
+def ReturnDate(data) -> Tuple[Optional[List], str]:
     """
     Find the invoice/receipt date in OCR results.
 
@@ -324,106 +962,31 @@ def ReturnDate(data: Optional[List]) -> Tuple[Optional[List], str]:
          related keyword ("datum", "dne", "date", …).  This avoids picking
          up unrelated dates (print timestamps, expiry dates, etc.).
       2. Second pass: fall back to the first date-like string in the data.
-    """
-    if not data:
-        return None, ""
-
-    # Pass 1: date on a line with a keyword (high confidence)
-    for res in data:
-        txt = res[1]
-        if not isinstance(txt, str):
-            continue
-
-        if _DATE_KEYWORDS.search(txt):
-            for pat in _DATE_PATTERNS:
-                match = pat.search(txt)
-                if match:
-                    return _clean_coords_helper(res[0]), match.group(0)
-
-    # Pass 2: first date anywhere (fallback)
-    for res in data:
-        txt = res[1]
-        if not isinstance(txt, str):
-            continue
-
-        for pat in _DATE_PATTERNS:
-            match = pat.search(txt)
-            if match:
-                return _clean_coords_helper(res[0]), match.group(0)
 
-    return None, ""
+    Args:
+        data: ``readtext`` output or a LineTable built from it.
+    """
+    with METRICS.timer("extract_date"):
+        return extract_fields(data, fields=("date",))["date"]
 
 
-def ReturnVendor(data: Optional[List]) -> Tuple[Optional[List], str]:
+def ReturnVendor(data) -> Tuple[Optional[List], str]:
     """
     Find the vendor/seller name in OCR results.
 
-    Priority order:
-      1. Known chain brand names (exact match).
+    Priority order (with a configured IČO registry, a registered IČO on
+    the receipt comes first, see ``extract_fields``):
+      1. Known chain brand names (exact match), then brand names garbled
+         by OCR ("T3SC0") within a small OCR-confusion edit distance.
       2. Legal entity suffixes (s.r.o., a.s., spol., gmbh).
       3. Keywords "dodavatel" / "prodávající".
       4. IČO/DIČ line — take the line before it.
-    """
-    if not data:
-        return None, ""
-
-    # --- Priority 1: Known brand names ---
-    for res in data:
-        txt = res[1]
-        if not isinstance(txt, str):
-            continue
-        txt_lower = txt.lower()
-
-        # Long brands — substring match is safe
-        for brand in _VENDOR_LONG_BRANDS:
-            if brand in txt_lower:
-                return _clean_coords_helper(res[0]), brand
-
-        # Short brands — word-boundary match to avoid false positives
-        if _VENDOR_SHORT_PATTERN:
-            m = _VENDOR_SHORT_PATTERN.search(txt_lower)
-            if m:
-                return _clean_coords_helper(res[0]), m.group(1).lower()
-
-    # --- Priority 2: Legal entity suffixes ---
-    entity_pattern = _get_legal_entity_pattern()
-    for i, item in enumerate(data):
-        txt = item[1]
-        if not isinstance(txt, str):
-            continue
 
-        m = entity_pattern.search(txt)
-        if m:
-            vendor_candidate = txt[:m.start()].strip()
-            # A: vendor name is before the suffix on the same line
-            if len(vendor_candidate) > 1:
-                return _clean_coords_helper(item[0]), vendor_candidate
-            # B: suffix at the start — vendor is on the previous line
-            elif i > 0:
-                prev = data[i - 1]
-                return _clean_coords_helper(prev[0]), prev[1]
-
-    # --- Priority 3: "dodavatel" / "prodávající" keywords ---
-    for i, item in enumerate(data):
-        txt_lower = item[1].lower() if isinstance(item[1], str) else ""
-        if 'dodavatel' in txt_lower or 'prodávající' in txt_lower:
-            if len(item[1]) > 12:
-                return _clean_coords_helper(item[0]), item[1]
-            elif i + 1 < len(data):
-                nxt = data[i + 1]
-                return _clean_coords_helper(nxt[0]), nxt[1]
-
-    # --- Priority 4: IČO/DIČ — take the preceding line ---
-    for i, item in enumerate(data):
-        txt = item[1]
-        if not isinstance(txt, str):
-            continue
-        if _VENDOR_ICO_DIC.search(txt):
-            if i > 0:
-                prev = data[i - 1]
-                return _clean_coords_helper(prev[0]), prev[1]
-
-    return None, ""
+    Args:
+        data: ``readtext`` output or a LineTable built from it.
+    """
+    with METRICS.timer("extract_vendor"):
+        return extract_fields(data, fields=("vendor",))["vendor"]
 
 
 # ==========================================
@@ -437,14 +1000,80 @@ def _make_string(data: Optional[List]) -> str:
     return " ".join(res[1] for res in data if isinstance(res[1], str))
 
 
-def _clean_coords_helper(raw_box) -> Optional[List[List[int]]]:
-    """Convert EasyOCR coordinate tuples to a clean list of [x, y] ints."""
-    if not raw_box:
+def _scale_results(results: List[Any], factor: float) -> List[Any]:
+    """Multiply all box coordinates in EasyOCR *results* by *factor*."""
+    if factor == 1.0:
+        return results
+    return [
+        ([[int(round(pt[0] * factor)), int(round(pt[1] * factor))] for pt in res[0]],) + tuple(res[1:])
+        for res in results
+    ]
+
+
+def _otsu_threshold(gray: np.ndarray) -> int:
+    """Return Otsu's global threshold for an 8-bit grayscale array."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    w0 = np.cumsum(hist)
+    w1 = w0[-1] - w0
+    mu = np.cumsum(hist * levels)
+    m0 = mu / np.maximum(w0, 1.0)
+    m1 = (mu[-1] - mu) / np.maximum(w1, 1.0)
+    return int(np.argmax(w0 * w1 * (m0 - m1) ** 2))
+
+
+def _estimate_text_height(gray: np.ndarray) -> Optional[float]:
+    """
+    Estimate the typical text line height (px) of a grayscale page.
+
+    Dark pixels (Otsu threshold) are projected onto the vertical axis;
+    consecutive rows containing ink form text bands. Returns the median
+    band height, or None when there are too few bands to judge.
+    """
+    if gray.size == 0:
         return None
-    try:
-        return [[int(pt[0]), int(pt[1])] for pt in raw_box]
-    except Exception:
+
+    dark = gray <= _otsu_threshold(gray)
+    row_ink = dark.mean(axis=1)
+    # Rows with a bit of ink, but not solid borders/shadows
+    text_rows = ((row_ink > 0.01) & (row_ink < 0.6)).astype(np.int8)
+
+    edges = np.diff(np.concatenate(([0], text_rows, [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    heights = ends - starts
+    heights = heights[heights >= 2]
+    if len(heights) < 3:
         return None
+    return float(np.median(heights))
+
+
+def _adaptive_scale(img: Image.Image) -> float:
+    """
+    Return the downsampling factor (<= 1.0) for the adaptive resize mode.
+
+    The text height is estimated on a small thumbnail, then the image is
+    scaled so that text lines are about ``text_height`` px tall, clamped
+    by ``min_side`` / ``max_side`` of the long edge.
+    """
+    params = _ADAPTIVE_RESIZE_PARAMS
+    long_side = max(img.size)
+    if long_side <= params["min_side"]:
+        return 1.0
+
+    thumb_scale = min(1.0, 1000 / long_side)
+    thumb = img.resize(
+        (max(1, round(img.width * thumb_scale)), max(1, round(img.height * thumb_scale))),
+        Image.Resampling.BOX,
+    )
+    text_h = _estimate_text_height(np.asarray(thumb))
+
+    scale = 1.0
+    if text_h:
+        scale = params["text_height"] / (text_h / thumb_scale)
+    scale = min(scale, params["max_side"] / long_side)
+    scale = max(scale, params["min_side"] / long_side)
+    return min(1.0, scale)
 
 
 # Cache the compiled legal-entity regex (built once on first call)
@@ -0,0 +1,149 @@
+"""
+Persistent, content-addressed cache of full-page OCR results.
+
+Entries are keyed by the SHA-256 of the image file contents combined with
+everything that influences the OCR output (preprocessing parameters,
+language list, ...). The raw EasyOCR detections — boxes, texts and
+confidences — are stored in a small SQLite database, so a receipt that was
+already analyzed (in any GUI session or headless run) is answered without
+running the model again.
+
+The database is bounded by a byte budget; the least recently used entries
+are evicted first.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def default_cache_dir() -> str:
+    """Return the cache directory ($ORR_CACHE_DIR, else ~/.cache/orr)."""
+    env_dir = os.environ.get("ORR_CACHE_DIR")
+    if env_dir:
+        return env_dir
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "orr")
+
+
+def file_digest(path: str) -> str:
+    """Return the SHA-256 hex digest of the file contents."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _to_builtin(value: Any) -> Any:
+    """Convert numpy scalars / tuples in EasyOCR output to JSON-friendly types."""
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(v) for v in value]
+    if hasattr(value, "item"):  # numpy scalar
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class OCRCache:
+    """
+    SQLite-backed LRU cache of OCR detections.
+
+    Safe to use from several threads (one shared connection behind a lock)
+    and from several processes (SQLite file locking, WAL journal).
+
+    Attributes:
+        path (str): Path to the SQLite database file.
+        max_bytes (int): Size budget for the stored detections.
+        hits (int): Number of successful lookups in this process.
+        misses (int): Number of failed lookups in this process.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        cache_dir = cache_dir or default_cache_dir()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.path = os.path.join(cache_dir, "ocr_cache.sqlite3")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_results ("
+                " key TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ocr_last_access ON ocr_results(last_access)"
+            )
+
+    @staticmethod
+    def make_key(digest: str, params: Dict[str, Any]) -> str:
+        """Combine an image digest and the OCR parameters into one cache key."""
+        blob = digest + "|" + json.dumps(params, sort_keys=True)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Any]]:
+        """Return the cached detections for *key* (or None) and mark them as used."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT data FROM ocr_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE ocr_results SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+
+        self.hits += 1
+        # EasyOCR returns (box, text, confidence) tuples
+        return [tuple(item) for item in json.loads(row[0])]
+
+    def put(self, key: str, detections: List[Any]) -> None:
+        """Store *detections* under *key* and evict old entries over budget."""
+        data = json.dumps(_to_builtin(detections), ensure_ascii=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_results (key, data, size, last_access)"
+                " VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the budget is met (lock held)."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT key, size FROM ocr_results ORDER BY last_access ASC"
+        )
+        to_delete = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM ocr_results WHERE key = ?", to_delete)
+
+    def clear(self) -> None:
+        """Remove every cached entry."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM ocr_results")
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,179 @@
+"""
+Background OCR worker for the editor: jobs in through a queue, results out through another.
+
+The worker thread is the only one that touches the OCR engine. It never
+modifies the GUI's entries: every job carries what it needs (the path and
+a copy of the current boxes) and every result is a plain dict that the Tk
+thread picks up with ``poll()`` and applies itself. The reviewer can
+therefore keep correcting one receipt while the others are being
+processed.
+
+Jobs are dicts:
+    {"kind": "image", "index": 3, "path": ..., "boxes": {...}, "force": False}
+    {"kind": "region", "index": 3, "path": ..., "field": "price", "region": [[x, y], ...]}
+
+Interactive jobs (the current image, one box) are submitted with
+``PRIORITY_INTERACTIVE`` and overtake the queued batch.
+
+Results are the job plus:
+    "values" / "coords"   extracted fields (image jobs)
+    "text"                recognized text (region jobs)
+    "detections"          all detections of the image (image jobs)
+    "journal_key"         content hash of the image when a journal is used
+    "from_journal"        True if the result came from the journal, not OCR
+    "error"               None or the error message
+    "seconds"             time spent on the job
+"""
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+FIELDS = ("price", "date", "vendor")
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+# MyOCR extractor of each field
+_GETTERS = {"price": "get_price_coords", "date": "get_date", "vendor": "get_vendor_coords"}
+
+
+class OCRWorker:
+    """
+    One daemon thread running OCR jobs in priority order.
+
+    Attributes:
+        engine: The loaded MyOCR instance.
+        journal: Optional ResultsJournal; batch jobs of receipts already in
+            it are answered from the journal.
+    """
+
+    def __init__(self, engine: Any, journal: Any = None):
+        self.engine = engine
+        self.journal = journal
+        self._jobs: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._results: "queue.Queue" = queue.Queue()
+        self._seq = itertools.count()  # FIFO order within one priority
+        self._pending = 0              # submitted, not returned by poll() yet
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="ocr-worker", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Tk thread side
+    # ------------------------------------------------------------------
+
+    def submit(self, job: Dict[str, Any], priority: int = PRIORITY_BATCH) -> None:
+        """Queue *job* (see module docstring)."""
+        with self._lock:
+            self._pending += 1
+        self._jobs.put((priority, next(self._seq), job))
+
+    def cancel_pending(self) -> int:
+        """Drop all jobs that have not started yet; returns how many were dropped."""
+        dropped = 0
+        while True:
+            try:
+                _, _, job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                dropped += 1
+        with self._lock:
+            self._pending -= dropped
+        return dropped
+
+    def poll(self) -> List[Dict[str, Any]]:
+        """All results finished since the last call (never blocks)."""
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                break
+        with self._lock:
+            self._pending -= len(results)
+        return results
+
+    @property
+    def pending(self) -> int:
+        """Jobs submitted whose results have not been polled yet."""
+        with self._lock:
+            return self._pending
+
+    def stop(self) -> None:
+        """Finish the running job and end the thread (queued jobs are dropped)."""
+        self.cancel_pending()
+        self._jobs.put((-1, next(self._seq), None))
+
+    # ------------------------------------------------------------------
+    # Worker thread
+    # ------------------------------------------------------------------
+
+    def _run(self) -> None:
+        while True:
+            _, _, job = self._jobs.get()
+            if job is None:
+                return
+            start = time.perf_counter()
+            result = dict(job, error=None)
+            try:
+                handler: Callable[[Dict[str, Any]], Dict[str, Any]] = (
+                    self._run_region if job["kind"] == "region" else self._run_image)
+                result.update(handler(job))
+            except Exception as e:
+                result["error"] = str(e)
+                print(f"Error processing {job.get('path')}: {e}")
+            result["seconds"] = time.perf_counter() - start
+            self._results.put(result)
+
+    def _run_region(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        return {"text": self.engine.get_text_from_region(job["path"], job["region"])}
+
+    def _journal_key(self, path: str) -> Optional[str]:
+        if self.journal is None:
+            return None
+        try:
+            return self.journal.key_for(path)
+        except OSError:
+            return None
+
+    def _run_image(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        path = job["path"]
+        key = job.get("journal_key") or self._journal_key(path)
+
+        # Receipts finished in an earlier (possibly crashed) session
+        if not job.get("force") and key is not None and key in self.journal:
+            record = self.journal.get(key)
+            return {
+                "journal_key": key, "from_journal": True, "detections": [],
+                "values": {f: record.get(f"{f}_text") or None for f in FIELDS},
+                "coords": {f: (record.get("coords") or {}).get(f) for f in FIELDS},
+            }
+
+        detections = self.engine.analyze_image(path)
+        # None is a failed read (missing or broken file), not an empty receipt
+        if detections is None:
+            raise RuntimeError("OCR selhalo")
+        coords = dict(job["boxes"])
+        values: Dict[str, Optional[str]] = {f: None for f in FIELDS}
+        for field in FIELDS:
+            # A box the reviewer placed is kept (unless the whole image is redone)
+            if coords.get(field) and not job.get("force"):
+                continue
+            res = getattr(self.engine, _GETTERS[field])()
+            if isinstance(res, tuple):
+                coords[field] = res[0]
+                values[field] = res[1] or None
+            else:
+                coords[field] = res
+
+        # Fields with a box but no text — answered from the detections, one recognizer batch for the rest
+        missing = [f for f in FIELDS if not values[f] and coords.get(f)]
+        if missing:
+            texts = self.engine.resolve_region_texts(path, [coords[f] for f in missing])
+            for field, text in zip(missing, texts):
+                values[field] = text
+        return {"journal_key": key, "from_journal": False, "detections": detections,
+                "values": values, "coords": coords}
@@ -0,0 +1,361 @@
+"""
+Crash-safe journal of finished receipts, materialized into the export in one pass.
+
+Every processed receipt is appended as one JSON line and fsync'd right
+away, so a crash in the middle of a batch loses at most the receipt being
+written. Records are keyed by the SHA-256 of the image contents (the same
+digest as the OCR cache), which lets a re-run skip receipts that are
+already in the journal, even after they were renamed or moved.
+
+    {"type": "result", "key": "<sha256>", "filepath": ..., "price_text": ...,
+     "date_text": ..., "vendor_text": ..., "error": null, "time": ...}
+    {"type": "exported", "keys": [...], "versions": {"<sha256>": <result time>, ...},
+     "rows": {"<sha256>": <ledger row>, ...}, "output": "/abs/Vysledny_export.xlsx", "time": ...}
+
+The latest result record of a key wins (GUI corrections are appended
+later; a result identical to the latest one is not appended again).
+Export state is kept per output file: which result version went there
+and, for the Excel ledger, into which row. ``materialize`` writes every
+result this output has never received (Excel with a single load and
+save, or a streamed CSV / JSONL / Parquet file, see Exporters) and then
+appends an "exported" marker. A later correction of an exported receipt
+overwrites its row in the ledger; the append-only formats cannot be
+corrected in place, so there it is only reported, never appended a
+second time. A second output (another file or format) gets everything.
+A crash between the write and the marker exports those receipts again
+next time.
+
+Usage:
+    python ResultsJournal.py Vysledny_export.journal.jsonl -o Vysledny_export.xlsx
+    python ResultsJournal.py Vysledny_export.journal.jsonl -o Vysledny_export.xlsx --all
+    python ResultsJournal.py Vysledny_export.journal.jsonl -o export.csv
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ExcelHandler import ExcelHandler
+from Exporters import FORMATS, export_entries, format_from_path
+from OCRCache import file_digest
+
+FIELDS = ("price_text", "date_text", "vendor_text")
+
+# Record fields that do not make a new version of a result
+_META_FIELDS = ("type", "key", "time", "seconds")
+
+
+def default_journal_path(output_path: str) -> str:
+    """Journal belonging to the workbook *output_path* (``<name>.journal.jsonl``)."""
+    return os.path.splitext(output_path)[0] + ".journal.jsonl"
+
+
+class ResultsJournal:
+    """
+    Append-only, fsync'd JSONL journal of OCR results.
+
+    Safe to use from several threads of one process (the GUI thread and
+    the OCR thread).
+
+    Attributes:
+        path (str): The journal file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._results: Dict[str, Dict[str, Any]] = {}  # key -> latest result record
+        # output path -> {key: ("time" of the result version written there, ledger row or None)}
+        self._exported: Dict[str, Dict[str, Tuple[Any, Optional[int]]]] = {}
+        self._load()
+        self._file = open(path, "a", encoding="utf-8")
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _load(self) -> None:
+        """Replay the journal; a torn last line (crash while writing) is cut off."""
+        if not os.path.exists(self.path):
+            return
+        good_end = 0
+        with open(self.path, "rb") as f:
+            data = f.read()
+        for line in data.splitlines(keepends=True):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                if line.endswith(b"\n"):
+                    print(f"(-) Poškozený záznam v deníku {self.path} přeskočen")
+                    good_end += len(line)
+                    continue
+                break
+            good_end += len(line)
+            self._apply(record)
+        if good_end < len(data):
+            print(f"(-) Deník {self.path}: neúplný poslední záznam odstraněn")
+            with open(self.path, "r+b") as f:
+                f.truncate(good_end)
+        elif data and not data.endswith(b"\n"):
+            # The crash cut only the newline of the last record: without it
+            # the next record would be glued to it and both lost
+            with open(self.path, "ab") as f:
+                f.write(b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        kind = record.get("type")
+        if kind == "result" and record.get("key"):
+            self._results.pop(record["key"], None)  # keep the order of the latest write
+            self._results[record["key"]] = record
+        elif kind == "exported":
+            exported = self._exported.setdefault(_output_key(record.get("output", "")), {})
+            versions = record.get("versions")
+            rows = record.get("rows") or {}
+            for key in record.get("keys", []):
+                if versions is not None:
+                    version = versions.get(key)
+                else:
+                    # Older journals: the marker covers the result written before it
+                    version = self._results[key].get("time") if key in self._results else None
+                row = rows.get(key, exported[key][1] if key in exported else None)
+                exported[key] = (version, row)
+
+    @staticmethod
+    def key_for(path: str) -> str:
+        """Journal key of the image at *path* (SHA-256 of its contents)."""
+        return file_digest(path)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Latest result record for *key*, or None."""
+        with self._lock:
+            return self._results.get(key)
+
+    def __contains__(self, key: str) -> bool:
+        """True if *key* has a successful result."""
+        record = self.get(key)
+        return record is not None and not record.get("error")
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def is_exported(self, key: str, output_path: str) -> bool:
+        """True if the latest result of *key* was written to *output_path*."""
+        with self._lock:
+            record = self._results.get(key)
+            exported = self._exported.get(_output_key(output_path), {})
+            return record is not None and key in exported and exported[key][0] == record.get("time")
+
+    def pending(self, output_path: str) -> List[Dict[str, Any]]:
+        """Successful results never written to *output_path*, oldest first."""
+        with self._lock:
+            exported = self._exported.get(_output_key(output_path), {})
+            return [r for k, r in self._results.items() if not r.get("error") and k not in exported]
+
+    def corrections(self, output_path: str) -> List[Dict[str, Any]]:
+        """Successful results written to *output_path* in an older version, oldest first."""
+        with self._lock:
+            exported = self._exported.get(_output_key(output_path), {})
+            return [r for k, r in self._results.items()
+                    if not r.get("error") and k in exported and exported[k][0] != r.get("time")]
+
+    def ledger_row(self, key: str, output_path: str) -> Optional[int]:
+        """Ledger row of *key* in the workbook *output_path*, or None."""
+        with self._lock:
+            return self._exported.get(_output_key(output_path), {}).get(key, (None, None))[1]
+
+    def is_current(self, key: str, result: Dict[str, Any]) -> bool:
+        """True if the latest record of *key* already holds *result* (timing aside)."""
+        record = self.get(key)
+        if record is None:
+            return False
+        fields = (set(result) | {"error"}) - set(_META_FIELDS)
+        return all(_plain(record.get(f)) == _plain(result.get(f)) for f in fields)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, key: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Durably record *result* (a dict with ``filepath`` and the ``*_text`` fields) under *key*.
+
+        Returns:
+            The stored record.
+        """
+        return self.append_many([(key, result)])[0]
+
+    def append_many(self, items: Iterable[Any]) -> List[Dict[str, Any]]:
+        """
+        Record several (key, result) pairs with a single fsync.
+
+        A result identical to the latest record of its key (e.g. a receipt
+        reopened in the GUI and left unchanged) is not appended, so it does
+        not become a new version to export.
+
+        Returns:
+            The latest record of every key, in the order of *items*.
+        """
+        now = time.time()
+        records, latest = [], []
+        for key, result in items:
+            if self.is_current(key, result):
+                latest.append(self.get(key))
+                continue
+            record = {"type": "result", "key": key, **result, "time": now}
+            record.setdefault("error", None)
+            records.append(record)
+            latest.append(record)
+        if records:
+            self._write(records)
+        return latest
+
+    def mark_exported(self, records: List[Dict[str, Any]], output_path: str,
+                      rows: Optional[List[int]] = None) -> None:
+        """
+        Record that the result *records* (these versions) were written to *output_path*.
+
+        Args:
+            rows: Ledger row of every record (Excel only).
+        """
+        if records:
+            marker = {"type": "exported", "keys": [r["key"] for r in records],
+                      "versions": {r["key"]: r.get("time") for r in records},
+                      "output": _output_key(output_path), "time": time.time()}
+            if rows is not None:
+                marker["rows"] = {r["key"]: row for r, row in zip(records, rows)}
+            self._write([marker])
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        payload = "".join(json.dumps(r, ensure_ascii=False, default=_to_json) + "\n" for r in records)
+        with self._lock:
+            self._file.write(payload)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            for record in records:
+                self._apply(record)
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self) -> "ResultsJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def materialize(self, template_path: str, output_path: str, include_exported: bool = False,
+                    fmt: Optional[str] = None) -> int:
+        """
+        Write the results not yet in *output_path* to it in one pass.
+
+        Corrections of receipts already in an Excel ledger overwrite their
+        row; in the other formats they are reported and left out (the file
+        already holds the receipt and appending it again would book it
+        twice).
+
+        Args:
+            template_path: Excel template used when *output_path* does not exist.
+            output_path: Workbook or file to append to.
+            include_exported: Write every result again as a new entry
+                (e.g. after the output was deleted).
+            fmt: Export format (see Exporters.FORMATS; default: from the
+                extension of *output_path*).
+        Returns:
+            Number of written (appended or overwritten) entries.
+        """
+        fmt = fmt or format_from_path(output_path)
+        if include_exported:
+            with self._lock:
+                records = [r for r in self._results.values() if not r.get("error")]
+            corrections: List[Dict[str, Any]] = []
+        else:
+            records = self.pending(output_path)
+            corrections = self.corrections(output_path)
+
+        rows: List[Optional[int]] = [None] * len(records)
+        fixed = set()
+        if fmt == "xlsx":
+            for r in corrections:
+                row = self.ledger_row(r["key"], output_path)
+                if row is not None:
+                    records.append(r)
+                    rows.append(row)
+                    fixed.add(r["key"])
+        stale = [r for r in corrections if r["key"] not in fixed]
+        if stale:
+            print(f"(-) {len(stale)} opravených účtenek už je v {output_path} v dřívější podobě; "
+                  f"opravy se do tohoto souboru znovu nepřipisují:")
+            for r in stale:
+                print(f"    {os.path.basename(r.get('filepath', ''))}")
+        if not records:
+            print("(+) Deník neobsahuje žádné nové výsledky k exportu.")
+            return 0
+
+        entries = [{
+            "vendor": r.get("vendor_text") or "",
+            "price": r.get("price_text") or "",
+            "date": r.get("date_text") or "",
+            "filename": os.path.basename(r.get("filepath", "")),
+        } for r in records]
+        if fmt == "xlsx":
+            written = ExcelHandler(template_path).write_invoice_entries(output_path, entries, rows)
+            if not written:
+                return 0
+            self.mark_exported(records, output_path, written)
+            return len(written)
+
+        saved = export_entries(entries, output_path, fmt, template_path)
+        # A stream that failed part-way holds the first *saved* rows
+        self.mark_exported(records[:saved], output_path)
+        return saved
+
+
+def _output_key(output_path: str) -> str:
+    return os.path.abspath(output_path) if output_path else ""
+
+
+def _plain(value: Any) -> Any:
+    """*value* as it reads back from the journal (tuples as lists, numpy scalars as numbers)."""
+    return json.loads(json.dumps(value, ensure_ascii=False, default=_to_json))
+
+
+def _to_json(value: Any) -> Any:
+    """Numpy scalars and tuples in OCR coordinates."""
+    if hasattr(value, "item"):
+        return value.item()
+    if isinstance(value, tuple):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} nelze uložit do deníku")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export výsledků z deníku (Excel, CSV, JSONL, Parquet).")
+    parser.add_argument("journal", help="Soubor deníku (*.journal.jsonl).")
+    parser.add_argument("-t", "--template", default="template.xlsx", help="Excel šablona.")
+    parser.add_argument("-o", "--output", default="Vysledny_export.xlsx", help="Výstupní soubor.")
+    parser.add_argument("--format", choices=FORMATS, help="Formát exportu (výchozí: podle přípony výstupu).")
+    parser.add_argument("--all", action="store_true", help="Zapsat znovu i výsledky, které už ve výstupu jsou.")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.journal):
+        print(f"(!) CHYBA: Deník neexistuje: {args.journal}")
+        return 1
+    with ResultsJournal(args.journal) as journal:
+        saved = journal.materialize(args.template, args.output, include_exported=args.all, fmt=args.format)
+    print(f"(+) Exportováno {saved} záznamů do {os.path.abspath(args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Uniform-grid spatial index for axis-aligned boxes.
+
+Receipt detections (and canvas boxes) are small and roughly uniform in
+size, so a flat grid keyed by cell coordinates answers box and point
+queries in near-constant time without any external dependency.
+"""
+import math
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+BBox = Tuple[float, float, float, float]  # (x1, y1, x2, y2)
+
+
+def polygon_bbox(points) -> BBox:
+    """Return the axis-aligned (x1, y1, x2, y2) bounds of a polygon."""
+    xs = [pt[0] for pt in points]
+    ys = [pt[1] for pt in points]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def intersection_area(a: BBox, b: BBox) -> float:
+    """Area of the intersection of two boxes (0 if they do not overlap)."""
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    return w * h if w > 0 and h > 0 else 0.0
+
+
+def box_area(b: BBox) -> float:
+    return max(0.0, b[2] - b[0]) * max(0.0, b[3] - b[1])
+
+
+class GridIndex:
+    """
+    Spatial hash of boxes on a uniform grid.
+
+    Every box is registered in all grid cells it touches; a query only
+    looks at the cells covered by the query box and then filters the
+    candidates exactly.
+
+    Attributes:
+        cell_size (float): Grid cell edge length in the boxes' units.
+    """
+
+    def __init__(self, cell_size: float = 64.0):
+        self.cell_size = max(1.0, float(cell_size))
+        self._cells: Dict[Tuple[int, int], Set[Hashable]] = {}
+        self._boxes: Dict[Hashable, BBox] = {}
+
+    @classmethod
+    def from_boxes(cls, boxes: Iterable[Tuple[Hashable, BBox]],
+                   cell_size: Optional[float] = None) -> "GridIndex":
+        """
+        Build an index from (item_id, bbox) pairs.
+
+        Without an explicit *cell_size* the cell is twice the median box
+        height, which keeps a typical text line in one or two cell rows.
+        """
+        boxes = list(boxes)
+        if cell_size is None:
+            heights = sorted(b[3] - b[1] for _, b in boxes) or [32.0]
+            cell_size = 2 * heights[len(heights) // 2]
+        index = cls(cell_size)
+        for item_id, bbox in boxes:
+            index.insert(item_id, bbox)
+        return index
+
+    def _cell_range(self, bbox: BBox):
+        cs = self.cell_size
+        return (
+            range(math.floor(bbox[0] / cs), math.floor(bbox[2] / cs) + 1),
+            range(math.floor(bbox[1] / cs), math.floor(bbox[3] / cs) + 1),
+        )
+
+    def insert(self, item_id: Hashable, bbox: BBox) -> None:
+        """Add (or move) *item_id* with bounds *bbox*."""
+        if item_id in self._boxes:
+            self.remove(item_id)
+        bbox = (min(bbox[0], bbox[2]), min(bbox[1], bbox[3]),
+                max(bbox[0], bbox[2]), max(bbox[1], bbox[3]))
+        self._boxes[item_id] = bbox
+        cols, rows = self._cell_range(bbox)
+        for cx in cols:
+            for cy in rows:
+                self._cells.setdefault((cx, cy), set()).add(item_id)
+
+    def remove(self, item_id: Hashable) -> None:
+        """Remove *item_id* if present."""
+        bbox = self._boxes.pop(item_id, None)
+        if bbox is None:
+            return
+        cols, rows = self._cell_range(bbox)
+        for cx in cols:
+            for cy in rows:
+                cell = self._cells.get((cx, cy))
+                if cell is not None:
+                    cell.discard(item_id)
+                    if not cell:
+                        del self._cells[(cx, cy)]
+
+    def bbox(self, item_id: Hashable) -> Optional[BBox]:
+        return self._boxes.get(item_id)
+
+    def query(self, bbox: BBox) -> List[Hashable]:
+        """Return ids of all boxes that intersect *bbox* (edges touching count)."""
+        x1, y1, x2, y2 = (min(bbox[0], bbox[2]), min(bbox[1], bbox[3]),
+                          max(bbox[0], bbox[2]), max(bbox[1], bbox[3]))
+        cols, rows = self._cell_range((x1, y1, x2, y2))
+        found: Set[Hashable] = set()
+        for cx in cols:
+            for cy in rows:
+                found.update(self._cells.get((cx, cy), ()))
+
+        result = []
+        for item_id in found:
+            b = self._boxes[item_id]
+            if b[0] <= x2 and x1 <= b[2] and b[1] <= y2 and y1 <= b[3]:
+                result.append(item_id)
+        return result
+
+    def query_point(self, x: float, y: float, tolerance: float = 0.0) -> List[Hashable]:
+        """Return ids of boxes containing the point (grown by *tolerance*)."""
+        return self.query((x - tolerance, y - tolerance, x + tolerance, y + tolerance))
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._boxes.clear()
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._boxes
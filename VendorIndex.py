@@ -0,0 +1,507 @@
+"""
+Multi-pattern dictionary of vendor names (chains, supplier master lists).
+
+Names are matched with an Aho-Corasick automaton, so a lookup costs time
+proportional to the length of the text regardless of how many names are
+loaded — a supplier list with hundreds of thousands of entries is as cheap
+per line as the built-in list of chains. The automaton is kept in flat
+arrays (the children of every node sorted by character) and a compiled
+index is stored in the cache directory, so a list is only built once.
+
+Matching follows the original brand rules of the field extractor:
+  * names longer than 3 characters match as plain substrings; when several
+    occur on one line, the one listed first wins;
+  * names of up to 3 characters must have a word boundary on both sides;
+    the leftmost (and at one position the longest) occurrence wins.
+
+Texts and names are compared in lowercase.
+
+``find_fuzzy`` additionally recognises names garbled by OCR ("T3SC0",
+"Kaufl4nd"): names of at least 5 characters are indexed by symmetric
+deletes of their OCR-folded form (digits and symbols mapped to the letters
+they are mistaken for, diacritics dropped), stored as sorted hashes, and
+candidates are verified with an edit distance in which confusable
+substitutions are cheap.
+"""
+import hashlib
+import os
+import pickle
+import re
+import unicodedata
+import zlib
+from array import array
+from bisect import bisect_left
+from itertools import islice, product
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from AtomicFile import atomic_path
+from OCRCache import default_cache_dir, file_digest
+
+# Names of at most this many characters need word boundaries
+SHORT_NAME_LEN = 3
+
+# Bumped whenever the compiled (pickled) layout changes
+_FORMAT_VERSION = 2
+
+# Characters that re.IGNORECASE matches to 'i' / 's' although str.lower()
+# leaves them alone; short names get these spellings too, so they match
+# exactly what the former case-insensitive word-boundary regex matched
+_CASE_FOLD_VARIANTS = {"i": "iı", "s": "sſ"}
+
+
+# --- Fuzzy matching ---
+FUZZY_MIN_LEN = 5           # shorter names are only matched exactly
+FUZZY_EDIT_LEN = 8          # names at least this long also tolerate one real edit
+FUZZY_CONFUSION_COST = 0.2  # substituting characters that OCR confuses
+FUZZY_MAX_COST = 1.2        # one edit plus one confusion
+FUZZY_MAX_COST_SHORT = 0.6  # up to three confusions, no real edit
+_FUZZY_MAX_WORDS = 4        # longest word window tried on a line
+_FUZZY_MAX_LINE_WORDS = 24  # words of a line scanned (garbage lines run to hundreds)
+
+_OCR_CONFUSIONS = str.maketrans({
+    "0": "o", "1": "l", "i": "l", "|": "l", "!": "l", "3": "e", "4": "a", "@": "a",
+    "5": "s", "$": "s", "8": "b", "6": "g", "2": "z", "7": "t",
+})
+
+_WORD = re.compile(r"\S+")
+# Punctuation that OCR leaves on words ("T3SC0.", "(Albert)"); |, !, $ and @
+# stay, they stand for letters (see _OCR_CONFUSIONS)
+_WORD_EDGE_PUNCT = ".,:;'\"()[]{}<>?*-_/\\"
+
+
+def fold_ocr(text: str) -> str:
+    """Lowercase, drop diacritics and unify characters that OCR confuses."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).translate(_OCR_CONFUSIONS)
+
+
+@lru_cache(maxsize=4096)
+def _fold_char(ch: str) -> str:
+    return fold_ocr(ch)
+
+
+def ocr_edit_cost(a: str, b: str, limit: float = FUZZY_MAX_COST) -> float:
+    """
+    Edit distance of *a* and *b* where substituting two characters with the
+    same OCR fold costs ``FUZZY_CONFUSION_COST`` and everything else 1.
+
+    Only the diagonal band reachable within *limit* is computed; the result
+    is exact up to *limit* and some value above it otherwise.
+    """
+    band = int(limit)  # insertions/deletions that fit into the limit
+    if abs(len(a) - len(b)) > band:
+        return float(abs(len(a) - len(b)))
+    inf = float("inf")
+    fold_b = [_fold_char(ch) for ch in b]
+    prev = [float(j) if j <= band else inf for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        fold_a = _fold_char(ca)
+        cur = [inf] * (len(b) + 1)
+        if i <= band:
+            cur[0] = float(i)
+        row_min = cur[0]
+        for j in range(max(1, i - band), min(len(b), i + band) + 1):
+            cb = b[j - 1]
+            if ca == cb:
+                cost = prev[j - 1]
+            elif fold_a == fold_b[j - 1]:
+                cost = prev[j - 1] + FUZZY_CONFUSION_COST
+            else:
+                cost = prev[j - 1] + 1.0
+            if prev[j] + 1.0 < cost:
+                cost = prev[j] + 1.0
+            if cur[j - 1] + 1.0 < cost:
+                cost = cur[j - 1] + 1.0
+            cur[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > limit:
+            return row_min
+        prev = cur
+    return prev[-1]
+
+
+def _has_letter(word: str) -> bool:
+    return any(ch.isalpha() for ch in word)
+
+
+def _fuzzy_keys(folded: str) -> Set[str]:
+    """
+    Symmetric-delete keys of a folded string: the string itself and, when
+    it is long enough for a real edit, all its single-character deletions.
+    """
+    if len(folded) < FUZZY_EDIT_LEN:
+        return {folded}
+    return {folded} | {folded[:k] + folded[k + 1:] for k in range(len(folded))}
+
+
+def _key_hash(key: str) -> int:
+    return zlib.crc32(key.encode("utf-8"))
+
+
+def read_names(path: str) -> List[str]:
+    """
+    Read a vendor list: one name per line, UTF-8, ``#`` starts a comment line.
+
+    Names are lowercased and stripped; empty lines are skipped.
+    """
+    names: List[str] = []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            name = line.strip().lower()
+            if name and not name.startswith("#"):
+                names.append(name)
+    return names
+
+
+def _is_word_char(text: str, i: int) -> bool:
+    # Same definition as \w in a str regex
+    return 0 <= i < len(text) and (text[i].isalnum() or text[i] == "_")
+
+
+def _short_variants(name: str) -> Iterable[str]:
+    options = [_CASE_FOLD_VARIANTS.get(ch, ch) for ch in name]
+    return ("".join(chars) for chars in product(*options))
+
+
+class VendorIndex:
+    """
+    Aho-Corasick automaton over a list of vendor names.
+
+    Attributes:
+        names (list[str]): Unique lowercase names; the position is the priority.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.names: List[str] = []
+        seen = set()
+        for name in names:
+            name = name.strip().lower()
+            if name and name not in seen:
+                seen.add(name)
+                self.names.append(name)
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def _build(self) -> None:
+        # Pattern string -> name id (short names also in their folded spellings)
+        keys: Dict[str, int] = {}
+        for pid, name in enumerate(self.names):
+            spellings = _short_variants(name) if len(name) <= SHORT_NAME_LEN else (name,)
+            for key in spellings:
+                keys.setdefault(key, pid)
+
+        # Trie nodes in depth-first order: walking the sorted keys, every key
+        # shares its prefix with the previous one and adds nodes for the rest
+        parent = array("i", [0])
+        label = array("I", [0])
+        out = array("i", [-1])
+        path = [0]
+        prev = ""
+        for key in sorted(keys):
+            common = 0
+            limit = min(len(prev), len(key))
+            while common < limit and prev[common] == key[common]:
+                common += 1
+            del path[common + 1:]
+            for ch in key[common:]:
+                parent.append(path[-1])
+                label.append(ord(ch))
+                out.append(-1)
+                path.append(len(parent) - 1)
+            out[path[-1]] = keys[key]
+            prev = key
+
+        # Children grouped by parent (CSR); DFS order keeps them sorted by label
+        n = len(parent)
+        first = array("I", [0]) * (n + 1)
+        for v in range(1, n):
+            first[parent[v] + 1] += 1
+        for v in range(n):
+            first[v + 1] += first[v]
+        edge_labels = array("I", [0]) * (n - 1)
+        edge_targets = array("I", [0]) * (n - 1)
+        fill = array("I", first)
+        for v in range(1, n):
+            k = fill[parent[v]]
+            edge_labels[k] = label[v]
+            edge_targets[k] = v
+            fill[parent[v]] += 1
+
+        self._first, self._edge_labels, self._edge_targets = first, edge_labels, edge_targets
+        self._out = out
+
+        # Failure links and output links, breadth-first
+        fail = array("I", [0]) * n
+        link = array("i", [-1]) * n  # nearest proper suffix node that ends a name
+        queue = [edge_targets[k] for k in range(first[0], first[1])]
+        for v in queue:
+            for k in range(first[v], first[v + 1]):
+                u, c = edge_targets[k], edge_labels[k]
+                f = fail[v]
+                while True:
+                    t = self._child(f, c)
+                    if t >= 0:
+                        fail[u] = t
+                        break
+                    if f == 0:
+                        break
+                    f = fail[f]
+                fu = fail[u]
+                link[u] = fu if out[fu] >= 0 else link[fu]
+                queue.append(u)
+
+        self._fail, self._link = fail, link
+
+        # Fuzzy index: (hash of a delete key, name id), sorted by hash
+        self._folded = [fold_ocr(name) for name in self.names]
+        hashes: List[int] = []
+        ids: List[int] = []
+        for pid, folded in enumerate(self._folded):
+            if len(folded) >= FUZZY_MIN_LEN:
+                for key in _fuzzy_keys(folded):
+                    hashes.append(_key_hash(key))
+                    ids.append(pid)
+        order = np.argsort(np.asarray(hashes, dtype=np.uint32), kind="stable")
+        self._fuzzy_hashes = np.asarray(hashes, dtype=np.uint32)[order]
+        self._fuzzy_ids = np.asarray(ids, dtype=np.uint32)[order]
+        self._finish()
+
+    def _finish(self) -> None:
+        """Derive the lookup helpers that are not stored in the compiled form."""
+        first, labels, targets = self._first, self._edge_labels, self._edge_targets
+        self._root = {chr(labels[k]): targets[k] for k in range(first[0], first[1])}
+        self._lengths = array("I", (len(name) for name in self.names))
+        fuzzy_lengths = [len(f) for f in self._folded if len(f) >= FUZZY_MIN_LEN]
+        self._fuzzy_max_len = max(fuzzy_lengths, default=0)
+
+    def _child(self, node: int, c: int) -> int:
+        lo, hi = self._first[node], self._first[node + 1]
+        k = bisect_left(self._edge_labels, c, lo, hi)
+        if k < hi and self._edge_labels[k] == c:
+            return self._edge_targets[k]
+        return -1
+
+    # ------------------------------------------------------------------
+    # Matching
+    # ------------------------------------------------------------------
+
+    def iter_matches(self, text: str) -> Iterable[Tuple[int, int]]:
+        """Yield (end, name id) for every occurrence of every name in *text*."""
+        root, fail, out, link = self._root, self._fail, self._out, self._link
+        first, labels, targets = self._first, self._edge_labels, self._edge_targets
+        node = 0
+        for i, ch in enumerate(text):
+            if node:
+                c = ord(ch)
+                while node:
+                    lo, hi = first[node], first[node + 1]
+                    k = bisect_left(labels, c, lo, hi)
+                    if k < hi and labels[k] == c:
+                        node = targets[k]
+                        break
+                    node = fail[node]
+            if not node:
+                node = root.get(ch, 0)
+            v = node if out[node] >= 0 else link[node]
+            while v > 0:
+                yield i + 1, out[v]
+                v = link[v]
+
+    def find(self, text_lower: str) -> Optional[Tuple[int, int, str]]:
+        """
+        Find the best vendor name in a lowercased line.
+
+        Returns:
+            (start, end, name) — a long name (first in list order) wins over a
+            short one; None if no name occurs.
+        """
+        best_long = -1
+        long_start = 0
+        best_short: Optional[Tuple[int, int]] = None  # (start, end)
+        lengths = self._lengths
+
+        for end, pid in self.iter_matches(text_lower):
+            start = end - lengths[pid]
+            if lengths[pid] > SHORT_NAME_LEN:
+                # Ends only grow, so the first hit of a name is its leftmost one
+                if best_long < 0 or pid < best_long:
+                    best_long, long_start = pid, start
+            elif (_is_word_char(text_lower, start - 1) != _is_word_char(text_lower, start)
+                  and _is_word_char(text_lower, end - 1) != _is_word_char(text_lower, end)):
+                if best_short is None or start < best_short[0] or (
+                        start == best_short[0] and end > best_short[1]):
+                    best_short = (start, end)
+
+        if best_long >= 0:
+            return long_start, long_start + lengths[best_long], self.names[best_long]
+        if best_short is not None:
+            start, end = best_short
+            return start, end, text_lower[start:end].lower()
+        return None
+
+    def find_fuzzy(self, text_lower: str) -> Optional[Tuple[int, int, str, float]]:
+        """
+        Find the vendor name closest to a window of 1-4 words of a lowercased line.
+
+        Only the first ``_FUZZY_MAX_LINE_WORDS`` words of the line are
+        scanned, so that long garbage lines stay as cheap as short ones.
+
+        Only names of at least ``FUZZY_MIN_LEN`` characters take part; a
+        match costs at most ``FUZZY_MAX_COST`` (``FUZZY_MAX_COST_SHORT`` for
+        names shorter than ``FUZZY_EDIT_LEN``).
+
+        Returns:
+            (start, end, name, cost) of the cheapest match (ties: list order),
+            or None.
+        """
+        if not len(self._fuzzy_hashes):
+            return None
+
+        # Word windows, grouped by their folded form (= the same delete keys)
+        # Only words with at least one letter ("T3SC0" yes, "3,90" no),
+        # without the punctuation around them
+        words = []
+        for m in islice(_WORD.finditer(text_lower), _FUZZY_MAX_LINE_WORDS):
+            word = m.group(0).lstrip(_WORD_EDGE_PUNCT)
+            start = m.end() - len(word)
+            word = word.rstrip(_WORD_EDGE_PUNCT)
+            words.append((start, start + len(word), fold_ocr(word) if _has_letter(word) else ""))
+        windows: List[Tuple[int, int, str, str]] = []  # (start, end, raw, folded)
+        by_folded: Dict[str, List[int]] = {}
+        for i in range(len(words)):
+            for j in range(i, min(i + _FUZZY_MAX_WORDS, len(words))):
+                if not words[j][2]:
+                    break
+                folded = " ".join(w[2] for w in words[i:j + 1])
+                if len(folded) > self._fuzzy_max_len + 1:
+                    break
+                if len(folded) >= FUZZY_MIN_LEN - 1:
+                    raw = " ".join(text_lower[w[0]:w[1]] for w in words[i:j + 1])
+                    by_folded.setdefault(folded, []).append(len(windows))
+                    windows.append((words[i][0], words[j][1], raw, folded))
+        if not windows:
+            return None
+
+        owners: List[List[int]] = []
+        hashes: List[int] = []
+        for folded, members in by_folded.items():
+            for key in _fuzzy_keys(folded):
+                hashes.append(_key_hash(key))
+                owners.append(members)
+        query = np.asarray(hashes, dtype=np.uint32)
+        lo = np.searchsorted(self._fuzzy_hashes, query, side="left")
+        hi = np.searchsorted(self._fuzzy_hashes, query, side="right")
+
+        best: Optional[Tuple[float, int, int, int]] = None  # (cost, name id, start, end)
+        checked = set()
+        for k in np.flatnonzero(hi > lo).tolist():
+            candidates = self._fuzzy_ids[lo[k]:hi[k]].tolist()
+            for w in owners[k]:
+                start, end, raw, folded = windows[w]
+                for pid in candidates:
+                    if (w, pid) in checked:
+                        continue
+                    checked.add((w, pid))
+                    name_folded = self._folded[pid]
+                    if abs(len(name_folded) - len(folded)) > 1:
+                        continue
+                    if len(self.names[pid]) < FUZZY_EDIT_LEN:
+                        if name_folded != folded:
+                            continue
+                        limit = FUZZY_MAX_COST_SHORT
+                    else:
+                        limit = FUZZY_MAX_COST
+                    if best is not None:
+                        limit = min(limit, best[0])
+                    cost = ocr_edit_cost(raw, self.names[pid], limit)
+                    if cost <= limit and (best is None or (cost, pid) < best[:2]):
+                        best = (cost, pid, start, end)
+
+        if best is None:
+            return None
+        cost, pid, start, end = best
+        return start, end, self.names[pid], cost
+
+    # ------------------------------------------------------------------
+    # Compiled form
+    # ------------------------------------------------------------------
+
+    def save(self, path: str) -> None:
+        """Write the compiled index to *path* (atomically)."""
+        state = {
+            "version": _FORMAT_VERSION,
+            "names": self.names,
+            "first": self._first,
+            "edge_labels": self._edge_labels,
+            "edge_targets": self._edge_targets,
+            "out": self._out,
+            "fail": self._fail,
+            "link": self._link,
+            "folded": self._folded,
+            "fuzzy_hashes": self._fuzzy_hashes,
+            "fuzzy_ids": self._fuzzy_ids,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with atomic_path(path) as temp_path:
+            with open(temp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load_compiled(cls, path: str) -> "VendorIndex":
+        """Read an index written by ``save``."""
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("version") != _FORMAT_VERSION:
+            raise ValueError(f"Nepodporovaná verze indexu: {state.get('version')}")
+        index = cls.__new__(cls)
+        index.names = state["names"]
+        index._first = state["first"]
+        index._edge_labels = state["edge_labels"]
+        index._edge_targets = state["edge_targets"]
+        index._out = state["out"]
+        index._fail = state["fail"]
+        index._link = state["link"]
+        index._folded = state["folded"]
+        index._fuzzy_hashes = state["fuzzy_hashes"]
+        index._fuzzy_ids = state["fuzzy_ids"]
+        index._finish()
+        return index
+
+    @classmethod
+    def load(cls, path: str, base_names: Iterable[str] = (),
+             cache_dir: Optional[str] = None) -> "VendorIndex":
+        """
+        Index of *base_names* followed by the names in the list file *path*.
+
+        The compiled index is cached in *cache_dir* (default: the OCR cache
+        directory) under the digest of the names, so later runs skip building.
+        """
+        base_names = list(base_names)
+        h = hashlib.sha256(file_digest(path).encode())
+        h.update("\n".join(base_names).encode("utf-8"))
+        cache_path = os.path.join(cache_dir or default_cache_dir(),
+                                  f"vendors-v{_FORMAT_VERSION}-{h.hexdigest()[:24]}.pkl")
+
+        if os.path.exists(cache_path):
+            try:
+                return cls.load_compiled(cache_path)
+            except Exception as e:
+                print(f"(!) Zkompilovaný seznam dodavatelů nelze načíst ({e}), sestavuji znovu.")
+
+        index = cls(base_names + read_names(path))
+        try:
+            index.save(cache_path)
+        except OSError as e:
+            print(f"(!) Zkompilovaný seznam dodavatelů nelze uložit: {e}")
+        return index
+
@@ -0,0 +1,84 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Ground truth for a sample directory lives in ``labels.json`` next to the
+images::
+
+    {
+        "uctenka_01.jpg": {"price": "1 234,50", "date": "12.3.2024", "vendor": "Tesco"},
+        ...
+    }
+"""
+import json
+import math
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+# Make the application modules (MyOCR, ExcelHandler, ...) importable
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from ExcelHandler import ExcelHandler  # noqa: E402
+
+FIELDS = ("price", "date", "vendor")
+
+_excel = ExcelHandler(template_path="")
+
+def load_labels(sample_dir: str) -> Dict[str, Dict[str, str]]:
+    """Load ``labels.json`` from *sample_dir* (empty dict if missing)."""
+    path = os.path.join(sample_dir, "labels.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _price_value(text: Optional[str]) -> Optional[float]:
+    from MyOCR import _clean_price_string
+    return _clean_price_string(text) if text else None
+
+
+def field_matches(field: str, predicted: Optional[str], expected: Optional[str]) -> bool:
+    """
+    Compare an extracted value with the ground truth the way the export sees it.
+
+    Prices are compared as numbers, dates as parsed dates and vendors
+    case-insensitively (either name containing the other counts as a match).
+    """
+    predicted = (predicted or "").strip()
+    expected = (expected or "").strip()
+    if not expected:
+        return not predicted
+
+    if field == "price":
+        p, e = _price_value(predicted), _price_value(expected)
+        return p is not None and e is not None and abs(p - e) < 0.005
+    if field == "date":
+        p, e = _excel._parse_date(predicted), _excel._parse_date(expected)
+        if e is not None:
+            return p == e
+        return predicted == expected
+    if field == "vendor":
+        p, e = predicted.casefold(), expected.casefold()
+        return bool(p) and (p in e or e in p)
+    return predicted == expected
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of *values* (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def write_json(path: Optional[str], payload: Dict[str, Any]) -> None:
+    """Write *payload* as pretty JSON to *path* (no-op when path is None)."""
+    if not path:
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    print(f"Výsledek uložen: {path}")
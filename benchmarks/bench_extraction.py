@@ -0,0 +1,385 @@
+"""
+Speed and accuracy of the field extractors over recorded and synthetic OCR output.
+
+Runs ``extract_fields`` (all three fields in one pass, as the application
+does), the per-field wrappers ``ReturnPrice``, ``ReturnDate`` and
+``ReturnVendor`` (each scanning only for its own field),
+``_clean_price_string`` and ``ExcelHandler._parse_date`` without the OCR
+model, over:
+
+* a corpus of recorded ``readtext`` outputs (``--corpus``), one JSON list of
+  ``[box, text, confidence]`` per file, with ground truth in ``labels.json``
+  keyed by the JSON file name or the image name with the same stem;
+* synthetic labelled receipts with the truth planted in them;
+* pathological long lines aimed at regex backtracking (timed only).
+
+Reports per-function throughput, p50/p99/max latency and field accuracy,
+can save the result as JSON and compare it with a saved baseline.
+
+Recording a corpus needs the OCR model once; afterwards the benchmark runs
+anywhere:
+
+    python benchmarks/bench_extraction.py --record samples/ --corpus corpus/
+
+Usage:
+    python benchmarks/bench_extraction.py --corpus corpus/ --json extraction.json
+    python benchmarks/bench_extraction.py --json new.json --compare extraction.json
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from _common import FIELDS, REPO_ROOT, field_matches, load_labels, percentile, write_json
+
+import MyOCR as M
+from ExcelHandler import ExcelHandler
+
+_excel = ExcelHandler(template_path="")
+
+# Benchmarked function name -> (callable, field checked against the truth;
+# "*" = all fields)
+FUNCTIONS: Dict[str, Tuple[Callable, str]] = {
+    "extract_fields": (M.extract_fields, "*"),
+    "ReturnPrice": (M.ReturnPrice, "price"),
+    "ReturnDate": (M.ReturnDate, "date"),
+    "ReturnVendor": (M.ReturnVendor, "vendor"),
+    "_clean_price_string": (M._clean_price_string, "price"),
+    "ExcelHandler._parse_date": (_excel._parse_date, "date"),
+}
+
+
+# ==========================================
+# CORPUS
+# ==========================================
+
+def load_corpus(corpus_dir: str) -> List[Tuple[str, List[Any], Optional[Dict[str, str]]]]:
+    """Return (name, readtext output, truth or None) for every JSON file in *corpus_dir*."""
+    labels = load_labels(corpus_dir)
+    by_stem = {os.path.splitext(k)[0]: v for k, v in labels.items()}
+    cases = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "*.json"))):
+        name = os.path.basename(path)
+        if name == "labels.json":
+            continue
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        truth = labels.get(name, by_stem.get(os.path.splitext(name)[0]))
+        cases.append((name, [(box, text, conf) for box, text, conf in data], truth))
+    return cases
+
+
+def record_corpus(samples_dir: str, corpus_dir: str) -> int:
+    """Run full-page OCR on the images in *samples_dir* and save the outputs to *corpus_dir*."""
+    from BatchOCR import collect_images
+    from MyOCR import MyOCR
+
+    paths = collect_images([samples_dir])
+    if not paths:
+        print("(!) Nenalezeny žádné obrázky.")
+        return 0
+    os.makedirs(corpus_dir, exist_ok=True)
+    ocr = MyOCR()
+    written = 0
+    for path in paths:
+        data = ocr.analyze_image(path)
+        if data is None:
+            continue
+        out = [[[[int(x), int(y)] for x, y in box], str(text), float(conf)] for box, text, conf in data]
+        stem = os.path.splitext(os.path.basename(path))[0]
+        with open(os.path.join(corpus_dir, stem + ".json"), "w", encoding="utf-8") as f:
+            json.dump(out, f, ensure_ascii=False)
+        written += 1
+    labels = os.path.join(samples_dir, "labels.json")
+    if os.path.exists(labels):
+        shutil.copyfile(labels, os.path.join(corpus_dir, "labels.json"))
+    print(f"(+) Uloženo {written} výstupů OCR do {corpus_dir}")
+    return written
+
+
+# ==========================================
+# SYNTHETIC RECEIPTS
+# ==========================================
+
+_ITEMS = ["Rohlík", "Mléko 1,5%", "Chléb kmínový", "Máslo 250g", "Banány", "Káva zrnková",
+          "Jogurt bílý", "Sýr eidam", "Pivo 0,5l", "Voda neperlivá", "Taška", "Vejce 10ks"]
+_COMPANIES = ["Pekárna U Nováků", "Stavebniny Dvořák", "Autoservis Kolář", "Papírnictví Malá"]
+_TOTAL_LABELS = ["Celkem", "CELKEM K ÚHRADĚ", "K platbě", "Total", "Suma"]
+_DATE_LABELS = ["Datum:", "Dne", "Datum vystavení:", "Date"]
+
+
+def _format_price(rng: random.Random, value: float) -> str:
+    whole, cents = divmod(round(value * 100), 100)
+    style = rng.randrange(4)
+    if style == 0:
+        return f"{whole},{cents:02d}"
+    if style == 1:
+        return f"{whole}.{cents:02d} Kč"
+    if style == 2 and whole >= 1000:
+        return f"{whole // 1000} {whole % 1000:03d},{cents:02d}"
+    return f"{whole},{cents:02d} Kč"
+
+
+def _format_date(rng: random.Random, day: datetime.date) -> str:
+    style = rng.randrange(3)
+    if style == 0:
+        return f"{day.day}.{day.month}.{day.year}"
+    if style == 1:
+        return f"{day.day:02d}.{day.month:02d}.{day.year}"
+    return f"{day.day}. {day.month}. {day.year}"
+
+
+def make_labelled_receipt(rng: random.Random, n_items: int) -> Tuple[List[Any], Dict[str, str]]:
+    """Random receipt in ``readtext`` shape together with its ground truth."""
+    if rng.random() < 0.6:
+        vendor = rng.choice(M._VENDOR_KNOWN_BRANDS)
+        header = vendor.upper() if rng.random() < 0.5 else vendor.title()
+    else:
+        vendor = rng.choice(_COMPANIES)
+        header = f"{vendor} s.r.o."
+    day = datetime.date(2020, 1, 1) + datetime.timedelta(days=rng.randrange(2000))
+    total = rng.uniform(5, 20000)
+
+    rows = [header, "Hlavní 12, Praha 1", "IČO: 25110161"]
+    rows += [f"{rng.choice(_ITEMS)} {rng.randint(1, 5)} x {rng.randint(1, 99)},{rng.randint(0, 99):02d}"
+             for _ in range(n_items)]
+    rows.append(f"DPH 21% {total * 0.21:.2f}".replace(".", ","))
+    rows.append(f"{rng.choice(_TOTAL_LABELS)} {_format_price(rng, total)}")
+    rows.append(f"{rng.choice(_DATE_LABELS)} {_format_date(rng, day)} {rng.randint(0, 23)}:{rng.randint(0, 59):02d}")
+    rows.append("Děkujeme za nákup")
+
+    data = [([[10, 30 * k], [300, 30 * k], [300, 30 * k + 20], [10, 30 * k + 20]], text, 0.9)
+            for k, text in enumerate(rows)]
+    rng.shuffle(data)  # EasyOCR detection order is not reading order
+    truth = {"price": f"{total:.2f}", "date": f"{day.day}.{day.month}.{day.year}", "vendor": vendor}
+    return data, truth
+
+
+def pathological_lines(length: int) -> Dict[str, str]:
+    """Single lines built to make the extraction regexes backtrack."""
+    return {
+        "číslice s mezerami": "celkem " + "1 " * (length // 2),
+        "čárky bez haléřů": "k platbě " + "1," * (length // 2),
+        "tečky data": "datum " + "12." * (length // 3),
+        "mezery v datu": "dne " + "1 " * (length // 2) + "x",
+        "právní forma": "s " * (length // 2) + "r.o",
+        "ičo bez čísla": "ičo: " + "cz " * (length // 3),
+        "jedno slovo": "x" * length,
+    }
+
+
+# ==========================================
+# MEASUREMENT
+# ==========================================
+
+def _one_line(text: str) -> List[Any]:
+    return [([[0, 0], [10 * len(text), 0], [10 * len(text), 20], [0, 20]], text, 0.9)]
+
+
+def _takes_ocr(fn_name: str) -> bool:
+    """True for the extractors that take ``readtext`` output (not a string)."""
+    return FUNCTIONS[fn_name][1] == "*" or fn_name.startswith("Return")
+
+
+def _inputs(fn_name: str, cases: List[Tuple[List[Any], Dict[str, str]]]) -> List[Tuple[Any, Any]]:
+    """Arguments for *fn_name* with the expected value (or None when unknown)."""
+    field = FUNCTIONS[fn_name][1]
+    if field == "*":
+        return [(data, truth or None) for data, truth in cases]
+    if _takes_ocr(fn_name):
+        return [(data, truth.get(field) if truth else None) for data, truth in cases]
+    # The string helpers get the ground-truth strings plus OCR-like noise
+    values = [truth[field] for _, truth in cases if truth and truth.get(field)]
+    noise = ["", "Kč", "12,3,4", "1.2.3.4,50", "O,5O", "31.02.2024", "2024-03-12", "1 2 3"]
+    return [(v, v) for v in values] + [(n, None) for n in noise]
+
+
+def _is_correct(fn_name: str, result: Any, expected: Any) -> bool:
+    field = FUNCTIONS[fn_name][1]
+    if field == "*":
+        return all(field_matches(f, result[f][1], expected.get(f)) for f in FIELDS)
+    if _takes_ocr(fn_name):
+        return field_matches(field, result[1], expected)
+    if fn_name == "_clean_price_string":
+        return result is not None and abs(result - float(expected)) < 0.005
+    parsed = _excel._parse_date(expected)
+    return result is not None and result == parsed
+
+
+def measure(fn_name: str, inputs: List[Tuple[Any, Optional[str]]], repeat: int) -> Dict[str, Any]:
+    """Time every call of *fn_name* on *inputs* (*repeat* rounds) and score the results."""
+    fn = FUNCTIONS[fn_name][0]
+    times: List[float] = []
+    correct = labelled = 0
+    for arg, expected in inputs:
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn(arg)
+            times.append(time.perf_counter() - start)
+        if expected is not None:
+            labelled += 1
+            correct += _is_correct(fn_name, result, expected)
+    total = sum(times)
+    return {
+        "calls": len(times),
+        "per_s": len(times) / total if total else 0.0,
+        "p50_us": percentile(times, 50) * 1e6,
+        "p99_us": percentile(times, 99) * 1e6,
+        "max_us": max(times, default=0.0) * 1e6,
+        "labelled": labelled,
+        "accuracy": correct / labelled if labelled else None,
+    }
+
+
+def measure_pathological(length: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    """Worst call time per extractor for each pathological line, in microseconds."""
+    rows = {}
+    for label, text in pathological_lines(length).items():
+        row = {}
+        for fn_name, (fn, _) in FUNCTIONS.items():
+            arg = _one_line(text) if _takes_ocr(fn_name) else text
+            worst = 0.0
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn(arg)
+                worst = max(worst, time.perf_counter() - start)
+            row[fn_name] = worst * 1e6
+        rows[label] = row
+    return rows
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                             capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+# ==========================================
+# REPORT
+# ==========================================
+
+def print_functions(title: str, rows: Dict[str, Dict[str, Any]]) -> None:
+    print(title)
+    header = f"{'funkce':<26}{'volání/s':>12}{'p50 [µs]':>11}{'p99 [µs]':>11}{'max [µs]':>11}{'přesnost':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, r in rows.items():
+        acc = "-" if r["accuracy"] is None else f"{r['accuracy'] * 100:.1f}%"
+        print(f"{name:<26}{r['per_s']:>12.0f}{r['p50_us']:>11.1f}{r['p99_us']:>11.1f}{r['max_us']:>11.1f}{acc:>10}")
+    print()
+
+
+def print_pathological(rows: Dict[str, Dict[str, float]], length: int) -> None:
+    print(f"Patologické řádky ({length} znaků), nejhorší volání [µs]:")
+    names = list(FUNCTIONS)
+    print(f"{'řádek':<22}" + "".join(f"{n[:12]:>14}" for n in names))
+    for label, row in rows.items():
+        print(f"{label:<22}" + "".join(f"{row[n]:>14.1f}" for n in names))
+    print()
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> int:
+    """
+    Print the differences to a saved result; return the number of regressions.
+
+    A regression is a lower accuracy, or a p99 latency (or pathological worst
+    case) more than *tolerance* times slower than the baseline.
+    """
+    regressions = 0
+    print(f"Porovnání s {baseline.get('meta', {}).get('commit') or 'uloženým během'}:")
+    for group in ("synthetic", "corpus"):
+        for name, new in current.get(group, {}).items():
+            old = baseline.get(group, {}).get(name)
+            if not old:
+                continue
+            notes = []
+            if old["p99_us"] and new["p99_us"] > old["p99_us"] * (1 + tolerance):
+                notes.append(f"p99 {old['p99_us']:.1f} -> {new['p99_us']:.1f} µs")
+            if old["accuracy"] is not None and new["accuracy"] is not None \
+                    and new["accuracy"] < old["accuracy"] - 1e-9:
+                notes.append(f"přesnost {old['accuracy'] * 100:.1f} -> {new['accuracy'] * 100:.1f} %")
+            ratio = old["p50_us"] / new["p50_us"] if new["p50_us"] else 0.0
+            status = "(!) " + ", ".join(notes) if notes else "ok"
+            print(f"  {group:<10}{name:<26} p50 {ratio:5.2f}x  {status}")
+            regressions += bool(notes)
+    for label, row in current.get("pathological", {}).items():
+        old_row = baseline.get("pathological", {}).get(label, {})
+        for name, worst in row.items():
+            old = old_row.get(name)
+            if old and worst > old * (1 + tolerance) and worst > 1000:
+                print(f"  (!) {label} / {name}: {old:.0f} -> {worst:.0f} µs")
+                regressions += 1
+    print(f"Regresí: {regressions}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rychlost a přesnost extrakce polí bez OCR modelu.")
+    parser.add_argument("--corpus", help="Složka s uloženými výstupy readtext (*.json) a labels.json.")
+    parser.add_argument("--record", metavar="SAMPLES",
+                        help="Nejdřív projet obrázky ze složky OCR a uložit výstupy do --corpus.")
+    parser.add_argument("--cases", type=int, default=300, help="Počet syntetických účtenek.")
+    parser.add_argument("--repeat", type=int, default=20, help="Počet opakování každého volání.")
+    parser.add_argument("--long-line", type=int, default=2000, help="Délka patologických řádků ve znacích.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Uložit výsledky do JSON souboru.")
+    parser.add_argument("--compare", help="Porovnat s dříve uloženým JSON výsledkem.")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Povolené zpomalení p99 při porovnání (0.25 = 25 %%).")
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.corpus:
+            parser.error("--record vyžaduje --corpus")
+        if not record_corpus(args.record, args.corpus):
+            return 1
+
+    rng = random.Random(args.seed)
+    synthetic = [make_labelled_receipt(rng, rng.randint(0, 60)) for _ in range(args.cases)]
+    result: Dict[str, Any] = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "seed": args.seed,
+            "cases": args.cases,
+            "repeat": args.repeat,
+        },
+        "synthetic": {name: measure(name, _inputs(name, synthetic), args.repeat) for name in FUNCTIONS},
+    }
+    print_functions(f"Syntetické účtenky ({args.cases}):", result["synthetic"])
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+        if corpus:
+            cases = [(data, truth) for _, data, truth in corpus]
+            result["corpus"] = {name: measure(name, _inputs(name, cases), args.repeat) for name in FUNCTIONS}
+            print_functions(f"Korpus {args.corpus} ({len(corpus)} dokladů):", result["corpus"])
+        else:
+            print(f"(-) Korpus {args.corpus} neobsahuje žádné výstupy OCR")
+
+    result["pathological"] = measure_pathological(args.long_line, max(1, args.repeat // 4))
+    print_pathological(result["pathological"], args.long_line)
+
+    write_json(args.json, result)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(baseline, result, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,238 @@
+"""
+Micro-benchmark of the single-pass field extraction engine.
+
+Compares ``MyOCR.extract_fields`` (one walk over the lines) with the
+previous multi-pass strategy (ReturnPrice + ReturnDate + ReturnVendor,
+each scanning the lines on its own), kept below as a reference
+implementation. Before timing, both are run on a set of random synthetic
+receipts and every field must come out identical. Fuzzy vendor matching
+(which the old code did not have) is switched off for both the check and
+the timing.
+
+What to expect (default seed, --repeat 100):
+
+    lines   invoice   random   no keywords
+       50     2.1x     2.0x       2.9x
+      300     1.7x     2.5x       3.1x
+     1000     2.0x     1.7x       2.9x
+
+The single pass gains most when the old passes had to scan far: fields
+at opposite ends of a long invoice, or lines without any keyword. On
+random receipts, where every field sits within the first few dozen
+lines, both stop early; over 40 random receipts per size the worst one
+came out at par (0.94x-0.99x) and the median at 1.8x.
+
+Usage:
+    python benchmarks/bench_field_engine.py --lines 300 --repeat 200
+"""
+import argparse
+import random
+import re
+import time
+from typing import Any, List, Optional, Tuple
+
+import _common  # noqa: F401  (puts the repo root on sys.path)
+
+import MyOCR as M
+from LineTable import LineTable
+
+
+# ==========================================
+# REFERENCE: multi-pass extractors
+# ==========================================
+
+_SHORT_BRANDS = sorted([k for k in M._VENDOR_KNOWN_BRANDS if len(k) <= 3], key=len, reverse=True)
+_LONG_BRANDS = [k for k in M._VENDOR_KNOWN_BRANDS if len(k) > 3]
+_SHORT_PATTERN = re.compile(r'\b(' + '|'.join(re.escape(k) for k in _SHORT_BRANDS) + r')\b', re.IGNORECASE)
+
+def reference_price(lines: LineTable) -> Tuple[Optional[List], str]:
+    texts = lines.texts
+    for i in range(len(texts) - 1, -1, -1):
+        text = texts[i]
+        if M._PRICE_BLACKLIST.search(text):
+            continue
+        match = M._PRICE_FULL.search(text)
+        if match:
+            raw_price = match.group(1)
+            if M._clean_price_string(raw_price):
+                return lines.span_box(i, match.start(1), match.end(1)), raw_price
+
+    for i, text in enumerate(texts):
+        if M._PRICE_BLACKLIST.search(text):
+            continue
+        if M._PRICE_KEYWORDS.search(text):
+            for offset in (1, 2):
+                j = i + offset
+                if j < len(texts):
+                    price_match = M._PRICE_NUMBER.search(texts[j])
+                    if price_match:
+                        raw_next = price_match.group(0)
+                        if M._clean_price_string(raw_next):
+                            return lines.span_box(j, price_match.start(), price_match.end()), raw_next
+    return None, ""
+
+
+def reference_date(lines: LineTable) -> Tuple[Optional[List], str]:
+    texts = lines.texts
+    for i, txt in enumerate(texts):
+        if M._DATE_KEYWORDS.search(txt):
+            for pat in M._DATE_PATTERNS:
+                match = pat.search(txt)
+                if match:
+                    return lines.span_box(i, match.start(), match.end()), match.group(0)
+    for i, txt in enumerate(texts):
+        for pat in M._DATE_PATTERNS:
+            match = pat.search(txt)
+            if match:
+                return lines.span_box(i, match.start(), match.end()), match.group(0)
+    return None, ""
+
+
+def reference_vendor(lines: LineTable) -> Tuple[Optional[List], str]:
+    texts = lines.texts
+    for i, txt in enumerate(texts):
+        txt_lower = txt.lower()
+        for brand in _LONG_BRANDS:
+            pos = txt_lower.find(brand)
+            if pos >= 0:
+                return lines.span_box(i, pos, pos + len(brand)), brand
+        m = _SHORT_PATTERN.search(txt_lower)
+        if m:
+            return lines.span_box(i, m.start(1), m.end(1)), m.group(1).lower()
+
+    entity_pattern = M._get_legal_entity_pattern()
+    for i, txt in enumerate(texts):
+        m = entity_pattern.search(txt)
+        if m:
+            vendor_candidate = txt[:m.start()].strip()
+            if len(vendor_candidate) > 1:
+                return lines.span_box(i, 0, m.start()), vendor_candidate
+            elif i > 0:
+                return lines.line_box(i - 1), texts[i - 1]
+
+    for i, txt in enumerate(texts):
+        txt_lower = txt.lower()
+        if 'dodavatel' in txt_lower or 'prodávající' in txt_lower:
+            if len(txt) > 12:
+                return lines.line_box(i), txt
+            elif i + 1 < len(texts):
+                return lines.line_box(i + 1), texts[i + 1]
+
+    for i, txt in enumerate(texts):
+        if M._VENDOR_ICO_DIC.search(txt):
+            if i > 0:
+                return lines.line_box(i - 1), texts[i - 1]
+    return None, ""
+
+
+def reference_fields(lines: LineTable):
+    return {
+        "price": reference_price(lines),
+        "date": reference_date(lines),
+        "vendor": reference_vendor(lines),
+    }
+
+
+# ==========================================
+# SYNTHETIC RECEIPTS
+# ==========================================
+
+_ITEMS = ["Rohlík", "Mléko 1,5%", "Chléb kmínový", "Máslo 250g", "Banány", "Káva zrnková",
+          "Jogurt bílý", "Sýr eidam", "Pivo 0,5l", "Voda neperlivá", "Taška", "Vejce 10ks"]
+_SPECIAL = [
+    "CELKEM", "Celkem k úhradě", "K platbě", "TOTAL", "Mezisoučet", "DPH 21%", "Sleva",
+    "Datum: 12.03.2024", "Dne 1.2.24", "2024-03-12 14:33", "12/03/2024", "Datum prodeje",
+    "Tesco Stores ČR a.s.", "KAUFLAND", "Albert", "OMV", "dm drogerie markt s.r.o.",
+    "Dodavatel:", "Prodávající: Firma XYZ", "IČO: 25110161", "DIČ: CZ25110161",
+    "spol. s r.o.", "a.s.", "Pekárna U Nováků s.r.o.", "CZ 12345678", "Děkujeme za nákup",
+    # Characters where str.lower() and re.IGNORECASE disagree
+    "İČO: 12345678", "ſuma 120,00", "Datum: 1.1.2024 ı", "OBı s.r.o.",
+]
+
+
+def make_receipt(rng: random.Random, n_lines: int) -> List[Any]:
+    """Random ``readtext``-shaped receipt with two columns and noise."""
+    data: List[Any] = []
+    y = 10
+    for _ in range(n_lines):
+        h = rng.randint(18, 30)
+        if rng.random() < 0.15:
+            left = rng.choice(_SPECIAL)
+        else:
+            left = f"{rng.choice(_ITEMS)} {rng.randint(1, 5)} x {rng.randint(1, 99)},{rng.randint(0, 99):02d}"
+        jitter = rng.randint(-3, 3)
+        data.append(([[10, y], [260, y], [260, y + h], [10, y + h]], left, rng.random()))
+        if rng.random() < 0.6:
+            right = f"{rng.randint(1, 9999)},{rng.randint(0, 99):02d}"
+            data.append(([[300, y + jitter], [420, y + jitter], [420, y + h + jitter], [300, y + h + jitter]],
+                         right, rng.random()))
+        y += h + rng.randint(4, 12)
+    rng.shuffle(data)  # EasyOCR detection order is not reading order
+    return data
+
+
+def make_invoice(rng: random.Random, n_items: int) -> List[Any]:
+    """Typical long invoice: supplier header, *n_items* item lines, totals at the bottom."""
+    rows = ["Pekárna U Nováků s.r.o.", "Hlavní 12, Praha 1", "IČO: 25110161 DIČ: CZ25110161",
+            "Datum vystavení: 12.03.2024", "Faktura č. 2024001"]
+    rows += [f"{rng.choice(_ITEMS)} {rng.randint(1, 5)} x {rng.randint(1, 99)},{rng.randint(0, 99):02d}"
+             for _ in range(n_items)]
+    rows += ["Mezisoučet 1234,00", "DPH 21% 200,00", "Celkem k úhradě 1434,00", "Děkujeme za nákup"]
+    return [([[10, 30 * k], [300, 30 * k], [300, 30 * k + 20], [10, 30 * k + 20]], text, 0.9)
+            for k, text in enumerate(rows)]
+
+
+def extract_exact(lines: LineTable):
+    return M.extract_fields(lines, fuzzy_vendors=False)
+
+
+def check_identical(rng: random.Random, cases: int) -> int:
+    """Run both implementations on *cases* random receipts; return mismatches."""
+    mismatches = 0
+    for _ in range(cases):
+        receipt = make_receipt(rng, rng.randint(1, 80)) if rng.random() < 0.8 else make_invoice(rng, rng.randint(0, 40))
+        lines = LineTable.from_ocr(receipt)
+        if extract_exact(lines) != reference_fields(lines):
+            mismatches += 1
+    return mismatches
+
+
+def time_it(fn, arg, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Single-pass vs. multi-pass extrakce polí.")
+    parser.add_argument("--lines", type=int, default=300, help="Počet řádků dlouhé faktury.")
+    parser.add_argument("--repeat", type=int, default=200, help="Počet opakování měření.")
+    parser.add_argument("--cases", type=int, default=2000, help="Počet náhodných účtenek pro kontrolu shody.")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    mismatches = check_identical(rng, args.cases)
+    print(f"Kontrola shody: {args.cases - mismatches}/{args.cases} shodných výsledků")
+    if mismatches:
+        return 1
+
+    # Last case is the worst one for the old code: without keywords every
+    # pass scans all lines
+    for label, receipt in (
+        ("faktura", make_invoice(rng, args.lines)),
+        ("náhodná", make_receipt(rng, args.lines)),
+        ("bez klíčových slov", [d for d in make_receipt(rng, args.lines)
+                                if d[1] not in _SPECIAL]),
+    ):
+        lines = LineTable.from_ocr(receipt)
+        old = time_it(reference_fields, lines, args.repeat)
+        new = time_it(extract_exact, lines, args.repeat)
+        print(f"{label:<20} {len(lines):>4} řádků: multi-pass {old * 1e3:8.3f} ms, "
+              f"single-pass {new * 1e3:8.3f} ms, zrychlení {old / new:5.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
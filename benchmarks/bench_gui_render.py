@@ -0,0 +1,173 @@
+"""
+Model of the bitmap cost of the editor's image display while resizing.
+
+This does not run any GUI code: it replays the resize and PhotoImage
+calls of the two strategies on their own, for a window drag (a burst of
+``<Configure>`` events with a growing canvas) followed by going back and
+forth between two sizes (maximize / restore):
+
+    per_event   the previous behaviour: full-resolution BILINEAR resize
+                and a new PhotoImage for every event
+    per_burst   the scaling done by GUI._scaled_photo: a burst is rendered
+                once at its final size, the resize uses ``reducing_gap``
+                and scaled bitmaps are cached per (image, size)
+
+``per_burst`` assumes the GUI's debounce (RESIZE_DEBOUNCE_MS) fires once
+per burst, i.e. the user never pauses mid-drag. A drag with pauses
+renders once per pause; ``--settle-every N`` models that by rendering
+after every N events. Overlay layout (boxes and text entries) and the Tk
+event loop are not included — for the real frame times of a session run
+the GUI with ``ORR_METRICS=1`` and read the ``gui_frame``, ``gui_resize``
+and ``gui_scale`` timers.
+
+Without a display (no $DISPLAY) only the PIL part is timed; with one,
+creating the Tk PhotoImage is included too.
+
+Usage:
+    python benchmarks/bench_gui_render.py --image uctenka.jpg
+    python benchmarks/bench_gui_render.py --width 4000 --height 3000 --events 60 --json render.json
+    python benchmarks/bench_gui_render.py --settle-every 10
+"""
+import argparse
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from _common import percentile, write_json
+
+from PIL import Image, ImageDraw
+
+from LRUCache import ByteLRU
+
+
+def synthetic_image(width: int, height: int) -> Image.Image:
+    """A receipt-like RGB image (text lines on white) of the given size."""
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    for y in range(40, height - 40, max(20, height // 120)):
+        draw.line((60, y, width - 60 - (y * 7) % (width // 3), y), fill=(30, 30, 30), width=3)
+    return img
+
+
+def drag_sizes(events: int, start: Tuple[int, int], end: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """Canvas sizes of one window drag from *start* to *end*."""
+    return [(start[0] + (end[0] - start[0]) * i // (events - 1),
+             start[1] + (end[1] - start[1]) * i // (events - 1)) for i in range(events)]
+
+
+def fit(img: Image.Image, canvas: Tuple[int, int]) -> Tuple[int, int]:
+    scale = min(canvas[0] / img.width, canvas[1] / img.height)
+    return max(1, int(img.width * scale)), max(1, int(img.height * scale))
+
+
+def make_photo(tk_root) -> Callable[[Image.Image], Any]:
+    if tk_root is None:
+        return lambda img: img
+    from PIL import ImageTk
+    return lambda img: ImageTk.PhotoImage(img, master=tk_root)
+
+
+def per_event(img: Image.Image, bursts: List[List[Tuple[int, int]]], photo) -> List[float]:
+    """Frame times (s) of rendering every event at full cost."""
+    times = []
+    for burst in bursts:
+        for canvas in burst:
+            t = time.perf_counter()
+            photo(img.resize(fit(img, canvas), Image.Resampling.BILINEAR))
+            times.append(time.perf_counter() - t)
+    return times
+
+
+def per_burst(img: Image.Image, bursts: List[List[Tuple[int, int]]], photo) -> Tuple[List[float], int]:
+    """Frame times (s) of rendering each burst once, through the size cache; also the cache hits."""
+    cache = ByteLRU(64 * 1024 * 1024)
+    times, hits = [], 0
+    for burst in bursts:
+        t = time.perf_counter()
+        w, h = fit(img, burst[-1])
+        key = (id(img), w, h)
+        frame = cache.get(key)
+        if frame is None:
+            frame = photo(img.resize((w, h), Image.Resampling.BILINEAR, reducing_gap=1.5))
+            cache.put(key, frame, w * h * 4)
+        else:
+            hits += 1
+        times.append(time.perf_counter() - t)
+    return times, hits
+
+
+def describe(times: List[float], events: int) -> Dict[str, Any]:
+    total = sum(times)
+    return {
+        "frames": len(times),
+        "total_ms": total * 1000,
+        "per_event_ms": total * 1000 / events,
+        "p50_ms": percentile(times, 50) * 1000,
+        "p95_ms": percentile(times, 95) * 1000,
+        "max_ms": max(times) * 1000,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Doba vykreslení náhledu při změně velikosti okna.")
+    parser.add_argument("--image", help="Obrázek účtenky (výchozí: syntetický).")
+    parser.add_argument("--width", type=int, default=4000, help="Šířka syntetického obrázku.")
+    parser.add_argument("--height", type=int, default=3000, help="Výška syntetického obrázku.")
+    parser.add_argument("--events", type=int, default=40, help="Počet událostí <Configure> na jedno tažení.")
+    parser.add_argument("--toggles", type=int, default=10, help="Počet přepnutí maximalizovat / obnovit.")
+    parser.add_argument("--settle-every", type=int, default=0,
+                        help="Tažení s pauzami: vykreslit po každých N událostech (0 = jen na konci).")
+    parser.add_argument("--json", help="Uložit výsledky do JSON souboru.")
+    args = parser.parse_args()
+
+    if args.image:
+        from PIL import ImageOps
+        img = ImageOps.exif_transpose(Image.open(args.image)).convert("RGB")
+    else:
+        img = synthetic_image(args.width, args.height)
+
+    tk_root: Optional[Any] = None
+    try:
+        import tkinter
+        tk_root = tkinter.Tk()
+        tk_root.withdraw()
+    except Exception:
+        print("(-) Bez displeje: měří se jen změna velikosti v PIL, ne PhotoImage")
+
+    small, large = (900, 760), (1500, 980)
+    drag = drag_sizes(args.events, small, large)
+    step = args.settle_every if args.settle_every > 0 else len(drag)
+    bursts = [drag[i:i + step] for i in range(0, len(drag), step)]
+    for i in range(args.toggles):
+        # A maximize / restore delivers a short burst ending at the same sizes
+        bursts.append(drag_sizes(3, large, small) if i % 2 == 0 else drag_sizes(3, small, large))
+    events = sum(len(b) for b in bursts)
+
+    photo = make_photo(tk_root)
+    old = describe(per_event(img, bursts, photo), events)
+    new_times, hits = per_burst(img, bursts, photo)
+    new = describe(new_times, events)
+    new["cache_hits"] = hits
+
+    print(f"Model (bez kódu GUI): obrázek {img.width}x{img.height}, "
+          f"{events} událostí <Configure> v {len(bursts)} dávkách, 1 vykreslení na dávku")
+    print(f"{'strategie':<12}{'snímků':>8}{'celkem [ms]':>13}{'ms/událost':>12}{'p50 [ms]':>10}"
+          f"{'p95 [ms]':>10}{'max [ms]':>10}")
+    for name, r in (("per_event", old), ("per_burst", new)):
+        print(f"{name:<12}{r['frames']:>8}{r['total_ms']:>13.1f}{r['per_event_ms']:>12.2f}"
+              f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['max_ms']:>10.2f}")
+    print(f"Zrychlení: {old['total_ms'] / new['total_ms']:.1f}x, zásahy mezipaměti: {hits}")
+
+    write_json(args.json, {
+        "meta": {"width": img.width, "height": img.height, "events": events,
+                 "bursts": len(bursts), "settle_every": args.settle_every,
+                 "photoimage": tk_root is not None},
+        "per_event": old,
+        "per_burst": new,
+    })
+    if tk_root is not None:
+        tk_root.destroy()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,89 @@
+"""
+Compile a synthetic register export and measure the IČO registry.
+
+Reports the compile time, the size of the binary file, the resident memory
+added by opening it and doing random lookups, and the lookup latency.
+
+Usage:
+    python benchmarks/bench_ico_registry.py --entries 1000000
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+from typing import Optional
+
+import _common  # noqa: F401  (puts the repo root on sys.path)
+
+from IcoRegistry import IcoRegistry, compile_registry
+
+
+def private_rss_mb() -> Optional[float]:
+    """
+    Resident memory that is not file-backed (Linux only).
+
+    Pages of the memory-mapped registry are shared page cache and are left
+    out, they can be dropped by the OS at any time.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            fields = f.read().split()
+        pages = int(fields[1]) - int(fields[2])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def make_ico(n: int) -> str:
+    """The *n*-th 7-digit base with its mod-11 check digit."""
+    base = f"{n:07d}"
+    remainder = sum(int(d) * w for d, w in zip(base, range(8, 1, -1))) % 11
+    check = 1 if remainder == 0 else 0 if remainder == 1 else 11 - remainder
+    return base + str(check % 10)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Měření registru IČO.")
+    parser.add_argument("--entries", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bases = rng.sample(range(10 ** 7), args.entries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "registr.csv")
+        bin_path = os.path.join(tmp, "registr.bin")
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, delimiter=";")
+            writer.writerow(["ico", "obchodni_jmeno"])
+            for n in bases:
+                writer.writerow([make_ico(n), f"Firma {n} s.r.o."])
+
+        start = time.perf_counter()
+        count = compile_registry(csv_path, bin_path)
+        compile_s = time.perf_counter() - start
+        print(f"Zkompilováno:   {count} záznamů za {compile_s:.1f} s, "
+              f"{os.path.getsize(bin_path) / (1024 * 1024):.1f} MB")
+
+        queries = [make_ico(rng.choice(bases)) if i % 2 else make_ico(rng.randrange(10 ** 7))
+                   for i in range(args.lookups)]
+        rss_before = private_rss_mb()
+        registry = IcoRegistry(bin_path)
+
+        start = time.perf_counter()
+        found = sum(1 for q in queries if registry.lookup(q) is not None)
+        lookup_us = (time.perf_counter() - start) / len(queries) * 1e6
+        rss_after = private_rss_mb()
+
+        print(f"Vyhledávání:    {lookup_us:.1f} µs / dotaz ({found}/{len(queries)} nalezeno)")
+        if rss_before is not None and rss_after is not None:
+            print(f"Soukromá paměť: +{rss_after - rss_before:.1f} MB po otevření a {len(queries)} dotazech")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,113 @@
+"""
+Compare OCR model modes on a sample set: latency and field-extraction accuracy.
+
+Every mode gets its own MyOCR instance with the persistent result cache
+disabled, one warm-up image (not measured) and then a pass over all
+images through the same pipeline as BatchOCR.process_image.
+
+Usage:
+    python benchmarks/bench_ocr_modes.py samples/ --modes fp32,int8 --json modes.json
+    python benchmarks/bench_ocr_modes.py samples/ --modes default,adaptive
+"""
+import argparse
+import os
+import statistics
+import time
+from typing import Any, Dict, List
+
+from _common import FIELDS, field_matches, load_labels, percentile, write_json
+
+from BatchOCR import collect_images, process_image
+
+# Mode name -> MyOCR keyword arguments
+MODES: Dict[str, Dict[str, Any]] = {
+    "default": {"precision": "default"},
+    "fp32": {"precision": "fp32"},
+    "int8": {"precision": "int8"},
+    "adaptive": {"precision": "default", "adaptive_resize": True},
+    "int8-adaptive": {"precision": "int8", "adaptive_resize": True},
+}
+
+
+def run_mode(name: str, paths: List[str], labels: Dict[str, Dict[str, str]],
+             device: str, threads: int) -> Dict[str, Any]:
+    from MyOCR import MyOCR
+
+    ocr = MyOCR(use_cache=False, device=device, intra_threads=threads, **MODES[name])
+    process_image(ocr, paths[0])  # warm-up
+
+    latencies: List[float] = []
+    correct = {f: 0 for f in FIELDS}
+    labelled = 0
+
+    for path in paths:
+        start = time.perf_counter()
+        result = process_image(ocr, path)
+        latencies.append(time.perf_counter() - start)
+
+        truth = labels.get(os.path.basename(path))
+        if truth is not None:
+            labelled += 1
+            for f in FIELDS:
+                if field_matches(f, result.get(f"{f}_text"), truth.get(f)):
+                    correct[f] += 1
+
+    return {
+        "mode": name,
+        "device": ocr.device,
+        "precision": ocr.precision,
+        "images": len(paths),
+        "mean_s": statistics.mean(latencies),
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "labelled": labelled,
+        "accuracy": {f: (correct[f] / labelled if labelled else None) for f in FIELDS},
+    }
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    """Print one row per mode; the speedup is relative to the first mode."""
+    header = f"{'režim':<15}{'průměr [s]':>12}{'p50 [s]':>10}{'p95 [s]':>10}{'zrychlení':>11}" + "".join(
+        f"{f:>10}" for f in FIELDS
+    )
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        acc = "".join(
+            f"{'-':>10}" if r["accuracy"][f] is None else f"{r['accuracy'][f] * 100:>9.1f}%"
+            for f in FIELDS
+        )
+        speedup = rows[0]["mean_s"] / r["mean_s"] if r["mean_s"] else 0.0
+        print(f"{r['mode']:<15}{r['mean_s']:>12.3f}{r['p50_s']:>10.3f}{r['p95_s']:>10.3f}"
+              f"{speedup:>10.2f}x{acc}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Porovnání režimů OCR modelu (rychlost a přesnost).")
+    parser.add_argument("samples", help="Složka s obrázky (a volitelně labels.json).")
+    parser.add_argument("--modes", default="fp32,int8", help=f"Režimy oddělené čárkou: {', '.join(MODES)}")
+    parser.add_argument("--device", choices=("auto", "cpu", "cuda"), default="cpu")
+    parser.add_argument("--threads", type=int, default=0, help="Vlákna torch (0 = výchozí).")
+    parser.add_argument("--json", help="Uložit výsledky do JSON souboru.")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        parser.error(f"Neznámé režimy: {', '.join(unknown)}")
+
+    paths = collect_images([args.samples])
+    if not paths:
+        print("(!) Nenalezeny žádné obrázky.")
+        return 1
+    labels = load_labels(args.samples)
+
+    rows = [run_mode(m, paths, labels, args.device, args.threads) for m in modes]
+    print()
+    print_table(rows)
+    write_json(args.json, {"samples": os.path.abspath(args.samples), "results": rows})
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
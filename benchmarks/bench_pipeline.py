@@ -0,0 +1,278 @@
+"""
+End-to-end pipeline benchmark with per-stage timings (no GUI).
+
+Runs every image of a sample directory through the same steps as the
+application, in one process and without the persistent OCR cache, and
+measures each step separately:
+
+    decode       Image.open + pixel decode (as MyOCR._get_image_np)
+    gui_decode   EXIF fix + RGB conversion for the canvas (as GUI._load_image)
+    preprocess   MyOCR._preprocess_pil (grayscale, resize, contrast, sharpen)
+    detect       CRAFT text detection (reader.detect)
+    recognize    text recognition of the detected boxes (reader.recognize)
+    extraction   line reconstruction and price / date / vendor extraction
+    region       re-reading boxes found without text (resolve_region_texts)
+    excel        openpyxl load + write + save of the whole batch
+
+For every stage, every image and the whole batch it records wall time,
+CPU time (all threads of the process, so torch's intra-op threads count)
+and peak RSS. On Linux the peak is reset before each stage, elsewhere it
+is the peak of the process so far.
+
+Usage:
+    python benchmarks/bench_pipeline.py samples/ --json pipeline.json
+    python benchmarks/bench_pipeline.py samples/ --device cpu --threads 4 --adaptive-resize
+"""
+import argparse
+import datetime
+import os
+import platform
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from _common import percentile, write_json
+
+from PIL import Image, ImageOps
+
+from BatchOCR import collect_images
+
+STAGES = ("decode", "gui_decode", "preprocess", "detect", "recognize", "extraction", "region")
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS counter of this process (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident memory in MB since the last reset (or since start)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # kB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+class StageTimer:
+    """
+    Context manager measuring wall time, CPU time and peak RSS of one stage.
+
+    Usage:
+        with StageTimer(stats, "detect"):
+            ...
+    """
+
+    def __init__(self, stats: Dict[str, Dict[str, Any]], name: str):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self) -> "StageTimer":
+        _reset_peak_rss()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stats[self.name] = {
+            "wall_s": time.perf_counter() - self._wall,
+            "cpu_s": time.process_time() - self._cpu,
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+
+
+def run_image(ocr, path: str) -> Dict[str, Any]:
+    """Process one image stage by stage; return its stage stats and fields."""
+    import MyOCR as M
+
+    stages: Dict[str, Dict[str, Any]] = {}
+    with StageTimer(stages, "decode"):
+        st = os.stat(path)
+        img = Image.open(path)
+        img.load()
+    with StageTimer(stages, "gui_decode"):
+        ImageOps.exif_transpose(Image.open(path)).convert("RGB")
+    with StageTimer(stages, "preprocess"):
+        img_np, scale = ocr._preprocess_pil(img, ocr.adaptive_resize)
+        # Later region queries find the image where _get_image_np puts it
+        ocr.image_cache.put(path, (img_np, scale), img_np.nbytes, (st.st_mtime_ns, st.st_size))
+
+    # reader.readtext = detect + recognize; called separately to time them
+    with StageTimer(stages, "detect"):
+        horizontal, free = ocr.reader.detect(img_np)
+    with StageTimer(stages, "recognize"):
+        results = ocr.reader.recognize(img_np, horizontal_list=horizontal[0], free_list=free[0])
+        ocr.current_image_path = path
+        ocr.current_data = M._scale_results(results, 1.0 / scale)
+        ocr._remember_detections(path, ocr.current_data)
+
+    fields = {}
+    missing = []
+    with StageTimer(stages, "extraction"):
+        for key, getter in (("price", ocr.get_price_coords), ("date", ocr.get_date),
+                            ("vendor", ocr.get_vendor_coords)):
+            coords, text = getter()
+            if not text and coords:
+                missing.append((key, coords))
+            fields[f"{key}_text"] = text or ""
+    with StageTimer(stages, "region"):
+        if missing:
+            texts = ocr.resolve_region_texts(path, [coords for _, coords in missing])
+            for (key, _), text in zip(missing, texts):
+                fields[f"{key}_text"] = text or ""
+
+    return {
+        "filepath": path,
+        "detections": len(ocr.current_data),
+        "regions": len(missing),
+        "stages": stages,
+        "wall_s": sum(s["wall_s"] for s in stages.values()),
+        "cpu_s": sum(s["cpu_s"] for s in stages.values()),
+        "peak_rss_mb": max((s["peak_rss_mb"] or 0.0) for s in stages.values()),
+        **fields,
+    }
+
+
+def summarize(images: List[Dict[str, Any]], batch: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Per-stage totals and distributions over all images (plus the batch-level stages)."""
+    total_wall = sum(r["wall_s"] for r in images) + sum(s["wall_s"] for s in batch.values())
+    summary = {}
+    for name in STAGES:
+        walls = [r["stages"][name]["wall_s"] for r in images]
+        cpus = [r["stages"][name]["cpu_s"] for r in images]
+        rss = [r["stages"][name]["peak_rss_mb"] or 0.0 for r in images]
+        summary[name] = {
+            "total_s": sum(walls),
+            "mean_s": statistics.mean(walls),
+            "p50_s": percentile(walls, 50),
+            "p95_s": percentile(walls, 95),
+            "cpu_s": sum(cpus),
+            "peak_rss_mb": max(rss),
+            "share": sum(walls) / total_wall if total_wall else 0.0,
+        }
+    for name, s in batch.items():
+        summary[name] = {
+            "total_s": s["wall_s"], "mean_s": s["wall_s"], "p50_s": s["wall_s"], "p95_s": s["wall_s"],
+            "cpu_s": s["cpu_s"], "peak_rss_mb": s["peak_rss_mb"] or 0.0,
+            "share": s["wall_s"] / total_wall if total_wall else 0.0,
+        }
+    return summary
+
+
+def print_summary(summary: Dict[str, Dict[str, Any]]) -> None:
+    header = (f"{'fáze':<12}{'celkem [s]':>12}{'průměr [s]':>12}{'p50 [s]':>10}{'p95 [s]':>10}"
+              f"{'CPU [s]':>10}{'špička RSS [MB]':>17}{'podíl':>8}")
+    print(header)
+    print("-" * len(header))
+    for name, s in summary.items():
+        print(f"{name:<12}{s['total_s']:>12.3f}{s['mean_s']:>12.3f}{s['p50_s']:>10.3f}{s['p95_s']:>10.3f}"
+              f"{s['cpu_s']:>10.2f}{s['peak_rss_mb']:>17.0f}{s['share'] * 100:>7.1f}%")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Měření celé pipeline po fázích (bez GUI).")
+    parser.add_argument("samples", help="Složka s obrázky.")
+    parser.add_argument("--device", choices=("auto", "cpu", "cuda"), default="cpu")
+    parser.add_argument("--threads", type=int, default=0, help="Vlákna torch (0 = výchozí).")
+    parser.add_argument("--precision", choices=("default", "fp32", "int8"), default="default")
+    parser.add_argument("--adaptive-resize", action="store_true")
+    parser.add_argument("--warmup", type=int, default=1, help="Počet neměřených obrázků na zahřátí.")
+    parser.add_argument("-t", "--template", default="template.xlsx", help="Excel šablona (fáze excel).")
+    parser.add_argument("--no-excel", action="store_true", help="Neměřit zápis do Excelu.")
+    parser.add_argument("--json", help="Uložit výsledky do JSON souboru.")
+    args = parser.parse_args()
+
+    paths = collect_images([args.samples])
+    if not paths:
+        print("(!) Nenalezeny žádné obrázky.")
+        return 1
+
+    batch: Dict[str, Dict[str, Any]] = {}
+    batch_wall = time.perf_counter()
+    batch_cpu = time.process_time()
+
+    with StageTimer(batch, "model_load"):
+        from MyOCR import MyOCR
+        ocr = MyOCR(use_cache=False, device=args.device, intra_threads=args.threads,
+                    precision=args.precision, adaptive_resize=args.adaptive_resize)
+
+    for path in paths[:args.warmup]:
+        run_image(ocr, path)
+        ocr.image_cache.clear()
+
+    images = []
+    for i, path in enumerate(paths, 1):
+        ocr.image_cache.clear()
+        try:
+            row = run_image(ocr, path)
+        except Exception as e:
+            print(f"(-) [{i}/{len(paths)}] {os.path.basename(path)}: {e}")
+            continue
+        images.append(row)
+        print(f"(+) [{i}/{len(paths)}] {os.path.basename(path)}: {row['wall_s']:.2f} s, "
+              f"{row['detections']} detekcí")
+    if not images:
+        print("(!) Žádný obrázek se nepodařilo zpracovat.")
+        return 1
+
+    if not args.no_excel:
+        if os.path.exists(args.template):
+            from BatchOCR import save_results
+            with tempfile.TemporaryDirectory() as tmp:
+                with StageTimer(batch, "excel"):
+                    save_results([dict(r, error=None) for r in images], args.template,
+                                 os.path.join(tmp, "export.xlsx"))
+        else:
+            print(f"(-) Šablona {args.template} neexistuje, fáze excel se přeskočí")
+
+    total = {
+        "images": len(images),
+        "wall_s": time.perf_counter() - batch_wall,
+        "cpu_s": time.process_time() - batch_cpu,
+        "peak_rss_mb": max([r["peak_rss_mb"] for r in images]
+                           + [s["peak_rss_mb"] or 0.0 for s in batch.values()]),
+    }
+    total["images_per_s"] = len(images) / total["wall_s"]
+    summary = summarize(images, batch)
+
+    print()
+    print_summary(summary)
+    print(f"\nCelkem: {total['images']} obrázků za {total['wall_s']:.1f} s "
+          f"({total['images_per_s']:.2f} obrázků/s), CPU {total['cpu_s']:.1f} s, "
+          f"špička RSS {total['peak_rss_mb']:.0f} MB")
+
+    write_json(args.json, {
+        "meta": {
+            "samples": os.path.abspath(args.samples),
+            "device": ocr.device,
+            "precision": ocr.precision,
+            "threads": args.threads,
+            "adaptive_resize": args.adaptive_resize,
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        },
+        "total": total,
+        "stages": summary,
+        "images": images,
+    })
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,108 @@
+"""
+Scaling of the vendor dictionary with the number of names.
+
+For synthetic supplier lists of growing size, measures building the
+index, loading its compiled form, exact lookups of receipt lines, fuzzy
+lookups of lines with OCR-garbled names, and compares the exact lookup
+with a single regex alternation over the same names (the approach the
+automaton replaced; skipped for the largest lists, where compiling the
+regex alone takes too long).
+
+Usage:
+    python benchmarks/bench_vendor_index.py --sizes 1000,10000,100000
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+from typing import List
+
+from _common import percentile
+
+from VendorIndex import VendorIndex
+
+_SYLLABLES = ["ka", "ro", "me", "tal", "stav", "pro", "ne", "ko", "bo", "trans", "servis",
+              "dom", "tech", "mont", "lin", "var", "plast", "agro", "elektro", "graf"]
+_LINES = ["rohlík 2 x 3,90 7,80", "pekárna u nováků s.r.o.", "celkem k úhradě 1434,00",
+          "ičo: 25110161 dič: cz25110161", "datum vystavení: 12.03.2024", "děkujeme za nákup"]
+
+
+def make_names(rng: random.Random, count: int) -> List[str]:
+    names = set()
+    while len(names) < count:
+        name = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if rng.random() < 0.3:
+            name += " " + rng.choice(_SYLLABLES) + rng.choice(_SYLLABLES)
+        names.add(name)
+    return sorted(names)
+
+
+def garble(rng: random.Random, name: str) -> str:
+    """Simulate OCR errors: confusable characters and, for long names, one lost letter."""
+    chars = list(name)
+    for ch, digit in (("o", "0"), ("e", "3"), ("a", "4"), ("s", "5")):
+        if ch in chars and rng.random() < 0.5:
+            chars[chars.index(ch)] = digit
+    if len(chars) >= 10:
+        del chars[rng.randrange(1, len(chars) - 1)]
+    return "".join(chars)
+
+
+def lookup_us(find, lines: List[str], repeat: int) -> float:
+    """Mean time of one line lookup in microseconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for line in lines:
+            find(line)
+    return (time.perf_counter() - start) / (repeat * len(lines)) * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Škálování slovníku dodavatelů.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Počty názvů oddělené čárkou.")
+    parser.add_argument("--regex-limit", type=int, default=10000,
+                        help="Největší seznam, pro který se měří i regex.")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'názvů':>8}{'sestavení [s]':>15}{'načtení [s]':>13}{'automat [µs/ř]':>16}{'regex [µs/ř]':>14}"
+          f"{'fuzzy [µs/ř]':>14}{'fuzzy p99 [µs]':>16}{'nalezeno':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+            names = make_names(rng, size)
+
+            start = time.perf_counter()
+            index = VendorIndex(names)
+            build_s = time.perf_counter() - start
+
+            path = os.path.join(tmp, f"vendors-{size}.pkl")
+            index.save(path)
+            start = time.perf_counter()
+            VendorIndex.load_compiled(path)
+            load_s = time.perf_counter() - start
+
+            ac_us = lookup_us(index.find, _LINES, args.repeat)
+            regex_col = "-"
+            if size <= args.regex_limit:
+                pattern = re.compile("|".join(re.escape(n) for n in names))
+                regex_col = f"{lookup_us(pattern.search, _LINES, args.repeat):.1f}"
+
+            garbled = [garble(rng, n) + " praha" for n in rng.sample(names, 100)] + _LINES
+            times = []
+            found = 0
+            for line in garbled:
+                start = time.perf_counter()
+                found += index.find_fuzzy(line) is not None
+                times.append((time.perf_counter() - start) * 1e6)
+            print(f"{size:>8}{build_s:>15.2f}{load_s:>13.3f}{ac_us:>16.1f}{regex_col:>14}"
+                  f"{statistics.mean(times):>14.1f}{percentile(times, 99):>16.1f}{found:>6}/{100:<3}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,27 +1,37 @@
 from GUI import create_window
-from ExcelHandler import ExcelHandler
+from ResultsJournal import ResultsJournal, default_journal_path
+from Exporters import with_format_extension
 import os
 
 def main():
 
     print("Spouštím aplikaci...")
     
+    template_file = "template.xlsx"       
+    output_file = "Vysledny_export.xlsx"
+
+    # Every finished receipt is journaled right away; the workbook is
+    # written from the journal at the end (also after a crash)
+    journal = ResultsJournal(default_journal_path(output_file))
+    try:
+        run(journal, template_file, output_file)
+    finally:
+        journal.close()
 
-    gui_results = create_window()
+
+def run(journal, template_file, output_file):
+    gui_results, export_format = create_window(journal)
+    output_file = with_format_extension(output_file, export_format)
 
     if not gui_results:
         print("Uživatel zrušil akci nebo nevybral data.")
-        
+        pending = len(journal.pending(output_file))
+        if pending:
+            print(f"Neexportované výsledky ({pending}) zůstávají v deníku: {journal.path}")
+            print(f"Export: python ResultsJournal.py {journal.path} -o {output_file}")
         return
 
     print(f"\n--- UKLÁDÁM DATA PRO {len(gui_results)} SOUBORŮ ---")
-    
-    template_file = "template.xlsx"       
-    output_file = "Vysledny_export.xlsx"
-    
-
-    handler = ExcelHandler(template_file)
-    saved_count = 0
 
     for item in gui_results:
         filename = os.path.basename(item['filepath'])
@@ -36,18 +46,10 @@ def main():
         print(f"  -> Cena: {price}")
         print(f"  -> Datum: {date}")
 
-        excel_data = {
-            'vendor': vendor,  
-            'price': price,
-            'date': date,
-            'filename': filename
-        }
-
-        if handler.add_invoice_entry(output_file, excel_data):
-            print("  -> OK")
-            saved_count += 1
-        else:
-            print("  -> CHYBA (zkontrolujte výpis výše)")
+    # One pass over everything not exported yet (one load and save for Excel)
+    saved_count = journal.materialize(template_file, output_file, fmt=export_format)
+    if journal.pending(output_file):
+        print("  -> CHYBA (zkontrolujte výpis výše)")
 
     print(f"\n--- HOTOVO ({saved_count}/{len(gui_results)}) ---")
     print(f"Soubor: {os.path.abspath(output_file)}")
@@ -0,0 +1,35 @@
+"""
+Exporters: stream formats after a failure part-way through.
+
+Run with ``python -m pytest tests``.
+"""
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from Exporters import export_entries  # noqa: E402
+
+ENTRY = {"vendor_text": "Tesco", "price_text": "100,00", "date_text": "26.7.2022", "filename": "uctenka_01.jpg"}
+
+
+def failing_entries():
+    yield ENTRY
+    yield ENTRY
+    raise ValueError("poškozený záznam")
+
+
+@pytest.mark.parametrize("name", ["export.csv", "export.jsonl"])
+def test_failed_export_leaves_the_file_as_it_was(tmp_path, name):
+    out = str(tmp_path / name)
+    assert export_entries([ENTRY], out) == 1
+    with open(out, "rb") as f:
+        before = f.read()
+
+    assert export_entries(failing_entries(), out) == 0
+    with open(out, "rb") as f:
+        assert f.read() == before
@@ -0,0 +1,92 @@
+"""
+ResultsJournal: export state per output file across corrections and crashes.
+
+Run with ``python -m pytest tests``.
+"""
+import csv
+import json
+import os
+import sys
+
+import openpyxl
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from ExcelHandler import _LedgerIndex  # noqa: E402
+from ResultsJournal import ResultsJournal  # noqa: E402
+
+TEMPLATE = os.path.join(REPO_ROOT, "template.xlsx")
+
+
+def receipt(price, path="/scans/uctenka_01.jpg"):
+    return {"filepath": path, "price_text": price, "date_text": "26.7.2022", "vendor_text": "Tesco"}
+
+
+def ledger_prices(path):
+    wb = openpyxl.load_workbook(path)
+    ws = wb["Příjmy a výdaje"] if "Příjmy a výdaje" in wb.sheetnames else wb.active
+    first = _LedgerIndex.FIRST_ROW
+    return [ws.cell(row=r, column=3).value for r in range(first, first + 3)]
+
+
+@pytest.fixture
+def journal(tmp_path):
+    with ResultsJournal(str(tmp_path / "export.journal.jsonl")) as j:
+        yield j
+
+
+def test_correction_overwrites_its_ledger_row(journal, tmp_path):
+    out = str(tmp_path / "export.xlsx")
+    journal.append("k1", receipt("100,00"))
+    assert journal.materialize(TEMPLATE, out) == 1
+    assert ledger_prices(out) == [100.0, None, None]
+
+    journal.append("k1", receipt("120,00"))
+    assert journal.pending(out) == []
+    assert [r["key"] for r in journal.corrections(out)] == ["k1"]
+    assert journal.materialize(TEMPLATE, out) == 1
+    assert ledger_prices(out) == [120.0, None, None]
+    assert journal.corrections(out) == []
+
+    # A new receipt after the correction still goes to the next free row
+    journal.append("k2", receipt("50,00", "/scans/uctenka_02.jpg"))
+    assert journal.materialize(TEMPLATE, out) == 1
+    assert ledger_prices(out) == [120.0, 50.0, None]
+
+
+def test_correction_is_not_appended_to_a_stream(journal, tmp_path):
+    out = str(tmp_path / "export.csv")
+    journal.append("k1", receipt("100,00"))
+    assert journal.materialize(TEMPLATE, out) == 1
+
+    journal.append("k1", receipt("120,00"))
+    assert journal.materialize(TEMPLATE, out) == 0
+    with open(out, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.reader(f, delimiter=";"))
+    assert [r[1] for r in rows[1:]] == ["100.00"]
+
+
+def test_unchanged_result_is_not_a_new_version(journal, tmp_path):
+    out = str(tmp_path / "export.xlsx")
+    journal.append("k1", receipt("100,00"))
+    journal.materialize(TEMPLATE, out)
+
+    # Reopened in the GUI and saved without changes
+    journal.append_many([("k1", receipt("100,00"))])
+    assert journal.pending(out) == [] and journal.corrections(out) == []
+    with open(journal.path, encoding="utf-8") as f:
+        assert sum(json.loads(line)["type"] == "result" for line in f) == 1
+
+
+def test_record_without_newline_survives_the_next_write(tmp_path):
+    path = str(tmp_path / "export.journal.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"type": "result", "key": "k1", **receipt("100,00"), "time": 1.0}))
+
+    with ResultsJournal(path) as j:
+        j.append("k2", receipt("50,00", "/scans/uctenka_02.jpg"))
+    with ResultsJournal(path) as j:
+        assert j.get("k1") is not None and j.get("k2") is not None